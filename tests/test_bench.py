@@ -0,0 +1,183 @@
+import tempfile
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+from versifier.bench import (
+    ImportBenchmark,
+    ImportResult,
+    RuntimeBenchmark,
+    RuntimeResult,
+    discover_modules,
+    format_results,
+    geometric_mean_speedup,
+    parse_importtime,
+)
+
+IMPORTTIME_OUTPUT = """import time: self [us] | cumulative | imported package
+import time:       100 |        100 | encodings
+import time:        50 |        300 | pkg
+import time:        20 |         20 |   json
+import time:        80 |        100 | pkg.sub
+"""
+
+
+class TestDiscoverModules:
+    def test_discover_modules(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            package_dir = Path(td) / "pkg"
+            (package_dir / "sub").mkdir(parents=True)
+            (package_dir / "data").mkdir()
+            (package_dir / "__init__.py").write_text("")
+            (package_dir / "a.py").write_text("")
+            (package_dir / "sub" / "__init__.py").write_text("")
+            (package_dir / "sub" / "b.py").write_text("")
+            (package_dir / "data" / "c.py").write_text("")
+            (Path(td) / "single.py").write_text("")
+
+            modules = discover_modules(td, ["pkg", "single"])
+
+            assert modules == ["pkg", "pkg.a", "pkg.sub", "pkg.sub.b", "single"]
+
+    def test_discover_modules_skips_main_and_excluded(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            package_dir = Path(td) / "pkg"
+            (package_dir / "tests").mkdir(parents=True)
+            (package_dir / "__init__.py").write_text("")
+            (package_dir / "__main__.py").write_text("raise SystemExit(1)")
+            (package_dir / "a.py").write_text("")
+            (package_dir / "test_a.py").write_text("")
+            (package_dir / "tests" / "__init__.py").write_text("")
+            (package_dir / "tests" / "test_b.py").write_text("")
+
+            modules = discover_modules(td, ["pkg"], exclude_packages=["*.tests", "*.test_*"])
+
+            assert modules == ["pkg", "pkg.a"]
+
+
+class TestParseImporttime:
+    def test_parse_importtime(self) -> None:
+        assert parse_importtime(IMPORTTIME_OUTPUT, ["pkg"]) == 400
+
+    def test_parse_importtime_other_package(self) -> None:
+        assert parse_importtime(IMPORTTIME_OUTPUT, ["other"]) == 0
+
+
+class TestImportResult:
+    def test_diff(self) -> None:
+        result = ImportResult(module="pkg", source_us=100, output_us=150)
+        assert result.diff_us == 50
+        assert result.ratio == 1.5
+
+    def test_diff_failed(self) -> None:
+        result = ImportResult(module="pkg", source_us=100, output_us=None)
+        assert result.diff_us is None
+        assert result.ratio is None
+
+
+class TestImportBenchmark:
+    @patch("versifier.bench.run")
+    def test_measure(self, mock_run: MagicMock) -> None:
+        mock_run.return_value = MagicMock(returncode=0, stderr=IMPORTTIME_OUTPUT)
+
+        benchmark = ImportBenchmark(python_path="python", repeat=2)
+        assert benchmark.measure("/src", ["pkg.sub"], ["pkg"]) == 400
+
+        assert mock_run.call_count == 2
+        commands = mock_run.call_args[0][0]
+        assert commands[:4] == ["python", "-I", "-X", "importtime"]
+        assert "import pkg.sub" in commands[-1]
+
+    @patch("versifier.bench.run")
+    def test_measure_failed(self, mock_run: MagicMock) -> None:
+        mock_run.return_value = MagicMock(returncode=1, stderr="ImportError")
+
+        benchmark = ImportBenchmark(python_path="python")
+        assert benchmark.measure("/src", ["pkg"], ["pkg"]) is None
+
+    @patch.object(ImportBenchmark, "measure", return_value=10)
+    def test_compare(self, mock_measure: MagicMock) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            package_dir = Path(td) / "pkg"
+            package_dir.mkdir()
+            (package_dir / "__init__.py").write_text("")
+
+            results = ImportBenchmark().compare(td, td, ["pkg"])
+
+            assert [r.module for r in results] == ["pkg", "(total)"]
+            assert mock_measure.call_count == 4
+
+
+class TestFormatResults:
+    def test_format_results(self) -> None:
+        results = [ImportResult(module="pkg", source_us=100, output_us=None)]
+        lines = format_results(results, {"module": "module", "source_us": "source", "output_us": "output"})
+        assert lines[0].split() == ["module", "source", "output"]
+        assert lines[1].split() == ["pkg", "100", "-"]
+
+
+class TestRuntimeResult:
+    def test_speedup(self) -> None:
+        assert RuntimeResult(name="b", source_us=2.0, output_us=1.0).speedup == 2.0
+
+    def test_speedup_missing(self) -> None:
+        assert RuntimeResult(name="b", source_us=2.0, output_us=None).speedup is None
+
+    def test_geometric_mean_speedup(self) -> None:
+        results = [
+            RuntimeResult(name="a", source_us=4.0, output_us=1.0),
+            RuntimeResult(name="b", source_us=1.0, output_us=1.0),
+            RuntimeResult(name="c", source_us=1.0, output_us=None),
+        ]
+        assert geometric_mean_speedup(results) == 2.0
+        assert geometric_mean_speedup([]) is None
+
+
+class TestRuntimeBenchmark:
+    def test_measure_module(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            root = Path(td) / "root"
+            (root / "pkg").mkdir(parents=True)
+            (root / "pkg" / "__init__.py").write_text("def f():\n    return 1\n")
+            suite = Path(td) / "benchmarks.py"
+            suite.write_text("import pkg\n\ndef bench_f():\n    pkg.f()\n\ndef helper():\n    pass\n")
+
+            results = RuntimeBenchmark(repeat=1).measure(str(root), str(suite))
+
+            assert list(results) == ["bench_f"]
+            assert results["bench_f"] > 0
+
+    def test_measure_module_failed(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            suite = Path(td) / "benchmarks.py"
+            suite.write_text("import missing_package\n")
+
+            assert RuntimeBenchmark(repeat=1).measure(td, str(suite)) == {}
+
+    def test_measure_module_partly_failed(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            suite = Path(td) / "benchmarks.py"
+            suite.write_text("def bench_ok():\n    pass\n\ndef bench_broken():\n    raise ValueError\n")
+
+            assert list(RuntimeBenchmark(repeat=1).measure(td, str(suite))) == ["bench_ok"]
+
+    @patch("versifier.bench.run")
+    def test_measure_pytest_suite(self, mock_run: MagicMock) -> None:
+        mock_run.return_value = MagicMock(returncode=1, stderr="", stdout="")
+        with tempfile.TemporaryDirectory() as td:
+            RuntimeBenchmark().measure(td, td)
+
+            script = mock_run.call_args[0][0][-1]
+            assert "--benchmark-only" in script
+            # the whole argument is a repr, a windows path can not turn into escapes
+            assert "'--benchmark-json=" in script
+            compile(script, "<runner>", "exec")
+
+    @patch.object(RuntimeBenchmark, "measure")
+    def test_compare(self, mock_measure: MagicMock) -> None:
+        mock_measure.side_effect = [{"bench_a": 2.0, "bench_b": 1.0}, {"bench_a": 1.0}]
+
+        results = RuntimeBenchmark().compare("/src", "/out", "benchmarks.py")
+
+        assert [r.name for r in results] == ["bench_a", "bench_b"]
+        assert results[0].speedup == 2.0
+        assert results[1].output_us is None
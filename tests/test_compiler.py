@@ -1,8 +1,22 @@
+import os
+import py_compile
 import tempfile
 from pathlib import Path
 from unittest.mock import MagicMock, patch
 
-from versifier.compiler import Compiler, Cython, Nuitka3, SmartCompiler
+import pytest
+
+from versifier.compiler import (
+    Bytecode,
+    Compiler,
+    Cython,
+    Nuitka3,
+    SmartCompiler,
+    module_name,
+    module_path,
+    process_context,
+)
+from versifier.report import BuildReport
 
 
 class TestNuitka3:
@@ -115,6 +129,42 @@ class TestCython:
             mock_cythonize.assert_called_once()
             mock_setup.assert_called_once()
 
+    @patch("versifier.compiler.setup")
+    @patch("versifier.compiler.cythonize")
+    def test_compile_packages_parallel(self, mock_cythonize: MagicMock, mock_setup: MagicMock) -> None:
+        mock_cythonize.return_value = []
+        with tempfile.TemporaryDirectory() as td:
+            package_path = Path(td) / "mypackage"
+            package_path.mkdir()
+            (package_path / "__init__.py").write_text("")
+
+            Cython(jobs=3).compile_packages(source_dir=td, output_dir=td, packages=["mypackage"])
+
+            script_args = mock_setup.call_args[1]["script_args"]
+            assert script_args[script_args.index("--parallel") + 1] == "3"
+
+    @patch("versifier.compiler.setup")
+    @patch("versifier.compiler.cythonize")
+    def test_compile_packages_reproducible(self, mock_cythonize: MagicMock, mock_setup: MagicMock) -> None:
+        cflags = []
+        mock_cythonize.return_value = []
+
+        def setup(**kwargs: object) -> MagicMock:
+            cflags.append(os.environ["CFLAGS"])
+            return MagicMock()
+
+        mock_setup.side_effect = setup
+        with tempfile.TemporaryDirectory() as td, patch.dict(os.environ, {"CFLAGS": "-O2"}):
+            package_path = Path(td) / "mypackage"
+            package_path.mkdir()
+            (package_path / "__init__.py").write_text("")
+
+            Cython().compile_packages(source_dir=td, output_dir=td, packages=["mypackage"])
+
+            build_dir = mock_cythonize.call_args[1]["build_dir"]
+            assert cflags == [f"-O2 -fdebug-prefix-map={build_dir}=."]
+            assert os.environ["CFLAGS"] == "-O2"
+
     @patch("versifier.compiler.setup")
     @patch("versifier.compiler.cythonize")
     def test_compile_packages_file(self, mock_cythonize: MagicMock, mock_setup: MagicMock) -> None:
@@ -188,3 +238,169 @@ class TestSmartCompiler:
 
         compiler1.compile_packages.assert_called_once()
         compiler2.compile_packages.assert_called_once()
+
+
+class TestCythonSharedUtility:
+    @patch("versifier.compiler.setup")
+    @patch("versifier.compiler.cythonize")
+    def test_compile_packages_shared_utility(self, mock_cythonize: MagicMock, mock_setup: MagicMock) -> None:
+        mock_cythonize.return_value = []
+        with tempfile.TemporaryDirectory() as td:
+            source_dir = Path(td) / "source"
+            package_path = source_dir / "mypackage"
+            package_path.mkdir(parents=True)
+            (package_path / "__init__.py").write_text("")
+            (package_path / "module.py").write_text("x = 1")
+
+            output_dir = Path(td) / "output"
+            shared_so = output_dir / "mypackage" / "_cyutility.so"
+            shared_so.parent.mkdir(parents=True)
+            shared_so.write_bytes(b"x" * 10)
+            mock_setup.return_value.get_command_obj.return_value.get_outputs.return_value = [str(shared_so)]
+
+            report = BuildReport()
+            cython = Cython(shared_utility=True, report=report)
+            cython.compile_packages(source_dir=str(source_dir), output_dir=str(output_dir), packages=["mypackage"])
+
+            extensions = mock_cythonize.call_args[0][0]
+            assert extensions[0].name == "mypackage._cyutility"
+            assert len(extensions) == 3
+            assert mock_cythonize.call_args[1]["shared_utility_qualified_name"] == "mypackage._cyutility"
+            assert report.sizes["cython.mypackage._cyutility"] == 10
+            assert report.counters["cython.modules_sharing_utility"] == 2
+            assert "cython.mypackage" in report.timings
+
+    @patch("versifier.compiler.setup")
+    @patch("versifier.compiler.cythonize")
+    def test_compile_packages_shared_utility_single_file(
+        self, mock_cythonize: MagicMock, mock_setup: MagicMock
+    ) -> None:
+        mock_cythonize.return_value = []
+        with tempfile.TemporaryDirectory() as td:
+            source_dir = Path(td) / "source"
+            source_dir.mkdir()
+            (source_dir / "mymodule.py").write_text("x = 1")
+
+            cython = Cython(shared_utility=True)
+            cython.compile_packages(
+                source_dir=str(source_dir), output_dir=str(Path(td) / "output"), packages=["mymodule"]
+            )
+
+            assert "shared_utility_qualified_name" not in mock_cythonize.call_args[1]
+
+
+class TestCythonModules:
+    @patch("versifier.compiler.setup")
+    @patch("versifier.compiler.cythonize")
+    def test_compile_selected_modules(self, mock_cythonize: MagicMock, mock_setup: MagicMock) -> None:
+        mock_cythonize.return_value = []
+        with tempfile.TemporaryDirectory() as td:
+            package_path = Path(td) / "mypackage"
+            package_path.mkdir()
+            (package_path / "__init__.py").write_text("")
+            (package_path / "hot.py").write_text("x = 1")
+
+            cython = Cython()
+            cython.compile_packages(source_dir=td, output_dir=td, packages=["mypackage"], modules=["mypackage.hot"])
+
+            assert mock_cythonize.call_args[0][0] == [str(package_path / "hot.py")]
+
+    @patch("versifier.compiler.setup")
+    @patch("versifier.compiler.cythonize")
+    def test_compile_no_selected_modules(self, mock_cythonize: MagicMock, mock_setup: MagicMock) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            package_path = Path(td) / "mypackage"
+            package_path.mkdir()
+            (package_path / "__init__.py").write_text("")
+
+            cython = Cython()
+            cython.compile_packages(source_dir=td, output_dir=td, packages=["mypackage"], modules=[])
+
+            mock_cythonize.assert_not_called()
+
+
+class TestModuleName:
+    def test_module_name(self) -> None:
+        assert module_name("/src", "/src/pkg/sub/m.py") == "pkg.sub.m"
+        assert module_name("/src", "/src/pkg/__init__.py") == "pkg"
+
+    def test_module_path(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            (Path(td) / "pkg").mkdir()
+            assert module_path(td, "pkg") == str(Path(td) / "pkg" / "__init__.py")
+            assert module_path(td, "pkg.m") == str(Path(td) / "pkg" / "m.py")
+
+
+class TestBytecode:
+    def test_compile_modules(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            source_dir = Path(td) / "source"
+            (source_dir / "pkg").mkdir(parents=True)
+            (source_dir / "pkg" / "__init__.py").write_text('"""doc"""\nx = 1\n')
+            output_dir = Path(td) / "output"
+
+            bytecode = Bytecode()
+            bytecode.compile_modules(str(source_dir), str(output_dir), ["pkg"])
+
+            assert (output_dir / "pkg" / "__init__.pyc").exists()
+            assert bytecode.report.counters["bytecode.modules"] == 1
+
+
+class TestBytecodeTier:
+    def test_compile_packages(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            source_dir = Path(td) / "source"
+            (source_dir / "pkg" / "sub").mkdir(parents=True)
+            (source_dir / "pkg" / "__init__.py").write_text("")
+            (source_dir / "pkg" / "sub" / "__init__.py").write_text("")
+            (source_dir / "pkg" / "sub" / "m.py").write_text("x = 1\n")
+            (source_dir / "single.py").write_text("x = 1\n")
+            output_dir = Path(td) / "output"
+
+            bytecode = Bytecode(workers=2)
+            bytecode.compile_packages(str(source_dir), str(output_dir), ["pkg", "single", "missing"])
+
+            assert (output_dir / "pkg" / "__init__.pyc").exists()
+            assert (output_dir / "pkg" / "sub" / "m.pyc").exists()
+            assert (output_dir / "single.pyc").exists()
+            assert bytecode.report.counters["bytecode.modules"] == 4
+
+    def test_process_context_never_forks(self) -> None:
+        # the stub generator may be running when the bytecode workers start
+        assert process_context().get_start_method() in ("forkserver", "spawn")
+
+    def test_compile_packages_syntax_error(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            (Path(td) / "broken.py").write_text("def (:\n")
+
+            bytecode = Bytecode(workers=1)
+            with pytest.raises(py_compile.PyCompileError):
+                bytecode.compile_packages(td, td, ["broken"])
+
+
+class TestSmartCompilerTiers:
+    def test_tier_report(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            (Path(td) / "pkg1").mkdir()
+            (Path(td) / "pkg2").mkdir()
+            compiler1 = MagicMock(spec=Compiler)
+            compiler1.compile_packages.side_effect = [None, Exception("Failed")]
+            compiler2 = Bytecode()
+
+            report = BuildReport()
+            smart = SmartCompiler(compilers=[compiler1, compiler2], report=report)
+            smart.compile_packages(source_dir=td, output_dir=td, packages=["pkg1", "pkg2", "missing"])
+
+            assert report.notes["tier.pkg1"] == "MagicMock"
+            assert report.notes["tier.pkg2"] == "Bytecode"
+            assert "tier.missing" not in report.notes
+
+    def test_tier_report_failed(self) -> None:
+        compiler1 = MagicMock(spec=Compiler)
+        compiler1.compile_packages.side_effect = Exception("Failed")
+
+        report = BuildReport()
+        smart = SmartCompiler(compilers=[compiler1], report=report)
+        smart.compile_packages(source_dir="/src", output_dir="/out", packages=["pkg1"])
+
+        assert report.notes["tier.pkg1"] == "failed"
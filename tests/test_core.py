@@ -1,8 +1,29 @@
+import os
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Iterator, List
 from unittest.mock import MagicMock, patch
 
-from versifier.core import DependencyExporter, DependencyManager, PackageExtractor, PackageObfuscator
+import pytest
+
+from versifier import core
+from versifier.compiler import Bytecode
+from versifier.core import (
+    DependencyExporter,
+    DependencyManager,
+    PackageExtractor,
+    PackageObfuscator,
+    merge_tree,
+    obfuscate_project_dir,
+    stub_executor,
+    sync_tree,
+)
+from versifier.dedupe import ModuleDeduplicator
+from versifier.manifest import ExtractManifest
+from versifier.poetry import RequirementsFile
+from versifier.report import BuildReport
+from versifier.wheelwriter import WheelWriter
 
 
 class TestDependencyManager:
@@ -103,6 +124,25 @@ class TestDependencyExporter:
         assert len(output) == 1
         assert "requests" in output[0]
 
+    def test_export_matrix_to_requirements_txt(self) -> None:
+        rf = RequirementsFile.from_string('six==1.16.0\nuvloop==0.19.0 ; sys_platform == "linux"\nprivate==1.0\n')
+        poetry = MagicMock()
+        poetry.export_requirements.return_value = rf
+
+        exporter = DependencyExporter(poetry=poetry)
+        with tempfile.TemporaryDirectory() as td:
+            linux = os.path.join(td, "linux.txt")
+            darwin = os.path.join(td, "darwin.txt")
+            exporter.export_matrix_to_requirements_txt(
+                {linux: ["sys_platform==linux"], darwin: ["sys_platform==darwin"]},
+                include_specifiers=False,
+                exclude=["private"],
+            )
+
+            poetry.export_requirements.assert_called_once()
+            assert Path(linux).read_text() == "six\nuvloop\n"
+            assert Path(darwin).read_text() == "six\n"
+
     def test_export_to_requirements_txt_with_comments(self) -> None:
         mock_rf = MagicMock()
         mock_req = MagicMock()
@@ -160,6 +200,38 @@ class TestPackageExtractor:
             assert not dist_info.exists()
             assert not pycache.exists()
 
+    def test_do_clean_directory_files(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            package_dir = Path(td) / "pkg"
+            package_dir.mkdir()
+            (package_dir / "module.py").write_text("")
+            (package_dir / "module.c").write_text("")
+
+            extractor = PackageExtractor(poetry=MagicMock())
+            extractor._do_clean_directory(td, ["*.c"])
+
+            assert (package_dir / "module.py").exists()
+            assert not (package_dir / "module.c").exists()
+
+    def test_do_clean_directory_report(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            dist_info = Path(td) / "pkg-1.0.dist-info"
+            (dist_info / "licenses").mkdir(parents=True)
+            (dist_info / "METADATA").write_text("x" * 10)
+            (dist_info / "licenses" / "LICENSE").write_text("x" * 20)
+            (Path(td) / "pkg").mkdir()
+            (Path(td) / "pkg" / "module.py").write_text("")
+            (Path(td) / "pkg" / "module.c").write_text("x" * 5)
+            os.symlink(Path(td) / "pkg", Path(td) / "pkg" / "link.c")
+
+            extractor = PackageExtractor(poetry=MagicMock())
+            extractor._do_clean_directory(td, ["*/*.dist-info", "*.c"])
+
+            assert sorted(os.listdir(td)) == ["pkg"]
+            assert os.listdir(Path(td) / "pkg") == ["module.py"]
+            assert extractor.report.counters["clean.files"] == 4
+            assert extractor.report.sizes["clean.removed"] == 35 + len(str(Path(td) / "pkg"))
+
     def test_do_clean_directory_no_match(self) -> None:
         with tempfile.TemporaryDirectory() as td:
             keep_dir = Path(td) / "keep"
@@ -182,7 +254,7 @@ class TestPackageExtractor:
 
         poetry = MagicMock()
         poetry.export_requirements.return_value = mock_rf
-        poetry.run_command = MagicMock()
+        poetry.install_requirements = MagicMock()
 
         mock_listdir.return_value = []
 
@@ -194,10 +266,166 @@ class TestPackageExtractor:
             extractor.extract_packages(output_dir=str(output_dir), packages=["pkg1"])
 
             poetry.export_requirements.assert_called_once()
-            poetry.run_command.assert_called_once()
+            poetry.install_requirements.assert_called_once()
+
+    def test_extract_packages_all_unpacked(self) -> None:
+        mock_rf = MagicMock()
+        mock_rf.filter.return_value = mock_rf
+
+        poetry = MagicMock()
+        poetry.export_requirements.return_value = mock_rf
+
+        unpacker = MagicMock()
+        unpacker.unpack_requirements.return_value = []
+
+        extractor = PackageExtractor(poetry=poetry, unpacker=unpacker)
+        extractor.extract_packages(output_dir="output", packages=["pkg1"])
+
+        unpacker.unpack_requirements.assert_called_once_with(mock_rf, "output", ("*/*.dist-info", "*/__pycache__"))
+        poetry.install_requirements.assert_not_called()
+
+    @patch("versifier.core.os.listdir")
+    @patch("versifier.core.shutil.move")
+    def test_extract_packages_remaining(self, mock_move: MagicMock, mock_listdir: MagicMock) -> None:
+        mock_rf = MagicMock()
+        remaining_rf = MagicMock()
+        mock_rf.filter.side_effect = [mock_rf, remaining_rf]
+
+        poetry = MagicMock()
+        poetry.export_requirements.return_value = mock_rf
+
+        unpacker = MagicMock()
+        unpacker.unpack_requirements.return_value = ["pkg2"]
+
+        mock_listdir.return_value = []
+
+        with tempfile.TemporaryDirectory() as td:
+            extractor = PackageExtractor(poetry=poetry, unpacker=unpacker)
+            extractor.extract_packages(output_dir=str(Path(td) / "output"), packages=["pkg1", "pkg2"])
+
+        mock_rf.filter.assert_called_with(include=["pkg2"])
+        remaining_rf.dump_to.assert_called_once()
+        poetry.install_requirements.assert_called_once()
+
+    def test_extract_packages_reuses_venv(self) -> None:
+        mock_rf = MagicMock()
+        copied_rf = MagicMock()
+        mock_rf.filter.side_effect = [mock_rf, copied_rf]
+
+        poetry = MagicMock()
+        poetry.export_requirements.return_value = mock_rf
+
+        copier = MagicMock()
+        copier.copy_requirements.return_value = ["pkg2"]
+        unpacker = MagicMock()
+        unpacker.unpack_requirements.return_value = []
+
+        extractor = PackageExtractor(poetry=poetry, unpacker=unpacker, copier=copier)
+        extractor.extract_packages(output_dir="output", packages=["pkg1", "pkg2"])
+
+        copier.copy_requirements.assert_called_once_with(mock_rf, "output", ("*/*.dist-info", "*/__pycache__"))
+        mock_rf.filter.assert_called_with(include=["pkg2"])
+        unpacker.unpack_requirements.assert_called_once_with(copied_rf, "output", ("*/*.dist-info", "*/__pycache__"))
+        poetry.install_requirements.assert_not_called()
+
+    def test_extract_packages_merges_output(self) -> None:
+        def install_requirements(requirements_path: str, target_dir: str) -> None:
+            os.makedirs(os.path.join(target_dir, "ns", "b"))
+            Path(target_dir, "ns", "b", "__init__.py").write_text("")
+
+        mock_rf = MagicMock()
+        mock_rf.filter.return_value = mock_rf
+        poetry = MagicMock()
+        poetry.export_requirements.return_value = mock_rf
+        poetry.install_requirements.side_effect = install_requirements
+
+        with tempfile.TemporaryDirectory() as td:
+            (Path(td) / "ns" / "a").mkdir(parents=True)
+            (Path(td) / "ns" / "a" / "__init__.py").write_text("")
+
+            PackageExtractor(poetry=poetry).extract_packages(output_dir=td, packages=["b"])
+
+            assert sorted(os.listdir(Path(td) / "ns")) == ["a", "b"]
+
+    def test_extract_packages_sync(self) -> None:
+        def install_requirements(requirements_path: str, target_dir: str) -> None:
+            os.makedirs(os.path.join(target_dir, "pkg"))
+            Path(target_dir, "pkg", "__init__.py").write_text("VALUE = 1\n")
+
+        mock_rf = MagicMock()
+        mock_rf.filter.return_value = mock_rf
+        poetry = MagicMock()
+        poetry.export_requirements.return_value = mock_rf
+        poetry.install_requirements.side_effect = install_requirements
+
+        with tempfile.TemporaryDirectory() as td:
+            output_dir = Path(td) / "output"
+            (output_dir / "pkg").mkdir(parents=True)
+            (output_dir / "pkg" / "__init__.py").write_text("VALUE = 1\n")
+            (output_dir / "pkg" / "stale.py").write_text("")
+            os.utime(output_dir / "pkg" / "__init__.py", (1000, 1000))
+
+            extractor = PackageExtractor(poetry=poetry, sync=True)
+            extractor.extract_packages(output_dir=str(output_dir), packages=["pkg"])
+
+            assert os.listdir(output_dir / "pkg") == ["__init__.py"]
+            assert (output_dir / "pkg" / "__init__.py").stat().st_mtime == 1000
+            assert os.listdir(td) == ["output"]
+            assert extractor.report.counters["sync.removed"] == 1
+
+    def test_extract_packages_incremental(self) -> None:
+        installed: List[str] = []
+
+        def install_requirements(requirements_path: str, target_dir: str) -> None:
+            for requirement in RequirementsFile.from_file(requirements_path).requirements:
+                name, version = requirement.name, str(requirement.specifier).lstrip("=")
+                installed.append(f"{name}=={version}")
+                dist_info = os.path.join(target_dir, f"{name}-{version}.dist-info")
+                os.makedirs(dist_info)
+                os.makedirs(os.path.join(target_dir, name))
+                Path(target_dir, name, f"v{version.replace('.', '_')}.py").write_text("")
+                Path(dist_info, "METADATA").write_text(f"Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n")
+                Path(dist_info, "RECORD").write_text(f"{name}/v{version.replace('.', '_')}.py,,\n")
+
+        def export(lock: str) -> RequirementsFile:
+            path = Path(td) / "requirements.txt"
+            path.write_text(lock)
+            return RequirementsFile.from_file(str(path))
+
+        poetry = MagicMock()
+        poetry.install_requirements.side_effect = install_requirements
+
+        with tempfile.TemporaryDirectory() as td:
+            output_dir = Path(td) / "output"
+            poetry.export_requirements.return_value = export("a==1.0\nb==1.0\nc==1.0\n")
+            PackageExtractor(poetry=poetry, incremental=True).extract_packages(output_dir=str(output_dir))
+
+            assert installed == ["a==1.0", "b==1.0", "c==1.0"]
+            assert sorted(os.listdir(output_dir)) == [".versifier-manifest.json", "a", "b", "c"]
+            os.utime(output_dir / "a" / "v1_0.py", (1000, 1000))
+
+            installed.clear()
+            poetry.export_requirements.return_value = export("a==1.0\nb==2.0\n")
+            extractor = PackageExtractor(poetry=poetry, incremental=True)
+            extractor.extract_packages(output_dir=str(output_dir))
+
+            assert installed == ["b==2.0"]
+            assert sorted(os.listdir(output_dir)) == [".versifier-manifest.json", "a", "b"]
+            assert os.listdir(output_dir / "b") == ["v2_0.py"]
+            assert (output_dir / "a" / "v1_0.py").stat().st_mtime == 1000
+            assert extractor.report.counters["incremental.unchanged"] == 1
+            assert extractor.report.counters["incremental.changed"] == 1
+            assert extractor.report.counters["incremental.removed"] == 1
+            assert ExtractManifest.load(str(output_dir)).packages["b"].files == [os.path.join("b", "v2_0.py")]
 
 
 class TestPackageObfuscator:
+    @pytest.fixture(autouse=True)
+    def stubs_in_thread(self) -> Iterator[None]:
+        # patched stub generators only exist in this process
+        with patch("versifier.core.stub_executor", lambda: ThreadPoolExecutor(max_workers=1)):
+            yield
+
     @patch("versifier.core.shutil.move")
     @patch("versifier.core.PackageStubGenerator")
     def test_obfuscate_packages(self, mock_stub_gen_class: MagicMock, mock_move: MagicMock) -> None:
@@ -218,6 +446,51 @@ class TestPackageObfuscator:
             compiler.compile_packages.assert_called_once()
             mock_stub_gen.generate.assert_called_once()
 
+    @patch("versifier.core.PackageStubGenerator")
+    def test_obfuscate_packages_stages_next_to_output(self, mock_stub_gen_class: MagicMock) -> None:
+        def compile_packages(source_dir: str, output_dir: str, *args: object, **kwargs: object) -> None:
+            Path(output_dir, "pkg1.so").write_text("")
+            staged.append(output_dir)
+
+        staged: List[str] = []
+        compiler = MagicMock()
+        compiler.compile_packages.side_effect = compile_packages
+
+        with tempfile.TemporaryDirectory() as td:
+            root_dir = Path(td) / "root"
+            root_dir.mkdir()
+            output_dir = Path(td) / "build" / "output"
+
+            with patch("versifier.publish.shutil.move") as mock_move:
+                obfuscator = PackageObfuscator(compiler=compiler)
+                obfuscator.obfuscate_packages(packages=["pkg1"], root_dir=str(root_dir), output_dir=str(output_dir))
+
+            mock_move.assert_not_called()
+            assert os.path.dirname(staged[0]) == str(Path(td) / "build")
+            assert os.listdir(output_dir) == ["pkg1.so"]
+            assert os.listdir(Path(td) / "build") == ["output"]
+
+    @patch("versifier.core.PackageStubGenerator")
+    def test_obfuscate_packages_writes_wheels(self, mock_stub_gen_class: MagicMock) -> None:
+        def compile_packages(source_dir: str, output_dir: str, *args: object, **kwargs: object) -> None:
+            os.makedirs(os.path.join(output_dir, "pkg1"))
+            Path(output_dir, "pkg1", "__init__.so").write_text("")
+
+        compiler = MagicMock()
+        compiler.compile_packages.side_effect = compile_packages
+
+        with tempfile.TemporaryDirectory() as td:
+            root_dir = Path(td) / "root"
+            root_dir.mkdir()
+            output_dir = Path(td) / "build" / "output"
+
+            wheels = WheelWriter(versions={"pkg1": "1.0"}, tag="cp311-cp311-linux_x86_64")
+            obfuscator = PackageObfuscator(compiler=compiler, wheels=wheels)
+            obfuscator.obfuscate_packages(packages=["pkg1"], root_dir=str(root_dir), output_dir=str(output_dir))
+
+            assert os.listdir(output_dir) == ["pkg1-1.0-cp311-cp311-linux_x86_64.whl"]
+            assert os.listdir(Path(td) / "build") == ["output"]
+
     @patch("versifier.core.shutil.move")
     @patch("versifier.core.PackageStubGenerator")
     def test_obfuscate_packages_with_variants(self, mock_stub_gen_class: MagicMock, mock_move: MagicMock) -> None:
@@ -239,3 +512,289 @@ class TestPackageObfuscator:
             packages = call_args[1]["packages"] if "packages" in call_args[1] else call_args[0][2]
             assert "my-pkg" in packages
             assert "my_pkg" in packages
+
+    @patch("versifier.core.shutil.move")
+    @patch("versifier.core.PackageStubGenerator")
+    def test_obfuscate_packages_with_stripper(self, mock_stub_gen_class: MagicMock, mock_move: MagicMock) -> None:
+        compiler = MagicMock()
+        stripper = MagicMock()
+
+        with tempfile.TemporaryDirectory() as td:
+            obfuscator = PackageObfuscator(compiler=compiler, stripper=stripper)
+            obfuscator.obfuscate_packages(packages=["pkg1"], root_dir=td, output_dir=td)
+
+            stripper.strip_packages.assert_called_once()
+            assert "pkg1" in stripper.strip_packages.call_args[0][1]
+
+    @patch("versifier.core.shutil.move")
+    @patch("versifier.core.PackageStubGenerator")
+    def test_obfuscate_packages_with_selector(self, mock_stub_gen_class: MagicMock, mock_move: MagicMock) -> None:
+        compiler = MagicMock()
+        selector = MagicMock()
+        selector.select.return_value = ({"pkg1.hot"}, ["pkg1"])
+
+        with tempfile.TemporaryDirectory() as td:
+            obfuscator = PackageObfuscator(compiler=compiler, selector=selector)
+            obfuscator.obfuscate_packages(packages=["pkg1"], root_dir=td, output_dir=td)
+
+            assert compiler.compile_packages.call_args[1]["modules"] == {"pkg1.hot"}
+            assert selector.emit_fallback.call_args[0][2] == ["pkg1"]
+            mock_stub_gen_class.return_value.generate.assert_called_once()
+
+    @patch("versifier.core.shutil.move")
+    @patch("versifier.core.PackageStubGenerator")
+    def test_obfuscate_packages_with_deduplicator(self, mock_stub_gen_class: MagicMock, mock_move: MagicMock) -> None:
+        compiler = MagicMock()
+        selector = MagicMock()
+        selector.select.return_value = ({"pkg1.hot", "pkg1.reused"}, ["pkg1"])
+        deduplicator = MagicMock()
+        deduplicator.plan.return_value = ({"pkg1.reused": ("pkg1.reused", "digest")}, {"pkg1", "pkg1.hot"})
+
+        with tempfile.TemporaryDirectory() as td:
+            obfuscator = PackageObfuscator(compiler=compiler, selector=selector, deduplicator=deduplicator)
+            obfuscator.obfuscate_packages(packages=["pkg1"], root_dir=td, output_dir=td)
+
+            assert compiler.compile_packages.call_args[1]["modules"] == {"pkg1.hot"}
+            assert selector.emit_fallback.call_args[0][2] == ["pkg1"]
+            assert deduplicator.apply.call_args[0][3] == {"pkg1.reused": ("pkg1.reused", "digest")}
+
+    @patch("versifier.core.PackageStubGenerator")
+    def test_obfuscate_packages_dedupe_across_packages(self, mock_stub_gen_class: MagicMock) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            root_dir = Path(td) / "root"
+            for package in ("pkg_a", "pkg_b"):
+                (root_dir / package).mkdir(parents=True)
+                (root_dir / package / "__init__.py").write_text("")
+                (root_dir / package / "helpers.py").write_text("def helper():\n    return 1\n")
+            (root_dir / "pkg_b" / "own.py").write_text("VALUE = 2\n")
+            output_dir = Path(td) / "output"
+            deduplicator = ModuleDeduplicator()
+
+            obfuscator = PackageObfuscator(compiler=Bytecode(workers=1), deduplicator=deduplicator)
+            obfuscator.obfuscate_packages(
+                packages=["pkg_a", "pkg_b"], root_dir=str(root_dir), output_dir=str(output_dir)
+            )
+
+            assert (output_dir / "pkg_b" / "helpers.pyc").read_bytes() == (
+                output_dir / "pkg_a" / "helpers.pyc"
+            ).read_bytes()
+            assert (output_dir / "pkg_b" / "__init__.pyc").exists()
+            assert (output_dir / "pkg_b" / "own.pyc").exists()
+            assert deduplicator.report.counters["dedupe.reused_modules"] == 2
+
+    @patch("versifier.core.shutil.move")
+    @patch("versifier.core.PackageStubGenerator")
+    def test_obfuscate_packages_shares_index(self, mock_stub_gen_class: MagicMock, mock_move: MagicMock) -> None:
+        compiler = MagicMock()
+
+        with tempfile.TemporaryDirectory() as td:
+            (Path(td) / "pkg1").mkdir()
+            (Path(td) / "pkg1" / "__init__.py").write_text("")
+
+            obfuscator = PackageObfuscator(compiler=compiler)
+            obfuscator.obfuscate_packages(packages=["pkg1"], root_dir=td, output_dir=td)
+
+            index = compiler.compile_packages.call_args[1]["index"]
+            assert index.packages() == ["pkg1"]
+            assert mock_stub_gen_class.return_value.generate.call_args[1]["index"] is index
+
+    @patch("versifier.core.shutil.move")
+    @patch("versifier.core.PackageStubGenerator")
+    def test_obfuscate_packages_exclude(self, mock_stub_gen_class: MagicMock, mock_move: MagicMock) -> None:
+        compiler = MagicMock()
+
+        with tempfile.TemporaryDirectory() as td:
+            tests_dir = Path(td) / "pkg1" / "tests"
+            tests_dir.mkdir(parents=True)
+            (Path(td) / "pkg1" / "__init__.py").write_text("")
+            (tests_dir / "__init__.py").write_text("")
+            (tests_dir / "test_pkg1.py").write_text("def test_pkg1():\n    pass\n")
+
+            obfuscator = PackageObfuscator(compiler=compiler)
+            obfuscator.obfuscate_packages(packages=["pkg1"], root_dir=td, output_dir=td, exclude_packages=["*.tests"])
+
+            index = compiler.compile_packages.call_args[1]["index"]
+            assert not index.isdir(str(tests_dir))
+            assert obfuscator.report.counters["exclude.modules"] == 2
+            assert obfuscator.report.sizes["exclude.skipped"] > 0
+
+    @patch("versifier.core.shutil.move")
+    @patch("versifier.core.PackageStubGenerator")
+    def test_obfuscate_packages_stubs_in_worker(self, mock_stub_gen_class: MagicMock, mock_move: MagicMock) -> None:
+        compiler = MagicMock()
+        with tempfile.TemporaryDirectory() as td:
+            cur_dir = os.getcwd()
+            os.chdir(td)
+            try:
+                root_dir = os.path.abspath(".")
+                obfuscator = PackageObfuscator(compiler=compiler)
+                obfuscator.obfuscate_packages(packages=iter(["pkg1"]), root_dir=".", output_dir=td)
+            finally:
+                os.chdir(cur_dir)
+
+            generate_kwargs = mock_stub_gen_class.return_value.generate.call_args[1]
+            assert generate_kwargs["source_dir"] == root_dir
+            assert generate_kwargs["packages"] == ["pkg1"]
+            assert compiler.compile_packages.call_args[0][0] == generate_kwargs["source_dir"]
+            assert "stubs" in obfuscator.report.timings
+
+    @patch("versifier.core.shutil.move")
+    @patch("versifier.core.PackageStubGenerator")
+    def test_obfuscate_packages_stubs_error(self, mock_stub_gen_class: MagicMock, mock_move: MagicMock) -> None:
+        mock_stub_gen_class.return_value.generate.side_effect = SyntaxError("bad module")
+
+        with tempfile.TemporaryDirectory() as td:
+            obfuscator = PackageObfuscator(compiler=MagicMock())
+            with pytest.raises(SyntaxError):
+                obfuscator.obfuscate_packages(packages=["pkg1"], root_dir=td, output_dir=td)
+
+            mock_move.assert_not_called()
+
+    def test_obfuscate_packages_stubs_in_process(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            root_dir = Path(td) / "root"
+            (root_dir / "pkg1").mkdir(parents=True)
+            (root_dir / "pkg1" / "__init__.py").write_text("def f(a: int) -> int:\n    return a\n")
+            output_dir = Path(td) / "output"
+
+            with patch("versifier.core.stub_executor", wraps=stub_executor) as mock_executor:
+                obfuscator = PackageObfuscator(compiler=MagicMock())
+                obfuscator.obfuscate_packages(packages=["pkg1"], root_dir=str(root_dir), output_dir=str(output_dir))
+
+            mock_executor.assert_called_once()
+            assert "def f(a: int) -> int" in (output_dir / "pkg1-stubs" / "__init__.pyi").read_text()
+            assert "stubs" in obfuscator.report.timings
+
+
+class TestMergeTree:
+    def test_merge_existing_dirs(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            source = Path(td) / "source"
+            target = Path(td) / "target"
+            (source / "pkg").mkdir(parents=True)
+            (source / "pkg" / "a.pyc").write_text("new")
+            (target / "pkg").mkdir(parents=True)
+            (target / "pkg" / "a.pyc").write_text("stale")
+            (target / "pkg" / "b.pyc").write_text("b")
+
+            assert merge_tree(str(source), str(target)) == []
+
+            assert (target / "pkg" / "a.pyc").read_text() == "new"
+            assert (target / "pkg" / "b.pyc").read_text() == "b"
+            assert not (target / "pkg" / "pkg").exists()
+
+    def test_merge_claimed(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            target = Path(td) / "target"
+            claimed: set = set()
+            for name, same, changed in [("first", "same", "first"), ("second", "same", "second")]:
+                source = Path(td) / name
+                (source / "pkg").mkdir(parents=True)
+                (source / "pkg" / "same.pyc").write_text(same)
+                (source / "pkg" / "changed.pyc").write_text(changed)
+                (source / "pkg" / f"{name}.pyc").write_text(name)
+                (source / "shared").mkdir(parents=True)
+                (source / "shared" / "same.pyc").write_text(same)
+                (source / "shared" / f"{name}.pyc").write_text(name)
+                (source / name).write_text(name)
+                collisions = merge_tree(str(source), str(target), claimed)
+
+            # the conflicting package of the second merge is kept out as a whole
+            assert collisions == [str(target / "pkg")]
+            assert (target / "pkg" / "changed.pyc").read_text() == "first"
+            assert (target / "pkg" / "first.pyc").exists()
+            assert not (target / "pkg" / "second.pyc").exists()
+            assert (target / "shared" / "first.pyc").exists()
+            assert (target / "shared" / "second.pyc").exists()
+            assert (target / "first").exists()
+            assert (target / "second").exists()
+
+    def test_merge_claimed_file_and_dir(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            target = Path(td) / "target"
+            first = Path(td) / "first"
+            second = Path(td) / "second"
+            (first / "pkg").mkdir(parents=True)
+            (first / "pkg" / "mod.pyc").write_text("first")
+            (second / "pkg" / "mod.pyc").mkdir(parents=True)
+            (second / "pkg" / "mod.pyc" / "inner.pyc").write_text("second")
+            claimed: set = set()
+
+            assert merge_tree(str(first), str(target), claimed) == []
+            assert merge_tree(str(second), str(target), claimed) == [str(target / "pkg")]
+            assert (target / "pkg" / "mod.pyc").read_text() == "first"
+
+
+class TestSyncTree:
+    def test_sync_tree(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            source = Path(td) / "source"
+            target = Path(td) / "target"
+            for root in (source, target):
+                (root / "pkg").mkdir(parents=True)
+                (root / "pkg" / "same.py").write_text("same")
+                (root / "pkg" / "changed.py").write_text(f"{root.name}")
+
+            (source / "pkg" / "new.py").write_text("new")
+            (source / "pkg" / "sub").mkdir()
+            (source / "pkg" / "sub" / "a.py").write_text("")
+            (source / "pkg" / "was_dir").write_text("")
+            (target / "pkg" / "gone.py").write_text("")
+            (target / "pkg" / "was_dir").mkdir()
+            (target / "pkg" / "was_dir" / "a.py").write_text("")
+            (target / "stale").mkdir()
+            (target / "stale" / "a.py").write_text("")
+            os.utime(target / "pkg" / "same.py", (1000, 1000))
+            same_inode = (target / "pkg" / "same.py").stat().st_ino
+
+            report = BuildReport()
+            sync_tree(str(source), str(target), report)
+
+            assert sorted(os.listdir(target)) == ["pkg"]
+            assert sorted(os.listdir(target / "pkg")) == ["changed.py", "new.py", "same.py", "sub", "was_dir"]
+            assert (target / "pkg" / "changed.py").read_text() == "source"
+            assert (target / "pkg" / "was_dir").is_file()
+            assert (target / "pkg" / "same.py").stat().st_mtime == 1000
+            assert (target / "pkg" / "same.py").stat().st_ino == same_inode
+            assert report.counters["sync.unchanged"] == 1
+            assert report.counters["sync.written"] == 4
+            assert report.counters["sync.removed"] == 3
+
+
+class TestObfuscateProjectDir:
+    @pytest.fixture(autouse=True)
+    def stubs_in_thread(self) -> Iterator[None]:
+        # patched stub generators only exist in this process
+        with patch("versifier.core.stub_executor", lambda: ThreadPoolExecutor(max_workers=1)):
+            yield
+
+    @patch("versifier.core.shutil.move")
+    @patch("versifier.core.PackageStubGenerator")
+    def test_obfuscate_project_dir(self, mock_stub_gen_class: MagicMock, mock_move: MagicMock) -> None:
+        compiler = MagicMock()
+        with tempfile.TemporaryDirectory() as td:
+            (Path(td) / "pkg1" / "tests").mkdir(parents=True)
+            (Path(td) / "pkg1" / "__init__.py").write_text("")
+            (Path(td) / "pkg1" / "tests" / "__init__.py").write_text("")
+
+            core.init_project_worker(dedupe=True)
+            try:
+                obfuscator = PackageObfuscator(compiler=compiler)
+                report = obfuscate_project_dir(obfuscator, td, td, ["*.tests"])
+            finally:
+                core.init_project_worker(dedupe=False)
+
+            assert compiler.compile_packages.call_args[0][2] == {"pkg1"}
+            assert obfuscator.deduplicator is not None
+            assert obfuscator.deduplicator.report is report
+            assert report.counters["exclude.modules"] == 1
+
+    def test_init_project_worker_store_dir(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            store_dir = os.path.join(td, "dedupe")
+            core.init_project_worker(dedupe=True, store_dir=store_dir)
+            try:
+                assert core._worker_deduplicator is not None
+                assert os.path.dirname(core._worker_deduplicator.store.name) == store_dir
+            finally:
+                core.init_project_worker(dedupe=False)
@@ -0,0 +1,112 @@
+import tempfile
+from pathlib import Path
+
+from versifier.compiler import Bytecode
+from versifier.dedupe import ModuleDeduplicator, find_artifacts, list_modules
+
+
+def make_project(root: Path, package: str, helper: str = "def helper():\n    return 1\n") -> None:
+    package_dir = root / package
+    package_dir.mkdir(parents=True)
+    (package_dir / "__init__.py").write_text("")
+    (package_dir / "helpers.py").write_text(helper)
+
+
+class TestListModules:
+    def test_list_modules(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            make_project(Path(td), "pkg")
+            (Path(td) / "single.py").write_text("")
+
+            modules = list_modules(td, ["pkg", "single", "missing"])
+
+            assert set(modules) == {"pkg", "pkg.helpers", "single"}
+            assert modules["single"] == str(Path(td) / "single.py")
+
+
+class TestFindArtifacts:
+    def test_find_artifacts(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            package_dir = Path(td) / "pkg"
+            package_dir.mkdir()
+            (package_dir / "__init__.pyc").write_bytes(b"")
+            (package_dir / "helpers.pyc").write_bytes(b"")
+            (Path(td) / "pkg.pyc").write_bytes(b"")
+
+            assert find_artifacts(td, "pkg", True) == [str(package_dir / "__init__.pyc")]
+            assert find_artifacts(td, "pkg.helpers", False) == [str(package_dir / "helpers.pyc")]
+            assert find_artifacts(td, "pkg.missing", False) == []
+
+
+class TestModuleDeduplicator:
+    def build(self, dedupe: ModuleDeduplicator, source_dir: Path, output_dir: Path) -> set:
+        reusable, to_compile = dedupe.plan(str(source_dir), ["pkg"])
+        Bytecode(workers=1).compile_packages(str(source_dir), str(output_dir), ["pkg"], modules=to_compile)
+        dedupe.apply(str(source_dir), str(output_dir), ["pkg"], reusable)
+        return to_compile
+
+    def test_reuse_identical_modules(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            root = Path(td)
+            make_project(root / "a", "pkg")
+            make_project(root / "b", "pkg")
+            dedupe = ModuleDeduplicator()
+
+            assert self.build(dedupe, root / "a", root / "out_a") == {"pkg", "pkg.helpers"}
+            assert self.build(dedupe, root / "b", root / "out_b") == set()
+
+            assert (root / "out_b" / "pkg" / "helpers.pyc").read_bytes() == (
+                root / "out_a" / "pkg" / "helpers.pyc"
+            ).read_bytes()
+            assert (root / "out_b" / "pkg" / "__init__.pyc").exists()
+            assert dedupe.report.counters["dedupe.reused_modules"] == 2
+            assert dedupe.report.sizes["dedupe.reused"] > 0
+
+    def test_reuse_bytecode_across_names(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            root = Path(td)
+            make_project(root / "src", "pkg_a")
+            make_project(root / "src", "pkg_b")
+            dedupe = ModuleDeduplicator()
+
+            reusable, to_compile = dedupe.plan(str(root / "src"), ["pkg_a", "pkg_b"], portable=lambda name: True)
+            assert to_compile == {"pkg_a", "pkg_a.helpers"}
+            Bytecode(workers=1).compile_packages(str(root / "src"), str(root / "out"), ["pkg_a"], modules=to_compile)
+            dedupe.apply(str(root / "src"), str(root / "out"), ["pkg_a", "pkg_b"], reusable)
+
+            assert (root / "out" / "pkg_b" / "helpers.pyc").read_bytes() == (
+                root / "out" / "pkg_a" / "helpers.pyc"
+            ).read_bytes()
+            assert (root / "out" / "pkg_b" / "__init__.pyc").exists()
+            # extensions embed the module name, without portable every module is compiled
+            make_project(root / "src", "pkg_c")
+            assert dedupe.plan(str(root / "src"), ["pkg_c"])[1] == {"pkg_c", "pkg_c.helpers"}
+
+    def test_changed_module_is_compiled(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            root = Path(td)
+            make_project(root / "a", "pkg")
+            make_project(root / "b", "pkg", helper="def helper():\n    return 2\n")
+            dedupe = ModuleDeduplicator()
+
+            self.build(dedupe, root / "a", root / "out_a")
+
+            assert self.build(dedupe, root / "b", root / "out_b") == {"pkg.helpers"}
+            assert dedupe.report.counters["dedupe.reused_modules"] == 1
+            assert len(dedupe.artifacts) == 3
+
+    def test_renamed_module_is_compiled(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            root = Path(td)
+            make_project(root, "pkg")
+            make_project(root, "other")
+            dedupe = ModuleDeduplicator()
+
+            reusable, to_compile = dedupe.plan(str(root), ["pkg"])
+            Bytecode(workers=1).compile_packages(str(root), str(root / "out"), ["pkg"], modules=to_compile)
+            dedupe.apply(str(root), str(root / "out"), ["pkg"], reusable)
+            reusable, to_compile = dedupe.plan(str(root), ["other"])
+
+            assert reusable == {}
+            assert to_compile == {"other", "other.helpers"}
+            assert dedupe.report.counters["dedupe.renamed_modules"] == 2
@@ -0,0 +1,103 @@
+import os
+import tempfile
+from pathlib import Path
+
+from versifier.fileindex import FileIndex, compile_patterns
+
+
+def make_tree(root: Path) -> None:
+    (root / "pkg" / "sub").mkdir(parents=True)
+    (root / "pkg" / "__init__.py").write_text("")
+    (root / "pkg" / "module.py").write_text("")
+    (root / "pkg" / "sub" / "__init__.py").write_text("")
+    (root / "pkg" / "__pycache__").mkdir()
+    (root / "pkg" / "__pycache__" / "module.cpython-311.pyc").write_text("")
+    (root / "docs").mkdir()
+    (root / "single.py").write_text("")
+
+
+class TestFileIndex:
+    def test_scan(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            make_tree(Path(td))
+            index = FileIndex.scan(td)
+
+            assert index.packages() == ["pkg"]
+            assert index.isdir(os.path.join(td, "pkg", "sub"))
+            assert not index.isdir(os.path.join(td, "pkg", "__pycache__"))
+            assert index.isfile(os.path.join(td, "single.py"))
+            assert not index.isfile(os.path.join(td, "pkg"))
+            assert index.listdir(os.path.join(td, "pkg")) == ["sub", "__init__.py", "module.py"]
+
+    def test_walk_matches_os_walk(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            make_tree(Path(td))
+            index = FileIndex.scan(td, ignore_patterns=())
+            package_dir = os.path.join(td, "pkg")
+
+            expected = {(root, tuple(sorted(dirs)), tuple(sorted(files))) for root, dirs, files in os.walk(package_dir)}
+            actual = {(root, tuple(dirs), tuple(files)) for root, dirs, files in index.walk(package_dir)}
+
+            assert actual == expected
+
+    def test_walk_prune(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            make_tree(Path(td))
+            index = FileIndex.scan(td)
+
+            roots = []
+            for root, dirs, _ in index.walk(td):
+                roots.append(os.path.relpath(root, td))
+                dirs[:] = [d for d in dirs if d != "pkg"]
+
+            assert roots == [".", "docs"]
+            assert list(index.walk(os.path.join(td, "missing"))) == []
+
+    def test_relative_root(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            make_tree(Path(td))
+            cur_dir = os.getcwd()
+            os.chdir(td)
+            try:
+                index = FileIndex.scan("pkg")
+                assert [root for root, _, _ in index.walk("pkg")] == ["pkg", os.path.join("pkg", "sub")]
+                assert index.isfile(os.path.join(td, "pkg", "module.py"))
+            finally:
+                os.chdir(cur_dir)
+
+    def test_prune(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            make_tree(Path(td))
+            (Path(td) / "pkg" / "tests").mkdir()
+            (Path(td) / "pkg" / "tests" / "__init__.py").write_text("")
+            (Path(td) / "pkg" / "tests" / "data").mkdir()
+            (Path(td) / "pkg" / "tests" / "data" / "case.json").write_text("{}")
+            (Path(td) / "pkg" / "sub" / "tests.py").write_text("")
+            index = FileIndex.scan(td)
+
+            dropped = index.prune(["*.tests"])
+
+            assert sorted(os.path.relpath(i, td) for i in dropped) == [
+                os.path.join("pkg", "sub", "tests.py"),
+                os.path.join("pkg", "tests", "__init__.py"),
+                os.path.join("pkg", "tests", "data", "case.json"),
+            ]
+            assert not index.isdir(os.path.join(td, "pkg", "tests", "data"))
+            assert [os.path.relpath(root, td) for root, _, _ in index.walk(td)] == [
+                ".",
+                "docs",
+                "pkg",
+                os.path.join("pkg", "sub"),
+            ]
+            assert index.prune([]) == []
+
+
+def test_compile_patterns() -> None:
+    matches = compile_patterns(["*/*.dist-info", "*/__pycache__", "*.c"])
+
+    assert matches("out/pkg-1.0.dist-info")
+    assert matches("out/pkg/__pycache__")
+    assert matches("out/pkg/module.c")
+    assert not matches("out/pkg/module.py")
+    assert not matches("out/pkg/__pycache__/module.pyc")
+    assert not compile_patterns([])("anything")
@@ -0,0 +1,131 @@
+import cProfile
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+from versifier.fileindex import FileIndex
+from versifier.hotspot import HotModuleSelector, resolve_module
+
+
+def make_package(root: Path) -> None:
+    package_dir = root / "hotpkg"
+    package_dir.mkdir(parents=True)
+    (package_dir / "__init__.py").write_text("def cold():\n    return 1\n")
+    (package_dir / "hot.py").write_text(
+        "def inner():\n    return sum(range(1000))\n\n\ndef work():\n    return [inner() for _ in range(2000)]\n"
+    )
+
+
+def make_profile(root: Path, stats_path: Path) -> None:
+    sys.path.insert(0, str(root))
+    try:
+        import hotpkg
+        import hotpkg.hot
+
+        profiler = cProfile.Profile()
+        profiler.runcall(hotpkg.hot.work)
+        profiler.runcall(hotpkg.cold)
+        profiler.dump_stats(str(stats_path))
+    finally:
+        sys.path.remove(str(root))
+        for name in ["hotpkg", "hotpkg.hot"]:
+            sys.modules.pop(name, None)
+
+
+class TestResolveModule:
+    def test_resolve_module(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            make_package(Path(td))
+
+            assert resolve_module(td, {"hotpkg"}, "/srv/app/hotpkg/hot.py") == "hotpkg.hot"
+            assert resolve_module(td, {"hotpkg"}, "/srv/app/hotpkg/__init__.py") == "hotpkg"
+            assert resolve_module(td, {"hotpkg"}, "/srv/app/hotpkg/missing.py") is None
+            assert resolve_module(td, {"hotpkg"}, "~") is None
+
+            index = FileIndex.scan(td)
+            assert resolve_module(td, {"hotpkg"}, "/srv/app/hotpkg/hot.py", index) == "hotpkg.hot"
+            assert resolve_module(td, {"hotpkg"}, "/srv/app/hotpkg/missing.py", index) is None
+
+
+class TestHotModuleSelector:
+    def test_select(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            root = Path(td) / "src"
+            make_package(root)
+            stats_path = Path(td) / "profile.out"
+            make_profile(root, stats_path)
+
+            selector = HotModuleSelector(stats_path=str(stats_path), threshold=0.000_5)
+            times = selector.module_times(str(root), ["hotpkg"])
+            hot_modules, cold_modules = selector.select(str(root), ["hotpkg"])
+
+            assert times["hotpkg.hot"] > times["hotpkg"]
+            assert hot_modules == {"hotpkg.hot"}
+            assert cold_modules == ["hotpkg"]
+            assert selector.report.counters["profile.hot_modules"] == 1
+
+    def test_select_covers_every_module(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            root = Path(td) / "src"
+            make_package(root)
+            (root / "hotpkg" / "__main__.py").write_text("")
+            # a namespace dir, skipped by the import benchmark but compiled all the same
+            (root / "hotpkg" / "sub").mkdir()
+            (root / "hotpkg" / "sub" / "helper.py").write_text("")
+            stats_path = Path(td) / "profile.out"
+            make_profile(root, stats_path)
+
+            selector = HotModuleSelector(stats_path=str(stats_path), threshold=0.000_5)
+            hot_modules, cold_modules = selector.select(str(root), ["hotpkg"])
+
+            assert hot_modules == {"hotpkg.hot"}
+            assert cold_modules == ["hotpkg", "hotpkg.__main__", "hotpkg.sub.helper"]
+
+    def test_emit_fallback_bytecode(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            root = Path(td) / "src"
+            make_package(root)
+            output = Path(td) / "output"
+
+            selector = HotModuleSelector(stats_path="unused")
+            selector.emit_fallback(str(root), str(output), ["hotpkg", "hotpkg.hot"])
+
+            assert (output / "hotpkg" / "__init__.pyc").exists()
+            assert (output / "hotpkg" / "hot.pyc").exists()
+
+    def test_emit_fallback_source(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            root = Path(td) / "src"
+            make_package(root)
+            output = Path(td) / "output"
+
+            selector = HotModuleSelector(stats_path="unused", fallback="source")
+            selector.emit_fallback(str(root), str(output), ["hotpkg"])
+
+            assert (output / "hotpkg" / "__init__.py").read_text() == (root / "hotpkg" / "__init__.py").read_text()
+            assert not (output / "hotpkg" / "hot.py").exists()
+
+    def test_emit_fallback_source_hardlink(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            root = Path(td) / "src"
+            make_package(root)
+            output = Path(td) / "output"
+
+            selector = HotModuleSelector(stats_path="unused", fallback="source", link_mode="hardlink")
+            selector.emit_fallback(str(root), str(output), ["hotpkg"])
+
+            assert os.path.samefile(output / "hotpkg" / "__init__.py", root / "hotpkg" / "__init__.py")
+
+    def test_emit_fallback_skip_single_module(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            root = Path(td) / "src"
+            make_package(root)
+            output = Path(td) / "output"
+            output.mkdir()
+            (output / "hotpkg.so").write_text("")
+
+            selector = HotModuleSelector(stats_path="unused")
+            selector.emit_fallback(str(root), str(output), ["hotpkg"])
+
+            assert not (output / "hotpkg").exists()
@@ -1,5 +1,6 @@
 import os
 import tempfile
+from dataclasses import replace
 from pathlib import Path
 from unittest.mock import MagicMock, patch
 
@@ -10,6 +11,8 @@ from versifier.__main__ import (
     Context,
     cli,
 )
+from versifier.compiler import Bytecode
+from versifier.poetry import RequirementsFile
 
 
 class TestContext:
@@ -38,6 +41,22 @@ class TestContext:
         poetry = ctx.poetry
         assert poetry.poetry_path == "/custom/poetry"
 
+    def test_context_export_cache(self) -> None:
+        ctx = Context(
+            root_path="/root",
+            config_path="pyproject.toml",
+            poetry_path="poetry",
+            uv_path="uv",
+            nuitka_path="nuitka3",
+        )
+        assert ctx.poetry.cache is None
+
+        ctx = replace(ctx, export_cache_dir="cache")
+        assert ctx.poetry.cache is not None
+        assert ctx.poetry.cache.root == os.path.abspath("cache")
+        assert ctx.uv.cache is not None
+        assert ctx.uv.cache.report is ctx.report
+
     def test_context_compiler_property(self) -> None:
         ctx = Context(
             root_path="/root",
@@ -256,6 +275,42 @@ class TestCLI:
                 print(result.output)
             assert result.exit_code == 0
 
+    @patch("versifier.__main__.core.DependencyExporter")
+    def test_poetry_to_requirements_matrix(self, mock_exporter_class: MagicMock) -> None:
+        mock_exporter = MagicMock()
+        mock_exporter_class.return_value = mock_exporter
+
+        runner = CliRunner()
+        with runner.isolated_filesystem():
+            Path("pyproject.toml").write_text("[tool.poetry]\nname = 'test'\n")
+
+            result = runner.invoke(
+                cli,
+                [
+                    "poetry-to-requirements",
+                    "-M",
+                    "linux.txt:sys_platform==linux,python_version==3.12",
+                    "-M",
+                    "darwin.txt:sys_platform==darwin",
+                ],
+            )
+
+            assert result.exit_code == 0, result.output
+            mock_exporter.export_to_requirements_txt.assert_not_called()
+            environments = mock_exporter.export_matrix_to_requirements_txt.call_args[0][0]
+            assert environments == {
+                "linux.txt": ["sys_platform==linux", "python_version==3.12"],
+                "darwin.txt": ["sys_platform==darwin"],
+            }
+
+            result = runner.invoke(cli, ["poetry-to-requirements", "-M", "sys_platform==linux"])
+            assert result.exit_code != 0
+            assert "--matrix" in result.output
+
+            result = runner.invoke(cli, ["poetry-to-requirements", "-M", "a.txt:", "-m", "sys_platform==linux"])
+            assert result.exit_code != 0
+            assert "can not be used together" in result.output
+
     @patch("versifier.__main__.core.DependencyExporter")
     def test_poetry_to_requirements_stdout(self, mock_exporter_class: MagicMock) -> None:
         mock_exporter = MagicMock()
@@ -346,6 +401,49 @@ class TestCLI:
             assert result.exit_code != 0
             assert "No private packages found" in result.output
 
+    @patch("versifier.__main__.core.PackageExtractor")
+    def test_extract_private_packages_offline(self, mock_extractor_class: MagicMock) -> None:
+        mock_extractor = MagicMock()
+        mock_extractor.extract_packages.side_effect = LookupError("No compatible wheel in the cache for: pkg1==1.0")
+        mock_extractor_class.return_value = mock_extractor
+
+        runner = CliRunner()
+        with runner.isolated_filesystem():
+            Path("pyproject.toml").write_text("[tool.poetry]\nname = 'test'\n")
+            Path("poetry.lock").write_text("")
+
+            result = runner.invoke(cli, ["extract-private-packages", "-P", "pkg1", "--offline"])
+            assert result.exit_code != 0
+            assert "--offline needs a --wheel-cache-dir" in result.output
+            mock_extractor.extract_packages.assert_not_called()
+
+            result = runner.invoke(
+                cli, ["extract-private-packages", "-P", "pkg1", "--offline", "--wheel-cache-dir", "wheels"]
+            )
+            assert result.exit_code != 0
+            assert "pkg1==1.0" in result.output
+
+            unpacker = mock_extractor_class.call_args[1]["unpacker"]
+            assert unpacker.offline
+            assert unpacker.cache.root == os.path.abspath("wheels")
+            assert unpacker.cache.max_size == 1024 * 1024 * 1024
+
+    @patch("versifier.__main__.core.PackageExtractor")
+    def test_extract_private_packages_incremental(self, mock_extractor_class: MagicMock) -> None:
+        runner = CliRunner()
+        with runner.isolated_filesystem():
+            Path("pyproject.toml").write_text("[tool.poetry]\nname = 'test'\n")
+            Path("poetry.lock").write_text("")
+
+            result = runner.invoke(cli, ["extract-private-packages", "-P", "pkg1", "--incremental", "--sync-output"])
+            assert result.exit_code != 0
+            assert "can not be used together" in result.output
+            mock_extractor_class.assert_not_called()
+
+            result = runner.invoke(cli, ["extract-private-packages", "-P", "pkg1", "--incremental"])
+            assert result.exit_code == 0
+            assert mock_extractor_class.call_args[1]["incremental"]
+
     @patch("versifier.__main__.core.PackageExtractor")
     def test_extract_private_packages_from_config(self, mock_extractor_class: MagicMock) -> None:
         mock_extractor = MagicMock()
@@ -396,6 +494,66 @@ class TestCLI:
                 print(result.output)
             assert result.exit_code == 0
 
+    def test_obfuscate_project_dirs_jobs(self) -> None:
+        runner = CliRunner()
+        with runner.isolated_filesystem(), patch("versifier.__main__.Context.make_compiler") as mock_make_compiler:
+            mock_make_compiler.return_value = Bytecode(workers=1)
+            Path("pyproject.toml").write_text("[tool.poetry]\nname = 'test'\n")
+            for sub_dir, package in [("a", "pkg"), ("b", "pkg"), ("c", "other")]:
+                os.makedirs(f"{sub_dir}/{package}")
+                Path(f"{sub_dir}/{package}/__init__.py").write_text(f"NAME = {sub_dir!r}\n")
+
+            result = runner.invoke(
+                cli,
+                ["obfuscate-project-dirs", "-o", "output", "-d", "a", "-d", "b", "-d", "c", "--jobs", "2"],
+            )
+
+            assert result.exit_code == 0, result.output
+            assert sorted(os.listdir("output")) == ["other", "other-stubs", "pkg", "pkg-stubs"]
+            assert sorted(os.listdir(".")) == ["a", "b", "c", "output", "pyproject.toml"]
+            assert mock_make_compiler.call_args[1]["jobs"] >= 1
+
+    def test_obfuscate_project_dirs_jobs_dedupe(self) -> None:
+        runner = CliRunner()
+        with runner.isolated_filesystem(), patch("versifier.__main__.Context.make_compiler") as mock_make_compiler:
+            mock_make_compiler.return_value = Bytecode(workers=1)
+            Path("pyproject.toml").write_text("[tool.poetry]\nname = 'test'\n")
+            for sub_dir in ("a", "b"):
+                os.makedirs(f"{sub_dir}/pkg")
+                Path(f"{sub_dir}/pkg/__init__.py").write_text("")
+
+            result = runner.invoke(
+                cli, ["obfuscate-project-dirs", "-o", "output", "-d", "a", "-d", "b", "-j", "2", "--dedupe-modules"]
+            )
+
+            assert result.exit_code == 0, result.output
+            # the worker stores live in the staging dir next to the output, which is removed
+            assert sorted(os.listdir(".")) == ["a", "b", "output", "pyproject.toml"]
+
+    def test_obfuscate_project_dirs_sync_output(self) -> None:
+        runner = CliRunner()
+        with runner.isolated_filesystem(), patch("versifier.__main__.Context.make_compiler") as mock_make_compiler:
+            mock_make_compiler.return_value = Bytecode(workers=1)
+            Path("pyproject.toml").write_text("[tool.poetry]\nname = 'test'\n")
+            os.makedirs("src/pkg")
+            Path("src/pkg/__init__.py").write_text("")
+            Path("src/pkg/keep.py").write_text("VALUE = 1\n")
+            Path("src/pkg/gone.py").write_text("VALUE = 2\n")
+            args = ["obfuscate-project-dirs", "-o", "output", "-d", "src", "--sync-output"]
+
+            result = runner.invoke(cli, args)
+            assert result.exit_code == 0, result.output
+            kept = os.stat("output/pkg/keep.pyc")
+
+            os.remove("src/pkg/gone.py")
+            result = runner.invoke(cli, args)
+            assert result.exit_code == 0, result.output
+
+            assert sorted(os.listdir("output/pkg")) == ["__init__.pyc", "keep.pyc"]
+            assert os.stat("output/pkg/keep.pyc").st_ino == kept.st_ino
+            assert os.stat("output/pkg/keep.pyc").st_mtime_ns == kept.st_mtime_ns
+            assert sorted(os.listdir(".")) == ["output", "pyproject.toml", "src"]
+
     @patch("versifier.__main__.core.PackageObfuscator")
     def test_obfuscate_project_dirs_from_config(self, mock_obfuscator_class: MagicMock) -> None:
         mock_obfuscator = MagicMock()
@@ -451,6 +609,29 @@ class TestCLI:
                 print(result.output)
             assert result.exit_code == 0
 
+    @patch("versifier.__main__.core.PackageObfuscator")
+    @patch("versifier.__main__.core.PackageExtractor")
+    def test_obfuscate_private_packages_output_wheels(
+        self, mock_extractor_class: MagicMock, mock_obfuscator_class: MagicMock
+    ) -> None:
+
+        runner = CliRunner()
+        with runner.isolated_filesystem():
+            Path("pyproject.toml").write_text("[tool.poetry]\nname = 'test'\n")
+            Path("poetry.lock").write_text("")
+            Path("requirements.txt").write_text("pkg1==1.2.0\npkg2>=1.0\n")
+            rf = RequirementsFile.from_file("requirements.txt")
+            mock_extractor_class.return_value.extract_packages.return_value = rf
+
+            result = runner.invoke(
+                cli, ["obfuscate-private-packages", "-P", "pkg1", "--output-wheels", "--wheel-version", "0.1.0"]
+            )
+            assert result.exit_code == 0, result.output
+
+            wheels = mock_obfuscator_class.call_args[1]["wheels"]
+            assert wheels.version == "0.1.0"
+            assert wheels.versions == {"pkg1": "1.2.0"}
+
     def test_obfuscate_private_packages_no_packages(self) -> None:
         runner = CliRunner()
         with runner.isolated_filesystem():
@@ -707,3 +888,63 @@ class TestCLI:
             if result.exit_code != 0:
                 print(result.output)
             assert result.exit_code == 0
+
+    @patch("versifier.__main__.bench.ImportBenchmark")
+    def test_bench_import(self, mock_benchmark_class: MagicMock) -> None:
+        from versifier.bench import ImportResult
+
+        mock_benchmark = MagicMock()
+        mock_benchmark.compare.return_value = [ImportResult(module="pkg", source_us=100, output_us=80)]
+        mock_benchmark_class.return_value = mock_benchmark
+
+        runner = CliRunner()
+        with runner.isolated_filesystem():
+            os.makedirs("src/pkg")
+            Path("src/pkg/__init__.py").write_text("")
+
+            result = runner.invoke(cli, ["bench-import", "-s", "src", "-o", "output"])
+
+            if result.exit_code != 0:
+                print(result.output)
+            assert result.exit_code == 0
+            assert mock_benchmark.compare.call_args[1]["packages"] == ["pkg"]
+            assert "pkg" in result.output
+
+    def test_bench_import_no_packages(self) -> None:
+        runner = CliRunner()
+        with runner.isolated_filesystem():
+            result = runner.invoke(cli, ["bench-import", "-s", ".", "-o", "output"])
+
+            assert result.exit_code != 0
+            assert "No packages found" in result.output
+
+    @patch("versifier.__main__.bench.RuntimeBenchmark")
+    def test_bench_runtime(self, mock_benchmark_class: MagicMock) -> None:
+        from versifier.bench import RuntimeResult
+
+        mock_benchmark = MagicMock()
+        mock_benchmark.compare.return_value = [RuntimeResult(name="bench_f", source_us=2.0, output_us=1.0)]
+        mock_benchmark_class.return_value = mock_benchmark
+
+        runner = CliRunner()
+        with runner.isolated_filesystem():
+            result = runner.invoke(cli, ["bench-runtime", "-s", "src", "-o", "output", "-b", "benchmarks.py"])
+
+            if result.exit_code != 0:
+                print(result.output)
+            assert result.exit_code == 0
+            assert "bench_f" in result.output
+            assert "geometric mean speedup: 2.00" in result.output
+
+    @patch("versifier.__main__.bench.RuntimeBenchmark")
+    def test_bench_runtime_no_results(self, mock_benchmark_class: MagicMock) -> None:
+        mock_benchmark = MagicMock()
+        mock_benchmark.compare.return_value = []
+        mock_benchmark_class.return_value = mock_benchmark
+
+        runner = CliRunner()
+        with runner.isolated_filesystem():
+            result = runner.invoke(cli, ["bench-runtime", "-b", "benchmarks.py"])
+
+            assert result.exit_code != 0
+            assert "No benchmark results" in result.output
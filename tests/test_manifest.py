@@ -0,0 +1,105 @@
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict
+
+from versifier.manifest import MANIFEST_NAME, ExtractManifest, installed_files
+from versifier.poetry import RequirementsFile
+
+
+def install(site_dir: Path, name: str, version: str, files: Dict[str, str]) -> None:
+    dist_info = f"{name}-{version}.dist-info"
+    (site_dir / dist_info).mkdir(parents=True)
+    (site_dir / dist_info / "METADATA").write_text(f"Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n")
+    records = [f"{dist_info}/METADATA,,", f"{dist_info}/RECORD,,"]
+    for path, content in files.items():
+        records.append(f"{path},,")
+        if path.startswith(".."):
+            continue
+
+        (site_dir / path).parent.mkdir(parents=True, exist_ok=True)
+        (site_dir / path).write_text(content)
+
+    (site_dir / dist_info / "RECORD").write_text("\n".join(records) + "\n")
+
+
+def make_requirements(path: Path, content: str) -> RequirementsFile:
+    path.write_text(content)
+    return RequirementsFile.from_file(str(path))
+
+
+class TestInstalledFiles:
+    def test_installed_files(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            install(Path(td), "My_Pkg", "1.0", {"my_pkg/__init__.py": "", "../../bin/my-tool": ""})
+            install(Path(td), "other", "2.0", {"other.py": ""})
+
+            files = installed_files(td)
+
+            assert sorted(files) == ["my-pkg", "other"]
+            assert sorted(files["my-pkg"]) == [
+                os.path.join("My_Pkg-1.0.dist-info", "METADATA"),
+                os.path.join("My_Pkg-1.0.dist-info", "RECORD"),
+                os.path.join("my_pkg", "__init__.py"),
+            ]
+
+
+class TestExtractManifest:
+    def test_load_missing(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            assert ExtractManifest.load(td).packages == {}
+
+    def test_load_unreadable(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            (Path(td) / MANIFEST_NAME).write_text("{")
+
+            assert ExtractManifest.load(td).packages == {}
+
+    def test_dump_and_load(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            rf = make_requirements(Path(td) / "requirements.txt", "pkg==1.0 --hash=sha256:bb --hash=sha256:aa\n")
+            manifest = ExtractManifest(output_dir=td)
+            manifest.add(rf.requirements[0], ["pkg/b.py", "pkg/a.py"])
+            manifest.dump()
+
+            data = json.loads((Path(td) / MANIFEST_NAME).read_text())
+            assert data["packages"]["pkg"] == {
+                "version": "1.0",
+                "hashes": ["sha256:aa", "sha256:bb"],
+                "files": ["pkg/a.py", "pkg/b.py"],
+            }
+            assert ExtractManifest.load(td).packages == manifest.packages
+
+    def test_is_current(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            (Path(td) / "pkg").mkdir()
+            (Path(td) / "pkg" / "__init__.py").write_text("")
+            old = make_requirements(Path(td) / "old.txt", "pkg==1.0\nunpinned>=1.0\n").requirements
+            new = make_requirements(Path(td) / "new.txt", "pkg==1.1\n").requirements
+            manifest = ExtractManifest(output_dir=td)
+            manifest.add(old[0], ["pkg/__init__.py"])
+            manifest.add(old[1], [])
+
+            assert manifest.is_current(old[0])
+            assert not manifest.is_current(new[0])
+            # nothing tells whether an unpinned requirement changed
+            assert not manifest.is_current(old[1])
+
+            (Path(td) / "pkg" / "__init__.py").unlink()
+            assert not manifest.is_current(old[0])
+
+    def test_remove(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            (Path(td) / "ns" / "a").mkdir(parents=True)
+            (Path(td) / "ns" / "b").mkdir(parents=True)
+            (Path(td) / "ns" / "a" / "__init__.py").write_text("")
+            (Path(td) / "ns" / "b" / "__init__.py").write_text("")
+            rf = make_requirements(Path(td) / "requirements.txt", "a==1.0\n")
+            manifest = ExtractManifest(output_dir=td)
+            manifest.add(rf.requirements[0], ["ns/a/__init__.py"])
+
+            manifest.remove("A")
+
+            assert manifest.packages == {}
+            assert os.listdir(Path(td) / "ns") == ["b"]
@@ -1,10 +1,14 @@
 import os
+import subprocess
+import sys
 import tempfile
 from pathlib import Path
-from typing import Optional
 from unittest.mock import MagicMock, patch
 
-from versifier.poetry import Poetry, RequirementsFile
+import pytest
+from packaging.markers import Marker
+
+from versifier.poetry import Poetry, RequirementsFile, stream_output
 
 
 class TestRequirementsFile:
@@ -17,6 +21,28 @@ class TestRequirementsFile:
             assert rf.requirements[0].name == "requests"
             assert rf.requirements[1].name == "flask"
 
+    def test_from_lines_matches_from_file(self) -> None:
+        text = (
+            "# exported\n"
+            "--extra-index-url https://example.com/simple\n"
+            'six==1.16.0 ; python_version >= "3" \\\n'
+            "    --hash=sha256:aa \\\n"
+            "    --hash=sha256:bb\n"
+            "-e .\n"
+            "flask>=2.0.0  # web\n"
+            "!!invalid\n"
+        )
+        with tempfile.TemporaryDirectory() as td:
+            req_path = Path(td) / "requirements.txt"
+            req_path.write_text(text)
+            expected = RequirementsFile.from_file(str(req_path))
+
+        rf = RequirementsFile.from_lines(iter(text.splitlines()))
+        assert rf.dumps() == expected.dumps()
+        assert [r.name for r in rf.requirements] == ["six", None, "flask"]
+        assert rf.requirements[0].hash_options == ["sha256:aa", "sha256:bb"]
+        assert len(rf.invalid_lines) == 1
+
     def test_filter_with_include(self) -> None:
         with tempfile.TemporaryDirectory() as td:
             req_path = Path(td) / "requirements.txt"
@@ -49,6 +75,32 @@ class TestRequirementsFile:
             filtered = rf.filter(markers=["python_version==3.9"])
             assert len(filtered.requirements) == 1
 
+    def test_filter_with_markers_keeps_unmarked(self) -> None:
+        rf = RequirementsFile.from_string('six\nuvloop ; sys_platform == "linux"\n')
+        assert [r.name for r in rf.filter(markers=["sys_platform==darwin"]).requirements] == ["six"]
+
+    def test_filter_matrix(self) -> None:
+        rf = RequirementsFile.from_string(
+            "six\n"
+            'uvloop ; sys_platform == "linux"\n'
+            'httptools ; sys_platform == "linux"\n'
+            'tomli ; python_version < "3.11"\n'
+            "flask\n"
+        )
+        environments = [
+            ["sys_platform==linux", "python_version==3.10"],
+            ["sys_platform==darwin", "python_version==3.12"],
+            [],
+        ]
+        with patch("packaging.markers.Marker.evaluate", autospec=True, side_effect=Marker.evaluate) as evaluate:
+            linux, darwin, everything = rf.filter_matrix(environments, exclude=["flask"])
+
+        # two distinct markers in two environments, the empty one is never evaluated
+        assert evaluate.call_count == 4
+        assert [r.name for r in linux.requirements] == ["six", "uvloop", "httptools", "tomli"]
+        assert [r.name for r in darwin.requirements] == ["six"]
+        assert [r.name for r in everything.requirements] == ["six", "uvloop", "httptools", "tomli"]
+
     def test_filter_with_no_filters(self) -> None:
         with tempfile.TemporaryDirectory() as td:
             req_path = Path(td) / "requirements.txt"
@@ -70,6 +122,21 @@ class TestRequirementsFile:
             assert "requests" in content
 
 
+class TestStreamOutput:
+    def test_lines(self) -> None:
+        lines = stream_output([sys.executable, "-c", "print('a'); print('b')"])
+        assert list(lines) == ["a", "b"]
+
+    def test_failure(self) -> None:
+        with pytest.raises(subprocess.CalledProcessError):
+            list(stream_output([sys.executable, "-c", "print('a'); raise SystemExit(3)"]))
+
+    def test_reader_stops(self) -> None:
+        lines = stream_output([sys.executable, "-c", "import itertools\nfor i in itertools.count(): print(i)"])
+        assert next(lines) == "0"
+        lines.close()
+
+
 class TestPoetry:
     def test_init(self) -> None:
         poetry = Poetry()
@@ -141,6 +208,32 @@ class TestPoetry:
         args = mock_check_call.call_args[0][0]
         assert args == ["poetry", "run", "pip", "install", "requests"]
 
+    @patch("versifier.poetry.check_output")
+    def test_site_packages(self, mock_check_output: MagicMock) -> None:
+        mock_check_output.return_value = b'["/venv/lib/python3.11/site-packages"]\n'
+        poetry = Poetry()
+        assert poetry.site_packages() == ["/venv/lib/python3.11/site-packages"]
+        args = mock_check_output.call_args[0][0]
+        assert args[:4] == ["poetry", "run", "python", "-c"]
+
+    @patch("versifier.poetry.check_call")
+    def test_install_requirements(self, mock_check_call: MagicMock) -> None:
+        poetry = Poetry()
+        poetry.install_requirements("requirements.txt", "packages")
+        mock_check_call.assert_called_once()
+        args = mock_check_call.call_args[0][0]
+        assert args == [
+            "poetry",
+            "run",
+            "pip",
+            "install",
+            "--no-deps",
+            "--requirement",
+            "requirements.txt",
+            "--target",
+            "packages",
+        ]
+
     @patch("versifier.poetry.check_call")
     def test_init_if_needed_when_lock_exists(self, mock_check_call: MagicMock) -> None:
         with tempfile.TemporaryDirectory() as td:
@@ -170,7 +263,7 @@ class TestPoetry:
             finally:
                 os.chdir(original_dir)
 
-    def test_disable_default_source(self) -> None:
+    def test_has_default_source(self) -> None:
         with tempfile.TemporaryDirectory() as td:
             config_path = Path(td) / "pyproject.toml"
             config_path.write_text(
@@ -179,20 +272,16 @@ class TestPoetry:
 name = "test"
 
 [[tool.poetry.source]]
-name = "pypi"
+name = "private"
 default = true
 """
             )
-            poetry = Poetry()
-            poetry._disable_default_source(str(config_path))
-
-            import toml
+            assert Poetry()._has_default_source(str(config_path))
 
-            with open(config_path) as f:
-                config = toml.load(f)
-            assert config["tool"]["poetry"]["source"][0]["default"] is False
+            config_path.write_text('[[tool.poetry.source]]\nname = "private"\npriority = "supplemental"\n')
+            assert not Poetry()._has_default_source(str(config_path))
 
-    def test_disable_default_source_no_sources(self) -> None:
+    def test_has_default_source_no_sources(self) -> None:
         with tempfile.TemporaryDirectory() as td:
             config_path = Path(td) / "pyproject.toml"
             config_path.write_text(
@@ -201,63 +290,105 @@ default = true
 name = "test"
 """
             )
-            poetry = Poetry()
-            poetry._disable_default_source(str(config_path))
+            assert not Poetry()._has_default_source(str(config_path))
 
-    @patch("versifier.poetry.check_call")
-    def test_export_requirements(self, mock_check_call: MagicMock) -> None:
+    @patch("versifier.poetry.stream_output")
+    def test_export_requirements(self, mock_stream_output: MagicMock) -> None:
         with tempfile.TemporaryDirectory() as td:
             original_dir = os.getcwd()
             try:
                 os.chdir(td)
                 Path("poetry.lock").write_text("")
                 Path("pyproject.toml").write_text("[tool.poetry]\nname = 'test'\n")
-
-                def side_effect(commands: list, cwd: Optional[str] = None) -> None:
-                    req_path = None
-                    for cmd in commands:
-                        if cmd.startswith("--output="):
-                            req_path = cmd.split("=")[1]
-                            break
-                    if req_path:
-                        Path(req_path).write_text("requests==2.28.0\n")
-
-                mock_check_call.side_effect = side_effect
+                mock_stream_output.return_value = iter(["requests==2.28.0"])
 
                 poetry = Poetry()
                 rf = poetry.export_requirements()
-                assert rf is not None
+                assert [str(r.req) for r in rf.requirements] == ["requests==2.28.0"]
+                args = mock_stream_output.call_args[0][0]
+                assert not any(a.startswith("--output") for a in args)
+                # the project is exported in place, never copied
+                assert sorted(os.listdir(td)) == ["poetry.lock", "pyproject.toml"]
             finally:
                 os.chdir(original_dir)
 
-    @patch("versifier.poetry.check_call")
-    def test_export_requirements_with_options(self, mock_check_call: MagicMock) -> None:
+    @patch("versifier.poetry.stream_output")
+    def test_export_requirements_with_options(self, mock_stream_output: MagicMock) -> None:
         with tempfile.TemporaryDirectory() as td:
             original_dir = os.getcwd()
             try:
                 os.chdir(td)
                 Path("poetry.lock").write_text("")
                 Path("pyproject.toml").write_text("[tool.poetry]\nname = 'test'\n")
-
-                def side_effect(commands: list, cwd: Optional[str] = None) -> None:
-                    req_path = None
-                    for cmd in commands:
-                        if cmd.startswith("--output="):
-                            req_path = cmd.split("=")[1]
-                            break
-                    if req_path:
-                        Path(req_path).write_text("requests==2.28.0\n")
-
-                mock_check_call.side_effect = side_effect
+                mock_stream_output.return_value = iter(["requests==2.28.0"])
 
                 poetry = Poetry()
                 rf = poetry.export_requirements(
                     include_dev_requirements=True, extra_requirements=["extra1"], with_credentials=True
                 )
                 assert rf is not None
-                args = mock_check_call.call_args[0][0]
+                args = mock_stream_output.call_args[0][0]
                 assert "--dev" in args
                 assert "--extras=extra1" in args
                 assert "--with-credentials" in args
             finally:
                 os.chdir(original_dir)
+
+    @patch("versifier.poetry.stream_output")
+    def test_export_requirements_default_source(self, mock_stream_output: MagicMock) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            original_dir = os.getcwd()
+            try:
+                os.chdir(td)
+                Path("poetry.lock").write_text("")
+                Path("pyproject.toml").write_text(
+                    '[[tool.poetry.source]]\nname = "private"\nurl = "https://example.com/simple"\ndefault = true\n'
+                )
+                mock_stream_output.return_value = iter(["--index-url https://example.com/simple", "six==1.16.0"])
+
+                rf = Poetry(native_export=False).export_requirements()
+                assert rf.dumps() == "--extra-index-url https://example.com/simple\nsix==1.16.0\n"
+                assert "default = true" in Path("pyproject.toml").read_text()
+            finally:
+                os.chdir(original_dir)
+
+    @patch("versifier.poetry.stream_output")
+    def test_export_requirements_native(self, mock_stream_output: MagicMock) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            original_dir = os.getcwd()
+            try:
+                os.chdir(td)
+                Path("pyproject.toml").write_text("[tool.poetry.dependencies]\npython = '^3.8'\nsix = '*'\n")
+                Path("poetry.lock").write_text(
+                    '[[package]]\nname = "six"\nversion = "1.16.0"\n'
+                    'files = [{file = "six-1.16.0-py2.py3-none-any.whl", hash = "sha256:8abb"}]\n'
+                    '\n[metadata]\nlock-version = "2.0"\n'
+                )
+
+                rf = Poetry().export_requirements()
+                mock_stream_output.assert_not_called()
+                assert [str(r.req) for r in rf.requirements] == ["six==1.16.0"]
+                assert rf.requirements[0].hash_options == ["sha256:8abb"]
+
+                mock_stream_output.return_value = iter(["six"])
+                rf = Poetry(native_export=False).export_requirements()
+                mock_stream_output.assert_called_once()
+                assert [str(r.req) for r in rf.requirements] == ["six"]
+            finally:
+                os.chdir(original_dir)
+
+    @patch("versifier.poetry.stream_output")
+    def test_export_requirements_malformed_lock(self, mock_stream_output: MagicMock) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            original_dir = os.getcwd()
+            try:
+                os.chdir(td)
+                Path("pyproject.toml").write_text("[tool.poetry.dependencies]\npython = '^3.8'\nsix = '*'\n")
+                Path("poetry.lock").write_text('[[package]]\nname = "six"\n\n[metadata]\nlock-version = "2.0"\n')
+                mock_stream_output.return_value = iter(["six==1.16.0"])
+
+                rf = Poetry().export_requirements()
+                mock_stream_output.assert_called_once()
+                assert [str(r.req) for r in rf.requirements] == ["six==1.16.0"]
+            finally:
+                os.chdir(original_dir)
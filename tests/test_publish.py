@@ -0,0 +1,82 @@
+import errno
+import os
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from versifier.publish import link_file, move, staging_dir
+
+
+class TestStagingDir:
+    def test_staging_dir(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            output_dir = os.path.join(td, "build", "output")
+
+            with staging_dir(output_dir) as staging:
+                assert os.path.dirname(staging) == os.path.join(td, "build")
+                assert os.path.basename(staging).startswith(".versifier-")
+
+            assert os.listdir(os.path.join(td, "build")) == []
+
+
+class TestMove:
+    def test_move_replaces_file(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            source = Path(td) / "source"
+            target = Path(td) / "target"
+            source.write_text("new")
+            target.write_text("old")
+            inode = source.stat().st_ino
+
+            move(str(source), str(target))
+
+            assert not source.exists()
+            assert target.read_text() == "new"
+            assert target.stat().st_ino == inode
+
+    def test_move_across_filesystems(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            source = Path(td) / "source"
+            source.write_text("new")
+
+            with patch("versifier.publish.os.replace", side_effect=OSError(errno.EXDEV, "cross-device link")):
+                move(str(source), str(Path(td) / "target"))
+
+            assert (Path(td) / "target").read_text() == "new"
+
+            source.write_text("new")
+            with (
+                patch("versifier.publish.os.replace", side_effect=OSError(errno.EACCES, "denied")),
+                pytest.raises(OSError),
+            ):
+                move(str(source), str(Path(td) / "target"))
+
+
+class TestLinkFile:
+    @pytest.mark.parametrize("mode", ["copy", "hardlink", "reflink"])
+    def test_link_file(self, mode: str) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            source = Path(td) / "source"
+            target = Path(td) / "target"
+            source.write_text("content")
+            # an earlier hardlinked output must not be written through
+            os.link(source, target)
+
+            link_file(str(source), str(target), mode)
+
+            assert target.read_text() == "content"
+            assert os.path.samefile(source, target) == (mode == "hardlink")
+
+    def test_link_file_fallback(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            source = Path(td) / "source"
+            target = Path(td) / "target"
+            source.write_text("content")
+
+            with patch("versifier.publish.os.link", side_effect=OSError(errno.EXDEV, "cross-device link")):
+                link_file(str(source), str(target), "hardlink")
+
+            assert target.read_text() == "content"
+            assert not os.path.samefile(source, target)
@@ -0,0 +1,75 @@
+import pickle
+import tempfile
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+from versifier.report import BuildReport, format_size
+
+
+class TestFormatSize:
+    def test_bytes(self) -> None:
+        assert format_size(512) == "512B"
+
+    def test_kib(self) -> None:
+        assert format_size(2048) == "2.0KiB"
+
+    def test_mib(self) -> None:
+        assert format_size(3 * 1024 * 1024) == "3.0MiB"
+
+
+class TestBuildReport:
+    def test_timer(self) -> None:
+        report = BuildReport()
+        with report.timer("stage"):
+            pass
+        with report.timer("stage"):
+            pass
+        assert report.timings["stage"] >= 0
+
+    def test_incr(self) -> None:
+        report = BuildReport()
+        report.incr("files")
+        report.incr("files", 2)
+        assert report.counters["files"] == 3
+
+    def test_add_file_sizes(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            path = Path(td) / "a.so"
+            path.write_bytes(b"x" * 100)
+
+            report = BuildReport()
+            total = report.add_file_sizes("pkg", [str(path), str(Path(td) / "missing.so")])
+
+            assert total == 100
+            assert report.sizes["pkg"] == 100
+
+    @patch("versifier.report.logger")
+    def test_log(self, mock_logger: MagicMock) -> None:
+        report = BuildReport()
+        report.incr("files")
+        report.add_size("pkg", 10)
+        report.note("pkg.tier", "Cython")
+        with report.timer("stage"):
+            pass
+
+        report.log()
+        assert mock_logger.info.call_count == 4
+
+    def test_pickle_and_merge(self) -> None:
+        report = BuildReport()
+        report.incr("modules", 2)
+        report.add_size("output", 10)
+
+        # reports cross the process pool pickled, the data here is built by the test itself
+        worker_report = pickle.loads(pickle.dumps(BuildReport()))  # noqa: S301
+        worker_report.incr("modules")
+        worker_report.add_size("output", 5)
+        with worker_report.timer("cython"):
+            pass
+        worker_report.note("tier.pkg", "Cython")
+        report.merge(worker_report)
+
+        assert report.counters["modules"] == 3
+        assert report.sizes["output"] == 15
+        assert "cython" in report.timings
+        assert report.notes["tier.pkg"] == "Cython"
@@ -0,0 +1,125 @@
+import os
+import stat
+import sys
+import tempfile
+from importlib.machinery import EXTENSION_SUFFIXES
+from pathlib import Path
+from typing import List
+from unittest.mock import MagicMock, patch
+
+from versifier.dedupe import ModuleDeduplicator
+from versifier.report import BuildReport
+from versifier.strip import ExtensionStripper, find_extensions
+
+FAKE_STRIP = """\
+import sys
+
+args = sys.argv[1:]
+output = args[args.index("-o") + 1]
+with open(output, "wb") as f:
+    f.write(b"stripped")
+"""
+
+
+def fake_check_call(commands: List[str]) -> None:
+    """Write the -o output like strip does, the input is never modified."""
+    if "-o" in commands:
+        Path(commands[commands.index("-o") + 1]).write_bytes(b"stripped")
+
+
+class TestFindExtensions:
+    def test_find_extensions(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            package_dir = Path(td) / "pkg" / "sub"
+            package_dir.mkdir(parents=True)
+            (package_dir / "m.so").write_text("")
+            (package_dir / "m.pyi").write_text("")
+            (Path(td) / "pkg.so").write_text("")
+            (Path(td) / "other.so").write_text("")
+
+            results = find_extensions(td, "pkg")
+
+            assert sorted(Path(p).name for p in results) == ["m.so", "pkg.so"]
+
+    def test_find_extensions_missing(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            assert find_extensions(td, "pkg") == []
+
+
+class TestExtensionStripper:
+    @patch("versifier.strip.sys.platform", "linux")
+    @patch("versifier.strip.shutil.which", return_value="/usr/bin/strip")
+    @patch("versifier.strip.check_call", side_effect=fake_check_call)
+    def test_strip_packages(self, mock_check_call: MagicMock, mock_which: MagicMock) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            package_dir = Path(td) / "pkg"
+            package_dir.mkdir()
+            (package_dir / "m.so").write_bytes(b"x" * 10)
+
+            report = BuildReport()
+            stripper = ExtensionStripper(report=report)
+            stripper.strip_packages(td, ["pkg"])
+
+            path = str(package_dir / "m.so")
+            mock_check_call.assert_called_once_with(["strip", "--strip-unneeded", "-o", f"{path}.strip", path])
+            assert (package_dir / "m.so").read_bytes() == b"stripped"
+            assert os.listdir(package_dir) == ["m.so"]
+            assert report.sizes["strip.pkg.before"] == 10
+            assert report.counters["strip.extensions"] == 1
+
+    @patch("versifier.strip.sys.platform", "linux")
+    @patch("versifier.strip.shutil.which", return_value="/usr/bin/strip")
+    @patch("versifier.strip.check_call", side_effect=fake_check_call)
+    def test_strip_packages_with_debug_dir(self, mock_check_call: MagicMock, mock_which: MagicMock) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            package_dir = Path(td) / "out" / "pkg"
+            package_dir.mkdir(parents=True)
+            (package_dir / "m.so").write_text("")
+            debug_dir = Path(td) / "debug"
+
+            stripper = ExtensionStripper(debug_dir=str(debug_dir))
+            stripper.strip_packages(str(Path(td) / "out"), ["pkg"])
+
+            commands = [c[0][0] for c in mock_check_call.call_args_list]
+            debug_path = str(debug_dir / "pkg" / "m.so.debug")
+            assert commands[0] == ["objcopy", "--only-keep-debug", str(package_dir / "m.so"), debug_path]
+            assert commands[1][0] == "strip"
+            assert commands[2] == ["objcopy", f"--add-gnu-debuglink={debug_path}", f"{package_dir / 'm.so'}.strip"]
+
+    @patch("versifier.strip.shutil.which", return_value=None)
+    @patch("versifier.strip.check_call")
+    def test_strip_packages_without_strip(self, mock_check_call: MagicMock, mock_which: MagicMock) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            (Path(td) / "pkg.so").write_text("")
+
+            stripper = ExtensionStripper()
+            stripper.strip_packages(td, ["pkg"])
+
+            mock_check_call.assert_not_called()
+
+    @patch("versifier.strip.sys.platform", "linux")
+    def test_strip_packages_hardlinked_from_dedupe_store(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            root = Path(td)
+            strip_path = root / "strip"
+            strip_path.write_text(f"#!{sys.executable}\n{FAKE_STRIP}")
+            strip_path.chmod(strip_path.stat().st_mode | stat.S_IXUSR)
+            for name in ("a", "b"):
+                (root / name / "pkg").mkdir(parents=True)
+                (root / name / "pkg" / "__init__.py").write_text("")
+            extension = f"__init__{EXTENSION_SUFFIXES[0]}"
+            (root / "out_a" / "pkg").mkdir(parents=True)
+            (root / "out_a" / "pkg" / extension).write_bytes(b"compiled")
+
+            dedupe = ModuleDeduplicator(link_mode="hardlink")
+            dedupe.apply(str(root / "a"), str(root / "out_a"), ["pkg"], {})
+            reusable, _ = dedupe.plan(str(root / "b"), ["pkg"])
+            dedupe.apply(str(root / "b"), str(root / "out_b"), ["pkg"], reusable)
+            (stored_path,) = next(iter(dedupe.artifacts.values()))
+            assert os.path.samefile(stored_path, root / "out_b" / "pkg" / extension)
+
+            stripper = ExtensionStripper(strip_path=str(strip_path))
+            stripper.strip_packages(str(root / "out_b"), ["pkg"])
+
+            assert (root / "out_b" / "pkg" / extension).read_bytes() == b"stripped"
+            assert Path(stored_path).read_bytes() == b"compiled"
@@ -3,6 +3,8 @@ import tempfile
 from pathlib import Path
 from unittest.mock import MagicMock, patch
 
+import pytest
+
 from versifier.uv import Uv
 
 
@@ -78,6 +80,61 @@ class TestUv:
         args = mock_check_call.call_args[0][0]
         assert args == ["uv", "run", "pip", "install", "requests"]
 
+    @patch("versifier.uv.check_output")
+    def test_site_packages(self, mock_check_output: MagicMock) -> None:
+        mock_check_output.return_value = b'["/venv/lib/python3.11/site-packages"]\n'
+        uv = Uv()
+        assert uv.site_packages() == ["/venv/lib/python3.11/site-packages"]
+        args = mock_check_output.call_args[0][0]
+        assert args[:5] == ["uv", "run", "--no-sync", "python", "-c"]
+
+    @patch.dict(os.environ, clear=True)
+    @patch("versifier.uv.check_call")
+    def test_install_requirements(self, mock_check_call: MagicMock) -> None:
+        uv = Uv()
+        uv.install_requirements("requirements.txt", "packages")
+        mock_check_call.assert_called_once()
+        args = mock_check_call.call_args[0][0]
+        assert args == [
+            "uv",
+            "pip",
+            "install",
+            "--no-deps",
+            "--requirement",
+            "requirements.txt",
+            "--target",
+            "packages",
+        ]
+
+    @patch("versifier.uv.check_call")
+    def test_install_requirements_pip_index(self, mock_check_call: MagicMock, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.delenv("UV_INDEX_URL", raising=False)
+        monkeypatch.delenv("UV_EXTRA_INDEX_URL", raising=False)
+        monkeypatch.setenv("PIP_INDEX_URL", "https://pypi.example.com/simple")
+        monkeypatch.setenv("PIP_EXTRA_INDEX_URL", "https://a.example.com/simple https://b.example.com/simple")
+        uv = Uv()
+        uv.install_requirements("requirements.txt", "packages")
+        args = mock_check_call.call_args[0][0]
+        assert args[8:] == [
+            "--index-url",
+            "https://pypi.example.com/simple",
+            "--extra-index-url",
+            "https://a.example.com/simple",
+            "--extra-index-url",
+            "https://b.example.com/simple",
+        ]
+
+    @patch("versifier.uv.check_call")
+    def test_install_requirements_uv_index(self, mock_check_call: MagicMock, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setenv("UV_INDEX_URL", "https://uv.example.com/simple")
+        monkeypatch.setenv("UV_EXTRA_INDEX_URL", "https://uv-extra.example.com/simple")
+        monkeypatch.setenv("PIP_INDEX_URL", "https://pypi.example.com/simple")
+        monkeypatch.setenv("PIP_EXTRA_INDEX_URL", "https://a.example.com/simple")
+        uv = Uv()
+        uv.install_requirements("requirements.txt", "packages")
+        args = mock_check_call.call_args[0][0]
+        assert args[8:] == []
+
     @patch("versifier.uv.check_call")
     def test_init_if_needed_when_lock_exists(self, mock_check_call: MagicMock) -> None:
         with tempfile.TemporaryDirectory() as td:
@@ -107,47 +164,32 @@ class TestUv:
             finally:
                 os.chdir(original_dir)
 
-    @patch("versifier.uv.check_call")
-    def test_export_requirements(self, mock_check_call: MagicMock) -> None:
+    @patch("versifier.uv.stream_output")
+    def test_export_requirements(self, mock_stream_output: MagicMock) -> None:
         with tempfile.TemporaryDirectory() as td:
             original_dir = os.getcwd()
             try:
                 os.chdir(td)
-
-                def side_effect(commands: list) -> None:
-                    for cmd in commands:
-                        if cmd.startswith("--output-file="):
-                            req_path = cmd.split("=", 1)[1]
-                            Path(req_path).write_text("requests==2.28.0\n")
-                            break
-
-                mock_check_call.side_effect = side_effect
+                mock_stream_output.return_value = iter(["# exported by uv", "requests==2.28.0"])
 
                 uv = Uv()
                 rf = uv.export_requirements()
-                assert rf is not None
-                args = mock_check_call.call_args[0][0]
+                assert [str(r.req) for r in rf.requirements] == ["requests==2.28.0"]
+                args = mock_stream_output.call_args[0][0]
                 assert "--no-hashes" in args
+                assert not any(a.startswith("--output-file") for a in args)
                 assert "--no-dev" in args
                 assert "--with-credentials" not in args
             finally:
                 os.chdir(original_dir)
 
-    @patch("versifier.uv.check_call")
-    def test_export_requirements_with_options(self, mock_check_call: MagicMock) -> None:
+    @patch("versifier.uv.stream_output")
+    def test_export_requirements_with_options(self, mock_stream_output: MagicMock) -> None:
         with tempfile.TemporaryDirectory() as td:
             original_dir = os.getcwd()
             try:
                 os.chdir(td)
-
-                def side_effect(commands: list) -> None:
-                    for cmd in commands:
-                        if cmd.startswith("--output-file="):
-                            req_path = cmd.split("=", 1)[1]
-                            Path(req_path).write_text("requests==2.28.0\n")
-                            break
-
-                mock_check_call.side_effect = side_effect
+                mock_stream_output.return_value = iter(["requests==2.28.0"])
 
                 uv = Uv()
                 rf = uv.export_requirements(
@@ -156,29 +198,62 @@ class TestUv:
                     with_credentials=True,
                 )
                 assert rf is not None
-                args = mock_check_call.call_args[0][0]
+                args = mock_stream_output.call_args[0][0]
                 assert "--no-dev" not in args
                 assert "--extra=extra1" in args
                 assert "--with-credentials" in args
             finally:
                 os.chdir(original_dir)
 
-    @patch("versifier.uv.logger")
-    @patch("versifier.uv.check_call")
-    def test_export_requirements_with_credentials_warns(self, mock_check_call: MagicMock, mock_logger: MagicMock) -> None:
+    @patch("versifier.uv.stream_output")
+    def test_export_requirements_native(self, mock_stream_output: MagicMock) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            original_dir = os.getcwd()
+            try:
+                os.chdir(td)
+                Path("pyproject.toml").write_text("[project]\nname = 'demo'\n")
+                Path("uv.lock").write_text(
+                    'version = 1\n\n[[package]]\nname = "demo"\nversion = "0.1.0"\nsource = { virtual = "." }\n'
+                    'dependencies = [{ name = "six" }]\n\n'
+                    '[[package]]\nname = "six"\nversion = "1.16.0"\nsource = { registry = "https://pypi.org/simple" }\n'
+                )
+
+                rf = Uv().export_requirements()
+                mock_stream_output.assert_not_called()
+                assert [str(r.req) for r in rf.requirements] == ["six==1.16.0"]
+
+                mock_stream_output.return_value = iter(["six"])
+                Uv(native_export=False).export_requirements()
+                mock_stream_output.assert_called_once()
+            finally:
+                os.chdir(original_dir)
+
+    @patch("versifier.uv.stream_output")
+    def test_export_requirements_malformed_lock(self, mock_stream_output: MagicMock) -> None:
         with tempfile.TemporaryDirectory() as td:
             original_dir = os.getcwd()
             try:
                 os.chdir(td)
+                Path("pyproject.toml").write_text("[project]\nname = 'demo'\n")
+                Path("uv.lock").write_text('version = 1\n\n[[package]]\nname = "demo"\n')
+                mock_stream_output.return_value = iter(["six==1.16.0"])
 
-                def side_effect(commands: list) -> None:
-                    for cmd in commands:
-                        if cmd.startswith("--output-file="):
-                            req_path = cmd.split("=", 1)[1]
-                            Path(req_path).write_text("requests==2.28.0\n")
-                            break
+                rf = Uv().export_requirements()
+                mock_stream_output.assert_called_once()
+                assert [str(r.req) for r in rf.requirements] == ["six==1.16.0"]
+            finally:
+                os.chdir(original_dir)
 
-                mock_check_call.side_effect = side_effect
+    @patch("versifier.uv.logger")
+    @patch("versifier.uv.stream_output")
+    def test_export_requirements_with_credentials_warns(
+        self, mock_stream_output: MagicMock, mock_logger: MagicMock
+    ) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            original_dir = os.getcwd()
+            try:
+                os.chdir(td)
+                mock_stream_output.return_value = iter(["requests==2.28.0"])
 
                 uv = Uv()
                 uv.export_requirements(with_credentials=True)
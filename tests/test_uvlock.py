@@ -0,0 +1,173 @@
+import tempfile
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+from versifier.lockfile import UnsupportedLockError
+from versifier.poetry import RequirementsFile
+from versifier.uvlock import export_uv_lock
+
+PYPROJECT = """
+[project]
+name = "demo"
+version = "0.1.0"
+requires-python = ">=3.11"
+dependencies = ["click>=8", "requests[socks]>=2.28", "vcs-lib"]
+
+[project.optional-dependencies]
+fast = ["ujson>=5"]
+
+[dependency-groups]
+dev = ["pytest>=7"]
+"""
+
+LOCK = """
+version = 1
+requires-python = ">=3.11"
+
+[[package]]
+name = "click"
+version = "8.1.7"
+source = { registry = "https://pypi.org/simple" }
+dependencies = [
+    { name = "colorama", marker = "platform_system == 'Windows'" },
+]
+
+[[package]]
+name = "colorama"
+version = "0.4.6"
+source = { registry = "https://pypi.org/simple" }
+
+[[package]]
+name = "demo"
+version = "0.1.0"
+source = { editable = "." }
+dependencies = [
+    { name = "click" },
+    { name = "requests", extra = ["socks"] },
+    { name = "vcs-lib" },
+]
+
+[package.optional-dependencies]
+fast = [
+    { name = "ujson" },
+]
+
+[package.dev-dependencies]
+dev = [
+    { name = "pytest" },
+]
+
+[[package]]
+name = "pysocks"
+version = "1.7.1"
+source = { registry = "https://pypi.org/simple" }
+
+[[package]]
+name = "pytest"
+version = "7.4.3"
+source = { registry = "https://pypi.org/simple" }
+dependencies = [
+    { name = "colorama", marker = "sys_platform == 'win32'" },
+]
+
+[[package]]
+name = "requests"
+version = "2.31.0"
+source = { registry = "https://pypi.org/simple" }
+dependencies = [
+    { name = "urllib3" },
+]
+
+[package.optional-dependencies]
+socks = [
+    { name = "pysocks" },
+]
+
+[[package]]
+name = "ujson"
+version = "5.8.0"
+source = { registry = "https://pypi.org/simple" }
+
+[[package]]
+name = "urllib3"
+version = "2.0.7"
+source = { registry = "https://pypi.org/simple" }
+
+[[package]]
+name = "vcs-lib"
+version = "0.3.0"
+source = { git = "https://github.com/example/vcs-lib.git?subdirectory=lib&rev=main#0123abc" }
+"""
+
+
+@pytest.fixture
+def project() -> Iterator[Path]:
+    with tempfile.TemporaryDirectory() as td:
+        (Path(td) / "pyproject.toml").write_text(PYPROJECT)
+        (Path(td) / "uv.lock").write_text(LOCK)
+        yield Path(td)
+
+
+class TestExportUvLock:
+    def test_export(self, project: Path) -> None:
+        text = export_uv_lock(str(project))
+
+        assert text.splitlines() == [
+            "-e .",
+            "click==8.1.7",
+            "colorama==0.4.6 ; platform_system == 'Windows'",
+            "pysocks==1.7.1",
+            "requests==2.31.0",
+            "urllib3==2.0.7",
+            "vcs-lib @ git+https://github.com/example/vcs-lib.git@0123abc#subdirectory=lib",
+        ]
+        rf = RequirementsFile.from_string(text)
+        assert [r.name for r in rf.requirements] == [
+            None,
+            "click",
+            "colorama",
+            "pysocks",
+            "requests",
+            "urllib3",
+            "vcs-lib",
+        ]
+
+    def test_export_dev_and_extras(self, project: Path) -> None:
+        text = export_uv_lock(str(project), include_dev_requirements=True, extra_requirements=["fast"])
+        lines = text.splitlines()
+
+        assert "pytest==7.4.3" in lines
+        assert "ujson==5.8.0" in lines
+        assert "colorama==0.4.6 ; platform_system == 'Windows' or sys_platform == 'win32'" in lines
+
+    def test_export_default_groups(self, project: Path) -> None:
+        (project / "pyproject.toml").write_text(PYPROJECT + "\n[tool.uv]\ndefault-groups = []\n")
+
+        assert "pytest==7.4.3" not in export_uv_lock(str(project), include_dev_requirements=True).splitlines()
+
+    def test_export_unsupported(self, project: Path) -> None:
+        with pytest.raises(UnsupportedLockError):
+            export_uv_lock(str(project), extra_requirements=["missing"])
+
+        (project / "uv.lock").unlink()
+        with pytest.raises(UnsupportedLockError):
+            export_uv_lock(str(project))
+
+        (project / "uv.lock").write_text(
+            LOCK.replace(
+                '{ name = "urllib3" },', '{ name = "urllib3", version = "2.0.7", source = { registry = "x" } },'
+            )
+        )
+        with pytest.raises(UnsupportedLockError):
+            export_uv_lock(str(project))
+
+    def test_export_malformed(self, project: Path) -> None:
+        (project / "uv.lock").write_text("version = \n")
+        with pytest.raises(UnsupportedLockError, match="Can not read the lock file"):
+            export_uv_lock(str(project))
+
+        (project / "uv.lock").write_text('version = 1\n\n[[package]]\nversion = "1.0"\n')
+        with pytest.raises(UnsupportedLockError, match="Can not read the lock file"):
+            export_uv_lock(str(project))
@@ -0,0 +1,108 @@
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, Optional
+
+from versifier.poetry import RequirementsFile
+from versifier.venv import InstalledPackageCopier
+
+
+def install(site_dir: Path, name: str, version: str, files: Dict[str, str], direct_url: Optional[dict] = None) -> None:
+    dist_info = f"{name}-{version}.dist-info"
+    (site_dir / dist_info).mkdir(parents=True)
+    (site_dir / dist_info / "METADATA").write_text(f"Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n")
+    records = [f"{dist_info}/METADATA,,", f"{dist_info}/RECORD,,"]
+    if direct_url is not None:
+        (site_dir / dist_info / "direct_url.json").write_text(json.dumps(direct_url))
+        records.append(f"{dist_info}/direct_url.json,,")
+
+    for path, content in files.items():
+        records.append(f"{path},,")
+        if path.startswith(".."):
+            continue
+
+        (site_dir / path).parent.mkdir(parents=True, exist_ok=True)
+        (site_dir / path).write_text(content)
+
+    (site_dir / dist_info / "RECORD").write_text("\n".join(records) + "\n")
+
+
+def make_requirements(path: Path, content: str) -> RequirementsFile:
+    path.write_text(content)
+    return RequirementsFile.from_file(str(path))
+
+
+class TestInstalledPackageCopier:
+    def test_copy_requirements(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            site_dir = Path(td) / "site-packages"
+            install(
+                site_dir,
+                "My_Pkg",
+                "1.0",
+                {
+                    "my_pkg/__init__.py": "VALUE = 1\n",
+                    "my_pkg/__pycache__/__init__.cpython-311.pyc": "",
+                    "../../bin/my-tool": "",
+                },
+            )
+            install(site_dir, "old", "1.0", {"old.py": ""})
+            install(
+                site_dir,
+                "editable",
+                "1.0",
+                {"editable.pth": ""},
+                {"url": "file:///src", "dir_info": {"editable": True}},
+            )
+            rf = make_requirements(
+                Path(td) / "requirements.txt",
+                "my-pkg==1.0\nold==2.0\neditable==1.0\nmissing==1.0\nunpinned>=1.0\nskipped==1.0 ; python_version < '3'\n",
+            )
+            output_dir = Path(td) / "output"
+
+            copier = InstalledPackageCopier(site_dirs=[str(site_dir)])
+            remaining = copier.copy_requirements(rf, str(output_dir), ["*/*.dist-info", "*/__pycache__"])
+
+            assert remaining == ["old", "editable", "missing", "unpinned"]
+            assert os.listdir(output_dir) == ["my_pkg"]
+            assert os.listdir(output_dir / "my_pkg") == ["__init__.py"]
+            assert (output_dir / "my_pkg" / "__init__.py").read_text() == "VALUE = 1\n"
+            assert copier.report.counters["venv.reused"] == 1
+            assert copier.report.counters["venv.mismatched"] == 1
+            assert copier.report.counters["venv.files"] == 1
+            assert copier.report.counters["venv.skipped_files"] == 3
+
+    def test_hardlink(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            site_dir = Path(td) / "site-packages"
+            install(site_dir, "mypkg", "1.0", {"mypkg.py": ""})
+            rf = make_requirements(Path(td) / "requirements.txt", "mypkg==1.0\n")
+            output_dir = Path(td) / "output"
+
+            copier = InstalledPackageCopier(site_dirs=[str(site_dir)], hardlink=True)
+            assert copier.copy_requirements(rf, str(output_dir), ["*/*.dist-info"]) == []
+
+            assert os.path.samefile(output_dir / "mypkg.py", site_dir / "mypkg.py")
+
+    def test_first_site_dir_wins(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            install(Path(td) / "first", "mypkg", "2.0", {"mypkg.py": ""})
+            install(Path(td) / "second", "mypkg", "1.0", {"mypkg.py": ""})
+            rf = make_requirements(Path(td) / "requirements.txt", "mypkg==1.0\n")
+
+            copier = InstalledPackageCopier(site_dirs=[os.path.join(td, "first"), os.path.join(td, "second")])
+
+            assert copier.copy_requirements(rf, os.path.join(td, "output")) == ["mypkg"]
+
+    def test_missing_file(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            site_dir = Path(td) / "site-packages"
+            install(site_dir, "mypkg", "1.0", {"mypkg.py": ""})
+            os.remove(site_dir / "mypkg.py")
+            rf = make_requirements(Path(td) / "requirements.txt", "mypkg==1.0\n")
+
+            copier = InstalledPackageCopier(site_dirs=[str(site_dir)])
+
+            assert copier.copy_requirements(rf, os.path.join(td, "output"), ["*/*.dist-info"]) == ["mypkg"]
+            assert "venv.reused" not in copier.report.counters
@@ -0,0 +1,59 @@
+import os
+import tempfile
+from pathlib import Path
+
+from versifier.dedupe import file_digest
+from versifier.wheelcache import WheelCache
+
+
+def write_wheel(path: Path, size: int) -> str:
+    path.write_bytes(os.urandom(size))
+    return str(path)
+
+
+class TestWheelCache:
+    def test_add_and_find(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            wheel = write_wheel(Path(td) / "My_Pkg-1.0-py3-none-any.whl", 16)
+            cache = WheelCache(root=os.path.join(td, "cache"))
+
+            cached = cache.add(wheel, "My_Pkg", "1.0")
+            digest = file_digest(wheel)
+
+            assert cached == os.path.join(td, "cache", "my-pkg", "1.0", digest, "My_Pkg-1.0-py3-none-any.whl")
+            assert Path(cached).read_bytes() == Path(wheel).read_bytes()
+            assert cache.add(wheel, "my-pkg", "1.0") == cached
+            assert cache.find("my.pkg", "1.0") == [cached]
+            assert cache.find("my-pkg", "1.0", [digest]) == [cached]
+            assert cache.find("my-pkg", "1.0", ["0" * 64]) == []
+            assert cache.find("my-pkg", "2.0") == []
+            assert cache.report.sizes["wheel.cache_added"] == 16
+            assert [f for f in os.listdir(os.path.dirname(cached)) if f.endswith(".tmp")] == []
+
+    def test_evict(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            cache = WheelCache(root=os.path.join(td, "cache"), max_size=250)
+            paths = []
+            for i, name in enumerate(["a", "b", "c"]):
+                wheel = write_wheel(Path(td) / f"{name}-1.0-py3-none-any.whl", 100)
+                paths.append(cache.add(wheel, name, "1.0"))
+                os.utime(paths[-1], (1000 + i, 1000 + i))
+
+            # a was used last, b is now the least recently used one
+            cache.touch(paths[0])
+            cache.evict()
+
+            assert os.path.exists(paths[0])
+            assert not os.path.exists(paths[1])
+            assert os.path.exists(paths[2])
+            assert not os.path.exists(os.path.join(td, "cache", "b"))
+            assert cache.report.sizes["wheel.cache_evicted"] == 100
+
+    def test_evict_unlimited(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            cache = WheelCache(root=os.path.join(td, "cache"))
+            cached = cache.add(write_wheel(Path(td) / "a-1.0-py3-none-any.whl", 100), "a", "1.0")
+
+            cache.evict()
+
+            assert os.path.exists(cached)
@@ -0,0 +1,86 @@
+import base64
+import hashlib
+import os
+import tempfile
+import zipfile
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+from packaging.tags import Tag
+
+from versifier.wheelwriter import WheelWriter, distribution_name, escape_name, platform_tag
+
+
+def make_tree(root: Path) -> None:
+    (root / "my_pkg" / "sub").mkdir(parents=True)
+    (root / "my_pkg" / "__init__.py").write_text("")
+    (root / "my_pkg" / "sub" / "mod.cpython-311-x86_64-linux-gnu.so").write_bytes(b"\x7fELF" * 1000)
+    (root / "my_pkg-stubs").mkdir()
+    (root / "my_pkg-stubs" / "__init__.pyi").write_text("VALUE: int\n")
+    (root / "other.cpython-311-x86_64-linux-gnu.so").write_bytes(b"other")
+
+
+class TestDistributionName:
+    def test_distribution_name(self) -> None:
+        assert distribution_name("my_pkg") == "my-pkg"
+        assert distribution_name("my_pkg-stubs") == "my-pkg"
+        assert distribution_name("other.cpython-311-x86_64-linux-gnu.so") == "other"
+        assert escape_name("my-pkg.x") == "my_pkg_x"
+
+
+class TestPlatformTag:
+    @patch("versifier.wheelwriter.sys_tags")
+    def test_platform_tag(self, mock_sys_tags: MagicMock) -> None:
+        mock_sys_tags.return_value = iter([Tag("cp313", "cp313t", "manylinux_2_17_x86_64"), Tag("py3", "none", "any")])
+        assert platform_tag() == "cp313-cp313t-manylinux_2_17_x86_64"
+
+
+class TestWheelWriter:
+    def test_write_tree(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            source_dir = Path(td) / "source"
+            make_tree(source_dir)
+            writer = WheelWriter(versions={"my-pkg": "1.2.0"}, tag="cp311-cp311-linux_x86_64")
+
+            paths = writer.write_tree(str(source_dir), os.path.join(td, "wheels"))
+
+            assert [os.path.basename(p) for p in paths] == [
+                "my_pkg-1.2.0-cp311-cp311-linux_x86_64.whl",
+                "other-0.0.0-cp311-cp311-linux_x86_64.whl",
+            ]
+            with zipfile.ZipFile(paths[0]) as zf:
+                names = zf.namelist()
+                assert names == [
+                    "my_pkg-stubs/__init__.pyi",
+                    "my_pkg/__init__.py",
+                    "my_pkg/sub/mod.cpython-311-x86_64-linux-gnu.so",
+                    "my_pkg-1.2.0.dist-info/METADATA",
+                    "my_pkg-1.2.0.dist-info/WHEEL",
+                    "my_pkg-1.2.0.dist-info/RECORD",
+                ]
+                assert "Tag: cp311-cp311-linux_x86_64\n" in zf.read("my_pkg-1.2.0.dist-info/WHEEL").decode()
+
+                records = [line.split(",") for line in zf.read("my_pkg-1.2.0.dist-info/RECORD").decode().splitlines()]
+                assert [r[0] for r in records] == names
+                for name, digest, size in records[:-1]:
+                    data = zf.read(name)
+                    expected = base64.urlsafe_b64encode(hashlib.sha256(data).digest()).rstrip(b"=").decode()
+                    assert digest == f"sha256={expected}"
+                    assert size == str(len(data))
+                assert records[-1] == ["my_pkg-1.2.0.dist-info/RECORD", "", ""]
+
+            assert writer.report.counters["wheels.built"] == 2
+            assert writer.report.counters["wheels.files"] == 4
+
+    def test_write_tree_reproducible(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            source_dir = Path(td) / "source"
+            make_tree(source_dir)
+            writer = WheelWriter(tag="py3-none-any")
+
+            first = writer.write_tree(str(source_dir), os.path.join(td, "first"))
+            os.utime(source_dir / "my_pkg" / "__init__.py", (1000, 1000))
+            second = writer.write_tree(str(source_dir), os.path.join(td, "second"))
+
+            for a, b in zip(first, second, strict=True):
+                assert Path(a).read_bytes() == Path(b).read_bytes()
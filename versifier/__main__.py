@@ -1,20 +1,32 @@
 import functools
 import logging
 import os
-from dataclasses import dataclass
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, replace
 from functools import partial
 from pathlib import Path
-from tempfile import TemporaryDirectory
-from typing import Any, Callable, List
+from typing import Any, Callable, Dict, List, Optional, Set
 
 import click
-from versifier import core
+from packaging.utils import canonicalize_name
+from versifier import bench, core
 
-from .compiler import Compiler, Cython, Nuitka3, SmartCompiler
+from .compiler import Bytecode, Compiler, Cython, Nuitka3, SmartCompiler, process_context
 from .config import Config
 from .core import PackageManager
+from .dedupe import ModuleDeduplicator
+from .exportcache import ExportCache
+from .hotspot import HotModuleSelector
+from .publish import LINK_MODES, staging_dir
 from .poetry import Poetry
+from .report import BuildReport
+from .strip import ExtensionStripper
 from .uv import Uv
+from .venv import InstalledPackageCopier
+from .wheel import WheelUnpacker, pinned_version
+from .wheelcache import WheelCache
+from .wheelwriter import WheelWriter
 
 logger = logging.getLogger(__name__)
 
@@ -26,14 +38,23 @@ class Context:
     poetry_path: str
     uv_path: str
     nuitka_path: str
+    export_cache_dir: Optional[str] = None
+    report: BuildReport = field(default_factory=BuildReport)
+
+    @property
+    def export_cache(self) -> Optional[ExportCache]:
+        if not self.export_cache_dir:
+            return None
+
+        return ExportCache(root=os.path.abspath(self.export_cache_dir), report=self.report)
 
     @property
     def poetry(self) -> Poetry:
-        return Poetry(self.poetry_path)
+        return Poetry(self.poetry_path, cache=self.export_cache)
 
     @property
     def uv(self) -> Uv:
-        return Uv(self.uv_path)
+        return Uv(self.uv_path, cache=self.export_cache)
 
     @property
     def package_manager(self) -> PackageManager:
@@ -45,7 +66,78 @@ class Context:
 
     @property
     def compiler(self) -> Compiler:
-        return SmartCompiler([Cython(), Nuitka3(self.nuitka_path)])
+        return self.make_compiler()
+
+    def make_compiler(self, cython_shared_utility: bool = False, jobs: int = 0) -> Compiler:
+        return SmartCompiler(
+            [
+                Cython(shared_utility=cython_shared_utility, jobs=jobs, report=self.report),
+                Nuitka3(self.nuitka_path),
+                Bytecode(workers=jobs, report=self.report),
+            ],
+            report=self.report,
+        )
+
+    def make_stripper(self, strip: bool = False, debug_dir: Optional[str] = None) -> Optional[ExtensionStripper]:
+        if not strip:
+            return None
+
+        return ExtensionStripper(debug_dir=os.path.abspath(debug_dir) if debug_dir else None, report=self.report)
+
+    def make_selector(
+        self, profile: Optional[str] = None, threshold: float = 0.1, fallback: str = "bytecode", link_mode: str = "copy"
+    ) -> Optional[HotModuleSelector]:
+        if not profile:
+            return None
+
+        return HotModuleSelector(
+            stats_path=os.path.abspath(profile),
+            threshold=threshold,
+            fallback=fallback,
+            link_mode=link_mode,
+            report=self.report,
+        )
+
+    def make_deduplicator(self, dedupe: bool = False, link_mode: str = "copy") -> Optional[ModuleDeduplicator]:
+        if not dedupe:
+            return None
+
+        return ModuleDeduplicator(link_mode=link_mode, report=self.report)
+
+    def make_wheel_writer(
+        self, output_wheels: bool = False, version: str = "0.0.0", versions: Optional[Dict[str, str]] = None
+    ) -> Optional[WheelWriter]:
+        if not output_wheels:
+            return None
+
+        return WheelWriter(version=version, versions=versions or {}, report=self.report)
+
+    def make_unpacker(
+        self,
+        unpack_wheels: bool = False,
+        cache_dir: Optional[str] = None,
+        cache_size: int = 0,
+        offline: bool = False,
+    ) -> Optional[WheelUnpacker]:
+        if offline and not cache_dir:
+            raise click.UsageError("--offline needs a --wheel-cache-dir")
+
+        if not (unpack_wheels or cache_dir):
+            return None
+
+        cache = None
+        if cache_dir:
+            cache = WheelCache(root=os.path.abspath(cache_dir), max_size=cache_size * 1024 * 1024, report=self.report)
+
+        return WheelUnpacker(report=self.report, cache=cache, offline=offline)
+
+    def make_copier(self, reuse_venv: bool = False, hardlink: bool = False) -> Optional[InstalledPackageCopier]:
+        if not reuse_venv:
+            return None
+
+        return InstalledPackageCopier(
+            site_dirs=self.package_manager.site_packages(), hardlink=hardlink, report=self.report
+        )
 
     @property
     def config(self) -> Config:
@@ -63,6 +155,9 @@ class Context:
         @click.option("--uv-path", default="uv", help="path to uv")
         @click.option("--nuitka-path", default="nuitka3", help="path to nuitka3")
         @click.option("--log-level", default="INFO", help="log level")
+        @click.option(
+            "--export-cache-dir", envvar="VERSIFIER_EXPORT_CACHE_DIR", default=None, help="cache exported requirements"
+        )
         @functools.wraps(func)
         def wrapped(
             config: str,
@@ -71,6 +166,7 @@ class Context:
             uv_path: str,
             nuitka_path: str,
             log_level: str,
+            export_cache_dir: Optional[str],
             *args: Any,
             **kwargs: Any,
         ) -> None:
@@ -83,12 +179,26 @@ class Context:
                 poetry_path=poetry_path,
                 uv_path=uv_path,
                 nuitka_path=nuitka_path,
+                export_cache_dir=export_cache_dir,
             )
             func(ctx=ctx, *args, **kwargs)
 
         return wrapped
 
 
+def parse_matrix(matrix: List[str]) -> Dict[str, List[str]]:
+    """Marker environments by output file, from <output>:<marker>[,<marker>...] options."""
+    environments = {}
+    for item in matrix:
+        path, sep, markers = item.partition(":")
+        if not sep or not path:
+            raise click.BadParameter(f"{item!r} is not <output>:<marker>[,<marker>...]", param_hint="--matrix")
+
+        environments[path] = [m.strip() for m in markers.split(",") if m.strip()]
+
+    return environments
+
+
 @click.group()
 def cli() -> None:
     pass
@@ -125,6 +235,7 @@ def requirements_to_poetry(
 @click.option("--include-comments", is_flag=True, help="include comments")
 @click.option("-d", "--include-dev-requirements", is_flag=True, help="include dev requirements")
 @click.option("-E", "--extra-requirements", multiple=True, default=[], help="extra requirements")
+@click.option("-M", "--matrix", multiple=True, default=[], help="<output>:<marker>,... written in one export")
 @click.option("-m", "--markers", multiple=True, default=[], help="markers")
 @click.option("-P", "--private-packages", multiple=True, default=[], help="private packages")
 @Context.wrapper
@@ -136,6 +247,7 @@ def poetry_to_requirements(
     include_dev_requirements: bool,
     extra_requirements: List[str],
     markers: List[str],
+    matrix: List[str],
     private_packages: List[str],
 ) -> None:
     conf = ctx.config
@@ -143,6 +255,20 @@ def poetry_to_requirements(
         private_packages = conf.get_private_packages() or []
 
     ext = core.DependencyExporter(ctx.poetry)
+    if matrix:
+        if markers:
+            raise click.UsageError("--matrix and --markers can not be used together")
+
+        ext.export_matrix_to_requirements_txt(
+            parse_matrix(matrix),
+            include_specifiers=not exclude_specifiers,
+            include_comments=include_comments,
+            exclude=private_packages,
+            include_dev_requirements=include_dev_requirements,
+            extra_requirements=extra_requirements,
+        )
+        return
+
     fn = partial(
         ext.export_to_requirements_txt,
         include_specifiers=not exclude_specifiers,
@@ -166,6 +292,14 @@ def poetry_to_requirements(
 @click.option("-E", "--extra-requirements", multiple=True, default=[], help="extra requirements")
 @click.option("--exclude-file-patterns", multiple=True, default=[], help="exclude files")
 @click.option("-P", "--private-packages", multiple=True, default=[], help="private packages")
+@click.option("--sync-output", is_flag=True, help="only write changed files and remove stale ones from the output")
+@click.option("--unpack-wheels", is_flag=True, help="unpack compatible wheels directly instead of running pip")
+@click.option("--wheel-cache-dir", default=None, help="keep downloaded wheels in this dir, implies --unpack-wheels")
+@click.option("--wheel-cache-size", default=1024, help="wheel cache size limit in MB, 0 for no limit")
+@click.option("--offline", is_flag=True, help="only unpack wheels from the wheel cache")
+@click.option("--reuse-venv", is_flag=True, help="copy locked packages already installed in the project venv")
+@click.option("--reuse-venv-hardlink", is_flag=True, help="hardlink instead of copying files reused from the venv")
+@click.option("--incremental", is_flag=True, help="only replace packages whose locked version changed")
 @Context.wrapper
 def extract_private_packages(
     ctx: Context,
@@ -173,6 +307,14 @@ def extract_private_packages(
     extra_requirements: List[str],
     exclude_file_patterns: List[str],
     private_packages: List[str],
+    sync_output: bool,
+    unpack_wheels: bool,
+    wheel_cache_dir: Optional[str],
+    wheel_cache_size: int,
+    offline: bool,
+    reuse_venv: bool,
+    reuse_venv_hardlink: bool,
+    incremental: bool,
 ) -> None:
     conf = ctx.config
 
@@ -182,26 +324,71 @@ def extract_private_packages(
     if not private_packages:
         raise click.UsageError("No private packages found")
 
+    if incremental and sync_output:
+        raise click.UsageError("--incremental and --sync-output can not be used together")
+
+    unpacker = ctx.make_unpacker(
+        unpack_wheels=unpack_wheels, cache_dir=wheel_cache_dir, cache_size=wheel_cache_size, offline=offline
+    )
     os.makedirs(output, exist_ok=True)
-    ext = core.PackageExtractor(ctx.package_manager)
-    ext.extract_packages(
-        output_dir=output,
-        packages=private_packages,
-        extra_requirements=extra_requirements,
-        exclude_file_patterns=exclude_file_patterns,
+    ext = core.PackageExtractor(
+        ctx.package_manager,
+        unpacker=unpacker,
+        copier=ctx.make_copier(reuse_venv=reuse_venv, hardlink=reuse_venv_hardlink),
+        sync=sync_output,
+        incremental=incremental,
+        report=ctx.report,
     )
+    try:
+        ext.extract_packages(
+            output_dir=output,
+            packages=private_packages,
+            extra_requirements=extra_requirements,
+            exclude_file_patterns=exclude_file_patterns,
+        )
+    except LookupError as e:
+        raise click.ClickException(str(e)) from e
+    ctx.report.log()
 
 
 @cli.command(help="obfuscate project dirs")
 @click.option("-o", "--output", default="output", help="output dir")
 @click.option("-d", "--sub-dirs", multiple=True, default=None, help="included sub dirs")
 @click.option("--exclude-packages", multiple=True, default=["*.tests"], help="exclude packages")
+@click.option("--cython-shared-utility", is_flag=True, help="share cython utility code per package")
+@click.option("--strip", is_flag=True, help="strip symbols from compiled extensions")
+@click.option("--strip-debug-dir", default=None, help="keep stripped debug info in this dir")
+@click.option("--profile", default=None, help="cProfile stats file, only hot modules are compiled")
+@click.option("--profile-threshold", default=0.1, help="cumulative seconds for a module to be compiled")
+@click.option(
+    "--profile-fallback", type=click.Choice(["bytecode", "source"]), default="bytecode", help="cold module output"
+)
+@click.option("--dedupe-modules", is_flag=True, help="reuse compiled artifacts of identical modules")
+@click.option(
+    "--link-mode", type=click.Choice(LINK_MODES), default="copy", help="how reused and source files are placed"
+)
+@click.option("--sync-output", is_flag=True, help="only write changed files and remove stale ones from the output")
+@click.option("--output-wheels", is_flag=True, help="write one wheel per package instead of a directory tree")
+@click.option("--wheel-version", default="0.0.0", help="version of the written wheels")
+@click.option("-j", "--jobs", default=1, help="number of sub dirs processed concurrently")
 @Context.wrapper
 def obfuscate_project_dirs(
     ctx: Context,
     output: str,
     sub_dirs: List[str],
     exclude_packages: List[str],
+    cython_shared_utility: bool,
+    strip: bool,
+    strip_debug_dir: Optional[str],
+    profile: Optional[str],
+    profile_threshold: float,
+    profile_fallback: str,
+    dedupe_modules: bool,
+    link_mode: str,
+    sync_output: bool,
+    output_wheels: bool,
+    wheel_version: str,
+    jobs: int,
 ) -> None:
     root_dir = ctx.root_dir
     conf = ctx.config
@@ -209,28 +396,120 @@ def obfuscate_project_dirs(
     if not sub_dirs:
         sub_dirs = conf.get_projects_dirs() or ["."]
 
-    os.makedirs(output, exist_ok=True)
-    for d in sub_dirs:
-        path = root_dir.joinpath(d)
-        ext = core.PackageObfuscator(compiler=ctx.compiler)
-        ext.obfuscate_packages(
-            packages=set(i.parent.name for i in path.glob("*/__init__.py")),
-            root_dir=str(path),
-            output_dir=output,
-            exclude_packages=exclude_packages,
+    jobs = max(1, min(jobs, len(sub_dirs)))
+    # sub dirs and the compilers inside them share one cpu budget
+    compile_jobs = max(1, (os.cpu_count() or 1) // jobs)
+
+    def make_obfuscator(c: Context, deduplicator: Optional[ModuleDeduplicator]) -> core.PackageObfuscator:
+        return core.PackageObfuscator(
+            compiler=c.make_compiler(cython_shared_utility=cython_shared_utility, jobs=compile_jobs),
+            stripper=c.make_stripper(strip=strip, debug_dir=strip_debug_dir),
+            selector=c.make_selector(
+                profile=profile, threshold=profile_threshold, fallback=profile_fallback, link_mode=link_mode
+            ),
+            deduplicator=deduplicator,
+            wheels=c.make_wheel_writer(output_wheels=output_wheels, version=wheel_version),
+            report=c.report,
         )
 
+    paths = [str(root_dir.joinpath(d)) for d in sub_dirs]
+    os.makedirs(output, exist_ok=True)
+    with staging_dir(output) as staging:
+        stage_dirs = [os.path.join(staging, str(i)) for i in range(len(paths))]
+
+        if jobs == 1:
+            obfuscator = make_obfuscator(ctx, ctx.make_deduplicator(dedupe=dedupe_modules, link_mode=link_mode))
+            for path, stage_dir in zip(paths, stage_dirs, strict=True):
+                core.obfuscate_project_dir(obfuscator, path, stage_dir, exclude_packages)
+        else:
+            with ProcessPoolExecutor(
+                max_workers=jobs,
+                mp_context=process_context(),
+                initializer=core.init_project_worker,
+                # the worker stores go with the staging dir, workers never clean up after themselves
+                initargs=(dedupe_modules, link_mode, os.path.join(staging, "dedupe")),
+            ) as executor:
+                futures = [
+                    executor.submit(
+                        core.obfuscate_project_dir,
+                        make_obfuscator(replace(ctx, report=BuildReport()), None),
+                        path,
+                        stage_dir,
+                        exclude_packages,
+                    )
+                    for path, stage_dir in zip(paths, stage_dirs, strict=True)
+                ]
+                for future in futures:
+                    ctx.report.merge(future.result())
+
+        # with --sync-output the sub dirs are merged first, the complete result is then synced
+        merged_dir = os.path.join(staging, "output") if sync_output else output
+        os.makedirs(merged_dir, exist_ok=True)
+
+        # merged in sub dir order, so the output does not depend on which worker finished first
+        claimed: Set[str] = set()
+        for stage_dir in stage_dirs:
+            if not os.path.isdir(stage_dir):
+                continue
+
+            for path in core.merge_tree(stage_dir, merged_dir, claimed):
+                logger.warning("%s is produced by more than one sub dir, keeping the first one as a whole", path)
+                ctx.report.incr("merge.collisions")
+
+        if sync_output:
+            core.sync_tree(merged_dir, output, ctx.report)
+
+    ctx.report.log()
+
 
 @cli.command(help="obfuscate private packages")
 @click.option("-o", "--output", default="output", help="output dir")
 @click.option("-E", "--extra-requirements", multiple=True, default=[], help="extra requirements")
 @click.option("-P", "--private-packages", multiple=True, default=[], help="private packages")
+@click.option("--cython-shared-utility", is_flag=True, help="share cython utility code per package")
+@click.option("--strip", is_flag=True, help="strip symbols from compiled extensions")
+@click.option("--strip-debug-dir", default=None, help="keep stripped debug info in this dir")
+@click.option("--profile", default=None, help="cProfile stats file, only hot modules are compiled")
+@click.option("--profile-threshold", default=0.1, help="cumulative seconds for a module to be compiled")
+@click.option(
+    "--profile-fallback", type=click.Choice(["bytecode", "source"]), default="bytecode", help="cold module output"
+)
+@click.option("--dedupe-modules", is_flag=True, help="reuse compiled artifacts of identical modules")
+@click.option(
+    "--link-mode", type=click.Choice(LINK_MODES), default="copy", help="how reused and source files are placed"
+)
+@click.option("--sync-output", is_flag=True, help="only write changed files and remove stale ones from the output")
+@click.option("--output-wheels", is_flag=True, help="write one wheel per package instead of a directory tree")
+@click.option("--wheel-version", default="0.0.0", help="version of the written wheels")
+@click.option("--unpack-wheels", is_flag=True, help="unpack compatible wheels directly instead of running pip")
+@click.option("--wheel-cache-dir", default=None, help="keep downloaded wheels in this dir, implies --unpack-wheels")
+@click.option("--wheel-cache-size", default=1024, help="wheel cache size limit in MB, 0 for no limit")
+@click.option("--offline", is_flag=True, help="only unpack wheels from the wheel cache")
+@click.option("--reuse-venv", is_flag=True, help="copy locked packages already installed in the project venv")
+@click.option("--reuse-venv-hardlink", is_flag=True, help="hardlink instead of copying files reused from the venv")
 @Context.wrapper
 def obfuscate_private_packages(
     ctx: Context,
     output: str,
     extra_requirements: List[str],
     private_packages: List[str],
+    cython_shared_utility: bool,
+    strip: bool,
+    strip_debug_dir: Optional[str],
+    profile: Optional[str],
+    profile_threshold: float,
+    profile_fallback: str,
+    dedupe_modules: bool,
+    link_mode: str,
+    sync_output: bool,
+    output_wheels: bool,
+    wheel_version: str,
+    unpack_wheels: bool,
+    wheel_cache_dir: Optional[str],
+    wheel_cache_size: int,
+    offline: bool,
+    reuse_venv: bool,
+    reuse_venv_hardlink: bool,
 ) -> None:
     conf = ctx.config
 
@@ -240,22 +519,48 @@ def obfuscate_private_packages(
     if not private_packages:
         raise click.UsageError("No private packages found")
 
+    unpacker = ctx.make_unpacker(
+        unpack_wheels=unpack_wheels, cache_dir=wheel_cache_dir, cache_size=wheel_cache_size, offline=offline
+    )
     os.makedirs(output, exist_ok=True)
-    with TemporaryDirectory() as td:
-        extractor = core.PackageExtractor(ctx.package_manager)
-        extractor.extract_packages(
-            output_dir=td,
-            packages=private_packages,
-            extra_requirements=extra_requirements,
+    with staging_dir(output) as td:
+        extractor = core.PackageExtractor(
+            ctx.package_manager,
+            unpacker=unpacker,
+            copier=ctx.make_copier(reuse_venv=reuse_venv, hardlink=reuse_venv_hardlink),
+            report=ctx.report,
+        )
+        try:
+            rf = extractor.extract_packages(
+                output_dir=td,
+                packages=private_packages,
+                extra_requirements=extra_requirements,
+            )
+        except LookupError as e:
+            raise click.ClickException(str(e)) from e
+
+        # wheels of private packages carry their locked versions
+        versions: Dict[str, str] = {canonicalize_name(r.name): v for r in rf.requirements if (v := pinned_version(r))}
+
+        obfuscator = core.PackageObfuscator(
+            compiler=ctx.make_compiler(cython_shared_utility=cython_shared_utility),
+            stripper=ctx.make_stripper(strip=strip, debug_dir=strip_debug_dir),
+            selector=ctx.make_selector(
+                profile=profile, threshold=profile_threshold, fallback=profile_fallback, link_mode=link_mode
+            ),
+            deduplicator=ctx.make_deduplicator(dedupe=dedupe_modules, link_mode=link_mode),
+            wheels=ctx.make_wheel_writer(output_wheels=output_wheels, version=wheel_version, versions=versions),
+            sync=sync_output,
+            report=ctx.report,
         )
-
-        obfuscator = core.PackageObfuscator(compiler=ctx.compiler)
         obfuscator.obfuscate_packages(
             packages=private_packages,
             root_dir=td,
             output_dir=output,
         )
 
+    ctx.report.log()
+
 
 @cli.command(help="convert requirements to uv")
 @click.option("-R", "--requirements", multiple=True, default=[], help="requirements files")
@@ -288,6 +593,7 @@ def requirements_to_uv(
 @click.option("--include-comments", is_flag=True, help="include comments")
 @click.option("-d", "--include-dev-requirements", is_flag=True, help="include dev requirements")
 @click.option("-E", "--extra-requirements", multiple=True, default=[], help="extra requirements")
+@click.option("-M", "--matrix", multiple=True, default=[], help="<output>:<marker>,... written in one export")
 @click.option("-m", "--markers", multiple=True, default=[], help="markers")
 @click.option("-P", "--private-packages", multiple=True, default=[], help="private packages")
 @Context.wrapper
@@ -299,6 +605,7 @@ def uv_to_requirements(
     include_dev_requirements: bool,
     extra_requirements: List[str],
     markers: List[str],
+    matrix: List[str],
     private_packages: List[str],
 ) -> None:
     conf = ctx.config
@@ -306,6 +613,20 @@ def uv_to_requirements(
         private_packages = conf.get_private_packages() or []
 
     ext = core.DependencyExporter(poetry=ctx.uv)
+    if matrix:
+        if markers:
+            raise click.UsageError("--matrix and --markers can not be used together")
+
+        ext.export_matrix_to_requirements_txt(
+            parse_matrix(matrix),
+            include_specifiers=not exclude_specifiers,
+            include_comments=include_comments,
+            exclude=private_packages,
+            include_dev_requirements=include_dev_requirements,
+            extra_requirements=extra_requirements,
+        )
+        return
+
     fn = partial(
         ext.export_to_requirements_txt,
         include_specifiers=not exclude_specifiers,
@@ -324,6 +645,78 @@ def uv_to_requirements(
             fn(callback=lambda line: f.write(line + "\n"))
 
 
+@cli.command(help="benchmark import time of obfuscated output against source")
+@click.option("-s", "--source", default=".", help="source dir")
+@click.option("-o", "--output", default="output", help="obfuscated output dir")
+@click.option("-P", "--packages", multiple=True, default=[], help="packages to import")
+@click.option("-n", "--repeat", default=3, help="runs per module, the fastest one is kept")
+@click.option(
+    "--exclude-packages", multiple=True, default=["*.tests", "*.test_*"], help="modules that are not imported"
+)
+@click.option("--python-path", default=sys.executable, help="path to python")
+@Context.wrapper
+def bench_import(
+    ctx: Context,
+    source: str,
+    output: str,
+    packages: List[str],
+    repeat: int,
+    exclude_packages: List[str],
+    python_path: str,
+) -> None:
+    if not packages:
+        packages = sorted(i.parent.name for i in Path(source).glob("*/__init__.py"))
+
+    if not packages:
+        raise click.UsageError("No packages found")
+
+    benchmark = bench.ImportBenchmark(python_path=python_path, repeat=repeat, exclude_packages=list(exclude_packages))
+    results = benchmark.compare(source_dir=source, output_dir=output, packages=packages)
+    columns = {
+        "module": "module",
+        "source_us": "source(us)",
+        "output_us": "output(us)",
+        "diff_us": "diff(us)",
+        "ratio": "ratio",
+    }
+    for line in bench.format_results(results, columns):
+        print(line)
+
+
+@cli.command(help="benchmark runtime of obfuscated output against source")
+@click.option("-s", "--source", default=".", help="source dir")
+@click.option("-o", "--output", default="output", help="obfuscated output dir")
+@click.option("-b", "--suite", required=True, help="benchmark module or pytest-benchmark suite")
+@click.option("-n", "--repeat", default=5, help="repeats per benchmark, the fastest one is kept")
+@click.option("--python-path", default=sys.executable, help="path to python")
+@Context.wrapper
+def bench_runtime(
+    ctx: Context,
+    source: str,
+    output: str,
+    suite: str,
+    repeat: int,
+    python_path: str,
+) -> None:
+    benchmark = bench.RuntimeBenchmark(python_path=python_path, repeat=repeat)
+    results = benchmark.compare(source_dir=source, output_dir=output, suite=suite)
+    if not results:
+        raise click.ClickException("No benchmark results")
+
+    columns = {
+        "name": "benchmark",
+        "source_us": "source(us)",
+        "output_us": "output(us)",
+        "speedup": "speedup",
+    }
+    for line in bench.format_results(results, columns):
+        print(line)
+
+    geomean = bench.geometric_mean_speedup(results)
+    if geomean:
+        print(f"geometric mean speedup: {geomean:.2f}")
+
+
 @cli.command(help="show command help details")
 @click.pass_context
 def command_details(ctx: click.Context) -> None:
@@ -0,0 +1,268 @@
+import json
+import logging
+import math
+import os
+import sys
+from dataclasses import dataclass, field
+from subprocess import PIPE, run
+from tempfile import TemporaryDirectory
+from typing import Any, Dict, Iterable, List, Optional
+
+from .fileindex import FileIndex, compile_patterns
+
+logger = logging.getLogger(__name__)
+
+MODULE_RUNNER = """
+import importlib.util, json, sys, timeit
+sys.path.insert(0, {root!r})
+spec = importlib.util.spec_from_file_location("versifier_benchmarks", {suite!r})
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+results = {{}}
+failed = []
+for name in sorted(dir(module)):
+    func = getattr(module, name)
+    if name.startswith("bench_") and callable(func):
+        try:
+            timer = timeit.Timer(func)
+            number, _ = timer.autorange()
+            results[name] = min(timer.repeat(repeat={repeat}, number=number)) / number
+        except Exception as e:
+            print(f"{{name}} failed: {{e!r}}", file=sys.stderr)
+            failed.append(name)
+with open({result_path!r}, "w") as f:
+    json.dump(results, f)
+sys.exit(1 if failed else 0)
+"""
+
+PYTEST_RUNNER = """
+import json, sys
+sys.path.insert(0, {root!r})
+import pytest
+code = pytest.main([
+    {suite!r},
+    "--benchmark-only",
+    {benchmark_json!r},
+    "--import-mode=importlib",
+    "-p",
+    "no:cacheprovider",
+    "-q",
+])
+with open({benchmark_path!r}) as f:
+    benchmarks = json.load(f)["benchmarks"]
+with open({result_path!r}, "w") as f:
+    json.dump({{b["fullname"]: b["stats"]["min"] for b in benchmarks}}, f)
+sys.exit(code)
+"""
+
+
+def discover_modules(
+    source_dir: str,
+    packages: Iterable[str],
+    index: Optional[FileIndex] = None,
+    exclude_packages: Iterable[str] = (),
+) -> List[str]:
+    """Modules that are safe to import, __main__ modules run a cli and excluded ones may have side effects."""
+    walk = index.walk if index else os.walk
+    isfile = index.isfile if index else os.path.isfile
+    is_excluded = compile_patterns(exclude_packages)
+    modules = []
+    for package in packages:
+        package_dir = os.path.join(source_dir, package)
+        if isfile(f"{package_dir}.py"):
+            if not is_excluded(package):
+                modules.append(package)
+            continue
+
+        if is_excluded(package):
+            continue
+
+        for root, dirs, files in walk(package_dir):
+            prefix = os.path.relpath(root, source_dir).replace(os.sep, ".")
+            dirs[:] = sorted(
+                d for d in dirs if isfile(os.path.join(root, d, "__init__.py")) and not is_excluded(f"{prefix}.{d}")
+            )
+            for file in sorted(files):
+                if file == "__init__.py":
+                    modules.append(prefix)
+                elif file.endswith(".py") and file != "__main__.py" and not is_excluded(f"{prefix}.{file[:-3]}"):
+                    modules.append(f"{prefix}.{file[:-3]}")
+
+    return modules
+
+
+def parse_importtime(stderr: str, packages: Iterable[str]) -> int:
+    roots = set(packages)
+    total = 0
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+
+        try:
+            _, cumulative, name = line[len("import time:") :].split("|")
+            value = int(cumulative)
+        except ValueError:
+            continue
+
+        if name.startswith("   "):
+            continue
+
+        if name.strip().split(".", 1)[0] in roots:
+            total += value
+
+    return total
+
+
+@dataclass
+class ImportResult:
+    module: str
+    source_us: Optional[int]
+    output_us: Optional[int]
+
+    @property
+    def diff_us(self) -> Optional[int]:
+        if self.source_us is None or self.output_us is None:
+            return None
+
+        return self.output_us - self.source_us
+
+    @property
+    def ratio(self) -> Optional[float]:
+        if not self.source_us or self.output_us is None:
+            return None
+
+        return self.output_us / self.source_us
+
+
+@dataclass
+class ImportBenchmark:
+    python_path: str = sys.executable
+    repeat: int = 3
+    exclude_packages: List[str] = field(default_factory=list)
+
+    def measure(self, root_dir: str, modules: List[str], packages: Iterable[str]) -> Optional[int]:
+        statements = [f"import sys; sys.path.insert(0, {os.path.abspath(root_dir)!r})"]
+        statements.extend(f"import {m}" for m in modules)
+        commands = [self.python_path, "-I", "-X", "importtime", "-c", "\n".join(statements)]
+
+        samples = []
+        for _ in range(self.repeat):
+            result = run(commands, stdout=PIPE, stderr=PIPE, text=True, check=False)
+            if result.returncode != 0:
+                logger.warning("Failed to import %s from %s: %s", ", ".join(modules), root_dir, result.stderr.strip())
+                return None
+
+            samples.append(parse_importtime(result.stderr, packages))
+
+        return min(samples)
+
+    def compare(self, source_dir: str, output_dir: str, packages: Iterable[str]) -> List[ImportResult]:
+        package_list = list(packages)
+        modules = discover_modules(source_dir, package_list, exclude_packages=self.exclude_packages)
+
+        results = []
+        for module in modules:
+            results.append(
+                ImportResult(
+                    module=module,
+                    source_us=self.measure(source_dir, [module], package_list),
+                    output_us=self.measure(output_dir, [module], package_list),
+                )
+            )
+
+        results.append(
+            ImportResult(
+                module="(total)",
+                source_us=self.measure(source_dir, modules, package_list),
+                output_us=self.measure(output_dir, modules, package_list),
+            )
+        )
+
+        return results
+
+
+@dataclass
+class RuntimeResult:
+    name: str
+    source_us: Optional[float]
+    output_us: Optional[float]
+
+    @property
+    def speedup(self) -> Optional[float]:
+        if self.source_us is None or not self.output_us:
+            return None
+
+        return self.source_us / self.output_us
+
+
+@dataclass
+class RuntimeBenchmark:
+    python_path: str = sys.executable
+    repeat: int = 5
+
+    def _is_pytest_suite(self, suite: str) -> bool:
+        return os.path.isdir(suite) or os.path.basename(suite).startswith("test_")
+
+    def measure(self, root_dir: str, suite: str) -> Dict[str, float]:
+        with TemporaryDirectory() as td:
+            result_path = os.path.join(td, "results.json")
+            benchmark_path = os.path.join(td, "benchmark.json")
+            template = PYTEST_RUNNER if self._is_pytest_suite(suite) else MODULE_RUNNER
+            script = template.format(
+                root=os.path.abspath(root_dir),
+                suite=os.path.abspath(suite),
+                repeat=self.repeat,
+                result_path=result_path,
+                benchmark_path=benchmark_path,
+                benchmark_json=f"--benchmark-json={benchmark_path}",
+            )
+
+            result = run([self.python_path, "-I", "-c", script], stdout=PIPE, stderr=PIPE, text=True, check=False)
+            if result.returncode != 0:
+                # the benchmarks that did run are still reported
+                logger.warning(
+                    "Failed to run %s against %s: %s", suite, root_dir, (result.stderr or result.stdout).strip()
+                )
+
+            if not os.path.exists(result_path):
+                return {}
+
+            with open(result_path) as f:
+                seconds: Dict[str, float] = json.load(f)
+
+        return {name: value * 1e6 for name, value in seconds.items()}
+
+    def compare(self, source_dir: str, output_dir: str, suite: str) -> List[RuntimeResult]:
+        source = self.measure(source_dir, suite)
+        output = self.measure(output_dir, suite)
+
+        return [
+            RuntimeResult(name=name, source_us=source.get(name), output_us=output.get(name))
+            for name in sorted(set(source) | set(output))
+        ]
+
+
+def geometric_mean_speedup(results: Iterable[RuntimeResult]) -> Optional[float]:
+    speedups = [r.speedup for r in results if r.speedup]
+    if not speedups:
+        return None
+
+    return math.exp(sum(math.log(i) for i in speedups) / len(speedups))
+
+
+def format_results(results: Iterable[Any], columns: Dict[str, str]) -> List[str]:
+    rows = [list(columns.values())]
+    for result in results:
+        row = []
+        for attr in columns:
+            value = getattr(result, attr)
+            if value is None:
+                row.append("-")
+            elif isinstance(value, float):
+                row.append(f"{value:.2f}")
+            else:
+                row.append(str(value))
+        rows.append(row)
+
+    widths = [max(len(row[i]) for row in rows) for i in range(len(columns))]
+    return ["  ".join(cell.ljust(width) for cell, width in zip(row, widths, strict=True)).rstrip() for row in rows]
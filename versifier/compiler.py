@@ -1,25 +1,87 @@
 import logging
+import multiprocessing
 import os
+import py_compile
 import shutil
-from dataclasses import dataclass
-from distutils.core import setup
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from distutils.core import Extension, setup
+from importlib.machinery import EXTENSION_SUFFIXES
+from multiprocessing.context import BaseContext
 from subprocess import check_call
 from tempfile import TemporaryDirectory
-from typing import Any, Dict, Iterable, List, Optional
+from typing import Any, Dict, Iterable, List, Optional, Set
 
 from Cython.Build import cythonize
 from typing_extensions import Protocol
 
+from .fileindex import FileIndex
+from .report import BuildReport
+
 logger = logging.getLogger(__name__)
 
 
+def process_context() -> BaseContext:
+    """A start method that never forks the calling process, which may be running other threads."""
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
 class Compiler(Protocol):
     def compile_packages(
-        self, source_dir: str, output_dir: str, packages: Iterable[str], **kwargs: Dict[str, Any]
+        self,
+        source_dir: str,
+        output_dir: str,
+        packages: Iterable[str],
+        modules: Optional[Iterable[str]] = None,
+        index: Optional[FileIndex] = None,
+        **kwargs: Dict[str, Any],
     ) -> None:
         ...
 
 
+def module_name(source_dir: str, path: str) -> str:
+    name = os.path.splitext(os.path.relpath(path, source_dir))[0].replace(os.sep, ".")
+    if name.endswith(".__init__"):
+        return name[: -len(".__init__")]
+
+    return name
+
+
+def module_path(source_dir: str, name: str) -> str:
+    path = os.path.join(source_dir, *name.split("."))
+    if os.path.isdir(path):
+        return os.path.join(path, "__init__.py")
+
+    return f"{path}.py"
+
+
+def is_single_extension(output_dir: str, package: str) -> bool:
+    return any(os.path.isfile(os.path.join(output_dir, f"{package}{suffix}")) for suffix in EXTENSION_SUFFIXES)
+
+
+def find_modules(
+    source_dir: str, package_path: str, modules: Optional[Set[str]] = None, index: Optional[FileIndex] = None
+) -> List[str]:
+    walk = index.walk if index else os.walk
+    module_list = []
+    for root, _, files in walk(package_path):
+        for file in files:
+            path = os.path.join(root, file)
+            if file.endswith(".py") and (modules is None or module_name(source_dir, path) in modules):
+                module_list.append(path)
+
+    return module_list
+
+
+def compile_bytecode(source_dir: str, output_dir: str, source_path: str, optimize: int) -> None:
+    relpath = os.path.relpath(source_path, source_dir)
+    target_path = os.path.join(output_dir, f"{relpath}c")
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    py_compile.compile(source_path, cfile=target_path, dfile=relpath, doraise=True, optimize=optimize)
+
+
 @dataclass
 class Nuitka3:
     nuitka_path: str = "nuitka3"
@@ -52,9 +114,12 @@ class Nuitka3:
         source_dir: str,
         output_dir: str,
         packages: Iterable[str],
+        modules: Optional[Iterable[str]] = None,
+        index: Optional[FileIndex] = None,
         nofollow_import_to: Optional[Iterable[str]] = None,
         **kwargs: Dict[str, Any],
     ) -> None:
+        # nuitka builds a whole package into a single extension, so modules can not be selected
         nofollow_import_to_list = list(nofollow_import_to or [])
 
         def handle_target(package: str, filename: str) -> bool:
@@ -78,50 +143,210 @@ class Nuitka3:
                 continue
 
 
+@dataclass
 class Cython:
-    def compile_packages(
-        self, source_dir: str, output_dir: str, packages: Iterable[str], **kwargs: Dict[str, Any]
+    shared_utility: bool = False
+    shared_utility_module: str = "_cyutility"
+    jobs: int = 0
+    report: BuildReport = field(default_factory=BuildReport)
+
+    def _build(
+        self,
+        source_dir: str,
+        output_dir: str,
+        build_dir: str,
+        module_list: List[str],
+        shared_utility_name: Optional[str] = None,
+    ) -> List[str]:
+        extensions: List[Any] = list(module_list)
+        options: Dict[str, Any] = {}
+        if shared_utility_name:
+            shared_source = f"{shared_utility_name.replace('.', os.sep)}.c"
+            extensions.insert(0, Extension(shared_utility_name, sources=[shared_source]))
+            options["shared_utility_qualified_name"] = shared_utility_name
+
+        cur_dir = os.path.realpath(os.curdir)
+        cflags = os.environ.get("CFLAGS")
+        if sys.platform != "win32":
+            # the temporary build dir ends up in the debug info, identical sources would never build the same bytes
+            os.environ["CFLAGS"] = f"{cflags or ''} -fdebug-prefix-map={build_dir}=.".strip()
+
+        os.chdir(source_dir)
+        try:
+            dist = setup(
+                ext_modules=cythonize(
+                    extensions, compiler_directives={"language_level": 3}, build_dir=build_dir, **options
+                ),
+                script_args=[
+                    "build_ext",
+                    "-b",
+                    output_dir,
+                    "-t",
+                    build_dir,
+                    "--parallel",
+                    str(self.jobs or os.cpu_count() or 1),
+                ],
+            )
+        finally:
+            os.chdir(cur_dir)
+            if cflags is None:
+                os.environ.pop("CFLAGS", None)
+            else:
+                os.environ["CFLAGS"] = cflags
+
+        return list(dist.get_command_obj("build_ext").get_outputs())
+
+    def _compile_shared(
+        self,
+        source_dir: str,
+        output_dir: str,
+        packages: Iterable[str],
+        modules: Optional[Set[str]] = None,
+        index: Optional[FileIndex] = None,
     ) -> None:
-        os.makedirs(output_dir, exist_ok=True)
+        isdir = index.isdir if index else os.path.isdir
+        for package in packages:
+            package_path = os.path.join(source_dir, package)
+            if not isdir(package_path):
+                self._compile_plain(source_dir, output_dir, [package], modules, index)
+                continue
+
+            module_list = find_modules(source_dir, package_path, modules, index)
+            if not module_list:
+                continue
+
+            shared_utility_name = f"{package}.{self.shared_utility_module}"
+            with TemporaryDirectory() as td, self.report.timer(f"cython.{package}"):
+                outputs = self._build(source_dir, output_dir, td, module_list, shared_utility_name)
+
+            shared_outputs = [i for i in outputs if os.path.basename(i).startswith(f"{self.shared_utility_module}.")]
+            self.report.add_file_sizes(f"cython.{package}", outputs)
+            self.report.add_file_sizes(f"cython.{package}.{self.shared_utility_module}", shared_outputs)
+            self.report.incr("cython.modules", len(module_list))
+            self.report.incr("cython.modules_sharing_utility", len(module_list))
+
+    def _compile_plain(
+        self,
+        source_dir: str,
+        output_dir: str,
+        packages: Iterable[str],
+        modules: Optional[Set[str]] = None,
+        index: Optional[FileIndex] = None,
+    ) -> None:
+        isdir = index.isdir if index else os.path.isdir
+        isfile = index.isfile if index else os.path.isfile
+        packages = list(packages)
         module_list = []
         with TemporaryDirectory() as td:
             for package in packages:
                 package_path = os.path.join(source_dir, package)
 
-                if os.path.isdir(package_path):
-                    for root, _, files in os.walk(package_path):
-                        for file in files:
-                            if file.endswith(".py"):
-                                module_list.append(os.path.join(root, file))
+                if isdir(package_path):
+                    module_list.extend(find_modules(source_dir, package_path, modules, index))
                 else:
                     package_file = f"{package_path}.py"
-                    if not os.path.isfile(package_file):
+                    if not isfile(package_file) or (modules is not None and package not in modules):
                         continue
 
                     target_path = f"{os.path.join(td, package)}.py"
                     shutil.copy(package_file, target_path)
                     module_list.append(target_path)
 
-            cur_dir = os.path.realpath(os.curdir)
-            os.chdir(source_dir)
-            try:
-                setup(
-                    ext_modules=cythonize(module_list, compiler_directives={"language_level": 3}, build_dir=td),
-                    script_args=["build_ext", "-b", output_dir, "-t", td],
-                )
-            finally:
-                os.chdir(cur_dir)
+            if modules is not None and not module_list:
+                return
+
+            label = ",".join(packages)
+            with self.report.timer(f"cython.{label}"):
+                outputs = self._build(source_dir, output_dir, td, module_list)
+
+        self.report.add_file_sizes(f"cython.{label}", outputs)
+        self.report.incr("cython.modules", len(module_list))
+
+    def compile_packages(
+        self,
+        source_dir: str,
+        output_dir: str,
+        packages: Iterable[str],
+        modules: Optional[Iterable[str]] = None,
+        index: Optional[FileIndex] = None,
+        **kwargs: Dict[str, Any],
+    ) -> None:
+        os.makedirs(output_dir, exist_ok=True)
+        module_set = None if modules is None else set(modules)
+        if self.shared_utility:
+            self._compile_shared(source_dir, output_dir, packages, module_set, index)
+        else:
+            self._compile_plain(source_dir, output_dir, packages, module_set, index)
+
+
+@dataclass
+class Bytecode:
+    optimize: int = 2
+    workers: int = 0
+    report: BuildReport = field(default_factory=BuildReport)
+
+    def _compile_files(self, source_dir: str, output_dir: str, source_paths: List[str]) -> None:
+        workers = min(self.workers or os.cpu_count() or 1, len(source_paths))
+        if workers <= 1:
+            for source_path in source_paths:
+                compile_bytecode(source_dir, output_dir, source_path, self.optimize)
+        else:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=process_context()) as executor:
+                futures = [
+                    executor.submit(compile_bytecode, source_dir, output_dir, source_path, self.optimize)
+                    for source_path in source_paths
+                ]
+                for future in futures:
+                    future.result()
+
+        self.report.incr("bytecode.modules", len(source_paths))
+
+    def compile_modules(self, source_dir: str, output_dir: str, modules: Iterable[str]) -> None:
+        self._compile_files(source_dir, output_dir, [module_path(source_dir, name) for name in modules])
+
+    def compile_packages(
+        self,
+        source_dir: str,
+        output_dir: str,
+        packages: Iterable[str],
+        modules: Optional[Iterable[str]] = None,
+        index: Optional[FileIndex] = None,
+        **kwargs: Dict[str, Any],
+    ) -> None:
+        isdir = index.isdir if index else os.path.isdir
+        isfile = index.isfile if index else os.path.isfile
+        module_set = None if modules is None else set(modules)
+        source_paths = []
+        for package in packages:
+            package_path = os.path.join(source_dir, package)
+            if isdir(package_path):
+                source_paths.extend(find_modules(source_dir, package_path, module_set, index))
+            elif isfile(f"{package_path}.py") and (module_set is None or package in module_set):
+                source_paths.append(f"{package_path}.py")
+
+        with self.report.timer("bytecode"):
+            self._compile_files(source_dir, output_dir, source_paths)
 
 
 @dataclass
 class SmartCompiler:
     compilers: List[Compiler]
+    report: BuildReport = field(default_factory=BuildReport)
+
+    def _exists(self, source_dir: str, package: str, index: Optional[FileIndex] = None) -> bool:
+        package_path = os.path.join(source_dir, package)
+        if index:
+            return index.isdir(package_path) or index.isfile(f"{package_path}.py")
+
+        return os.path.isdir(package_path) or os.path.isfile(f"{package_path}.py")
 
     def compile_packages(
         self,
         source_dir: str,
         output_dir: str,
         packages: Iterable[str],
+        modules: Optional[Iterable[str]] = None,
+        index: Optional[FileIndex] = None,
         **kwargs: Dict[str, Any],
     ) -> None:
         failed_packages = packages
@@ -132,7 +357,14 @@ class SmartCompiler:
 
             for package in packages:
                 try:
-                    compiler.compile_packages(source_dir, output_dir, [package], **kwargs)
+                    compiler.compile_packages(source_dir, output_dir, [package], modules=modules, index=index, **kwargs)
                 except Exception as e:
                     logger.warning("Failed to compile package %s with %s: %s", package, compiler, e)
                     failed_packages.append(package)
+                else:
+                    if self._exists(source_dir, package, index):
+                        self.report.note(f"tier.{package}", type(compiler).__name__)
+
+        for package in failed_packages:
+            logger.error("Failed to compile package %s with all compilers", package)
+            self.report.note(f"tier.{package}", "failed")
@@ -1,22 +1,177 @@
-import fnmatch
+import filecmp
 import logging
 import os
 import shutil
-from dataclasses import dataclass
-from itertools import chain
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass, field
 from tempfile import TemporaryDirectory
-from typing import Any, Iterable, List, Optional, Set, Union
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
 
-from .compiler import Compiler
+from packaging.utils import canonicalize_name
+
+from .compiler import Bytecode, Compiler, process_context
+from .dedupe import ModuleDeduplicator, ModuleKey
+from .fileindex import FileIndex, compile_patterns
+from .hotspot import HotModuleSelector
+from .manifest import ExtractManifest, installed_files
 from .poetry import Poetry, RequirementsFile
+from .publish import move, staging_dir
+from .report import BuildReport
+from .strip import ExtensionStripper
 from .stub import PackageStubGenerator
 from .uv import Uv
+from .venv import InstalledPackageCopier
+from .wheel import WheelUnpacker
+from .wheelwriter import WheelWriter
 
 PackageManager = Union[Poetry, Uv]
 
 logger = logging.getLogger(__name__)
 
 
+def merge_tree(source_dir: str, target_dir: str, claimed: Optional[Set[str]] = None) -> List[str]:
+    """Move the content of source_dir into target_dir, merging directories that already exist.
+
+    Paths recorded in claimed were written by an earlier merge of the same run. A top-level entry
+    of source_dir that would change any of them is skipped as a whole, so a package never mixes
+    the files of two merges, and its target path is returned. Other existing files are replaced.
+    """
+    collisions = []
+    os.makedirs(target_dir, exist_ok=True)
+    for name in sorted(os.listdir(source_dir)):
+        source_path = os.path.join(source_dir, name)
+        target_path = os.path.join(target_dir, name)
+        if claimed is None:
+            merge_path(source_path, target_path)
+            continue
+
+        files = tree_files(source_path, target_path)
+        if any(overwrites_claimed(s, t, target_dir, claimed) for s, t in files):
+            collisions.append(target_path)
+            continue
+
+        merge_path(source_path, target_path)
+        claimed.update(t for _, t in files)
+
+    return collisions
+
+
+def merge_path(source_path: str, target_path: str) -> None:
+    if os.path.isdir(source_path) and os.path.isdir(target_path):
+        merge_tree(source_path, target_path)
+        return
+
+    if os.path.isdir(target_path):
+        shutil.rmtree(target_path)
+    elif os.path.isdir(source_path) and os.path.lexists(target_path):
+        os.remove(target_path)
+    # a file replaces its target atomically, readers never see it missing
+    move(source_path, target_path)
+
+
+def tree_files(source_path: str, target_path: str) -> List[Tuple[str, str]]:
+    """The files under source_path, each with where it lands under target_path."""
+    if not os.path.isdir(source_path) or os.path.islink(source_path):
+        return [(source_path, target_path)]
+
+    return [
+        (path, os.path.join(target_path, os.path.relpath(path, source_path)))
+        for root, _, files in os.walk(source_path)
+        for path in (os.path.join(root, f) for f in files)
+    ]
+
+
+def overwrites_claimed(source_path: str, target_path: str, target_dir: str, claimed: Set[str]) -> bool:
+    if target_path in claimed:
+        return not (os.path.isfile(target_path) and filecmp.cmp(source_path, target_path, shallow=False))
+
+    # a claimed file where the source needs a dir, or a claimed dir where it has a file
+    parent = os.path.dirname(target_path)
+    while parent != target_dir and parent.startswith(target_dir):
+        if parent in claimed:
+            return True
+        parent = os.path.dirname(parent)
+
+    return os.path.isdir(target_path) and any(p.startswith(target_path + os.sep) for p in claimed)
+
+
+def same_file(source_path: str, target_path: str) -> bool:
+    if os.path.islink(source_path) or os.path.islink(target_path) or not os.path.isfile(target_path):
+        return False
+
+    return filecmp.cmp(source_path, target_path, shallow=False)
+
+
+def count_files(path: str) -> int:
+    if not os.path.isdir(path) or os.path.islink(path):
+        return 1
+
+    return sum(len(files) for _, _, files in os.walk(path))
+
+
+def sync_tree(source_dir: str, target_dir: str, report: BuildReport) -> None:
+    """Make target_dir a copy of source_dir, touching only the files that differ.
+
+    Identical files are left alone with their metadata, changed ones are replaced from source_dir and
+    files missing from source_dir are removed.
+    """
+    os.makedirs(target_dir, exist_ok=True)
+    source_names = set(os.listdir(source_dir))
+    for name in os.listdir(target_dir):
+        if name in source_names:
+            continue
+
+        target_path = os.path.join(target_dir, name)
+        report.incr("sync.removed", count_files(target_path))
+        if os.path.isdir(target_path) and not os.path.islink(target_path):
+            shutil.rmtree(target_path)
+        else:
+            os.remove(target_path)
+
+    for name in sorted(source_names):
+        source_path = os.path.join(source_dir, name)
+        target_path = os.path.join(target_dir, name)
+        source_is_dir = os.path.isdir(source_path) and not os.path.islink(source_path)
+        target_is_dir = os.path.isdir(target_path) and not os.path.islink(target_path)
+
+        if source_is_dir and target_is_dir:
+            sync_tree(source_path, target_path, report)
+            continue
+
+        if not source_is_dir and same_file(source_path, target_path):
+            report.incr("sync.unchanged")
+            continue
+
+        if target_is_dir:
+            report.incr("sync.removed", count_files(target_path))
+            shutil.rmtree(target_path)
+        elif source_is_dir and os.path.lexists(target_path):
+            report.incr("sync.removed")
+            os.remove(target_path)
+
+        report.incr("sync.written", count_files(source_path))
+        move(source_path, target_path)
+
+
+def remove_tree(path: str) -> Tuple[int, int]:
+    """Remove a directory tree, return the number of files and bytes removed."""
+    files = size = 0
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                removed_files, removed_size = remove_tree(entry.path)
+                files += removed_files
+                size += removed_size
+                continue
+
+            size += entry.stat(follow_symlinks=False).st_size
+            os.remove(entry.path)
+            files += 1
+
+    os.rmdir(path)
+    return files, size
+
+
 @dataclass
 class DependencyManager:
     poetry: PackageManager
@@ -74,32 +229,141 @@ class DependencyExporter:
         ).filter(exclude=exclude, markers=markers)
 
         for r in rf.requirements:
-            if include_comments:
-                callback(r.line)
+            callback(self._format_requirement(r, include_specifiers, include_comments))
 
-            elif include_specifiers:
-                callback(str(r.req))
+    def export_matrix_to_requirements_txt(
+        self,
+        environments: Dict[str, List[str]],
+        include_specifiers: bool = True,
+        include_comments: bool = False,
+        include_dev_requirements: bool = False,
+        with_credentials: bool = False,
+        extra_requirements: Iterable[str] = (),
+        exclude: Iterable[str] = (),
+    ) -> None:
+        """Export once and write a requirements file for each marker environment, keyed by the file path."""
+        rf = self.poetry.export_requirements(
+            extra_requirements=extra_requirements,
+            include_dev_requirements=include_dev_requirements,
+            with_credentials=with_credentials,
+        )
+
+        for path, filtered in zip(environments, rf.filter_matrix(environments.values(), exclude=exclude), strict=True):
+            with open(path, "w") as f:
+                for r in filtered.requirements:
+                    f.write(self._format_requirement(r, include_specifiers, include_comments) + "\n")
+
+            logger.info("Wrote %d requirements to %s", len(filtered.requirements), path)
 
-            else:
-                callback(r.req.name)
+    def _format_requirement(self, r: Any, include_specifiers: bool, include_comments: bool) -> str:
+        if include_comments:
+            return str(r.line)
+
+        if include_specifiers:
+            return str(r.req)
+
+        return str(r.req.name)
 
 
 @dataclass
 class PackageExtractor:
     poetry: PackageManager
+    unpacker: Optional[WheelUnpacker] = None
+    copier: Optional[InstalledPackageCopier] = None
+    sync: bool = False
+    incremental: bool = False
+    report: BuildReport = field(default_factory=BuildReport)
 
     def _do_clean_directory(self, path: str, exclude_file_patterns: Iterable[str]) -> None:
-        for root, dirs, files in os.walk(path):
-            for p in chain(dirs, files):
-                filepath = os.path.join(root, p)
+        if not os.path.isdir(path):
+            return
+
+        matches = compile_patterns(exclude_file_patterns)
+        with self.report.timer("clean"):
+            # a matching dir is collected without being scanned, its content goes with it
+            matched = []
+            pending = [path]
+            while pending:
+                with os.scandir(pending.pop()) as it:
+                    for entry in it:
+                        if matches(entry.path):
+                            matched.append(entry)
+                        elif entry.is_dir(follow_symlinks=False):
+                            pending.append(entry.path)
+
+            files = size = 0
+            for entry in matched:
+                if entry.is_dir(follow_symlinks=False):
+                    removed_files, removed_size = remove_tree(entry.path)
+                    files += removed_files
+                    size += removed_size
+                else:
+                    size += entry.stat(follow_symlinks=False).st_size
+                    os.remove(entry.path)
+                    files += 1
+
+        self.report.incr("clean.files", files)
+        self.report.add_size("clean.removed", size)
+
+    def _install_requirements(
+        self, rf: RequirementsFile, output_dir: str, exclude_file_patterns: Iterable[str]
+    ) -> None:
+        if self.copier:
+            remaining = self.copier.copy_requirements(rf, output_dir, exclude_file_patterns)
+            if not remaining:
+                return
 
-                if not os.path.exists(filepath):
-                    continue
+            rf = rf.filter(include=remaining)
 
-                for pattern in exclude_file_patterns:
-                    if fnmatch.fnmatch(filepath, pattern):
-                        shutil.rmtree(filepath)
-                        break
+        if self.unpacker:
+            remaining = self.unpacker.unpack_requirements(rf, output_dir, exclude_file_patterns)
+            if not remaining:
+                return
+
+            rf = rf.filter(include=remaining)
+
+        with staging_dir(output_dir) as td:
+            requirements_path = os.path.join(td, "requirements.txt")
+            rf.dump_to(requirements_path)
+            package_path = os.path.join(td, "packages")
+            self.poetry.install_requirements(requirements_path, package_path)
+
+            self._do_clean_directory(package_path, exclude_file_patterns)
+            # output_dir may already hold packages reused from the venv or unpacked from wheels
+            merge_tree(package_path, output_dir)
+
+    def _extract_incremental(self, rf: RequirementsFile, output_dir: str, exclude_file_patterns: Iterable[str]) -> None:
+        """Replace only the packages whose locked version or hashes differ from the manifest of output_dir."""
+        os.makedirs(output_dir, exist_ok=True)
+        manifest = ExtractManifest.load(output_dir)
+        wanted = {canonicalize_name(r.name) for r in rf.requirements}
+        for name in list(manifest.packages):
+            if name not in wanted:
+                logger.info("Removing %s, it is no longer locked", name)
+                manifest.remove(name)
+                self.report.incr("incremental.removed")
+
+        changed = [r.name for r in rf.requirements if not manifest.is_current(r)]
+        self.report.incr("incremental.unchanged", len(rf.requirements) - len(changed))
+        self.report.incr("incremental.changed", len(changed))
+        if changed:
+            changed_rf = rf.filter(include=changed)
+            with staging_dir(output_dir) as td:
+                staged_dir = os.path.join(td, "output")
+                os.makedirs(staged_dir)
+                # the dist-info RECORDs tell which package owns a file, they are cleaned once read
+                self._install_requirements(changed_rf, staged_dir, ())
+                owned = installed_files(staged_dir)
+                self._do_clean_directory(staged_dir, exclude_file_patterns)
+
+                for requirement in changed_rf.requirements:
+                    manifest.remove(requirement.name)
+                    files = owned.get(canonicalize_name(requirement.name), [])
+                    manifest.add(requirement, (f for f in files if os.path.lexists(os.path.join(staged_dir, f))))
+
+                merge_tree(staged_dir, output_dir)
+
+        manifest.dump()
 
     def extract_packages(
         self,
@@ -107,7 +371,8 @@ class PackageExtractor:
         packages: Iterable[str] = (),
         extra_requirements: Iterable[str] = (),
         exclude_file_patterns: Iterable[str] = (),
-    ) -> None:
+    ) -> RequirementsFile:
+        """Install the requirements of packages into output_dir, return the exported requirements."""
         exclude_file_patterns = exclude_file_patterns or ("*/*.dist-info", "*/__pycache__")
 
         rf = self.poetry.export_requirements(
@@ -116,31 +381,46 @@ class PackageExtractor:
             with_credentials=True,
         ).filter(include=packages)
 
-        with TemporaryDirectory() as td:
-            requirements_path = os.path.join(td, "requirements.txt")
-            rf.dump_to(requirements_path)
-            package_path = os.path.join(td, "packages")
-            self.poetry.run_command(
-                [
-                    "pip",
-                    "install",
-                    "--no-deps",
-                    "--requirement",
-                    requirements_path,
-                    "--target",
-                    package_path,
-                ]
-            )
+        if self.incremental:
+            self._extract_incremental(rf, output_dir, exclude_file_patterns)
+            return rf
 
-            self._do_clean_directory(package_path, exclude_file_patterns)
-            os.makedirs(output_dir, exist_ok=True)
-            for n in os.listdir(package_path):
-                shutil.move(os.path.join(package_path, n), os.path.join(output_dir, n))
+        if not self.sync:
+            self._install_requirements(rf, output_dir, exclude_file_patterns)
+            return rf
+
+        with staging_dir(output_dir) as td:
+            staged_dir = os.path.join(td, "output")
+            os.makedirs(staged_dir)
+            self._install_requirements(rf, staged_dir, exclude_file_patterns)
+            sync_tree(staged_dir, output_dir, self.report)
+
+        return rf
+
+
+def generate_stubs(source_dir: str, output_dir: str, packages: List[str], index: FileIndex) -> BuildReport:
+    report = BuildReport()
+    with report.timer("stubs"):
+        generator = PackageStubGenerator(output_dir=output_dir)
+        generator.generate(source_dir=source_dir, packages=packages, index=index)
+
+    return report
+
+
+def stub_executor() -> Executor:
+    # stub generation is pure python, in a thread it would only compete with the compilers for the GIL
+    return ProcessPoolExecutor(max_workers=1, mp_context=process_context())
 
 
 @dataclass
 class PackageObfuscator:
     compiler: Compiler
+    stripper: Optional[ExtensionStripper] = None
+    selector: Optional[HotModuleSelector] = None
+    deduplicator: Optional[ModuleDeduplicator] = None
+    wheels: Optional[WheelWriter] = None
+    sync: bool = False
+    report: BuildReport = field(default_factory=BuildReport)
 
     def obfuscate_packages(
         self,
@@ -148,17 +428,125 @@ class PackageObfuscator:
         root_dir: str,
         output_dir: str,
         exclude_packages: Optional[List[str]] = None,
+        index: Optional[FileIndex] = None,
     ) -> None:
+        # compilers chdir into the source dir while the stub worker is reading it
+        root_dir = os.path.abspath(root_dir)
+        packages = list(packages)
+        if index is None:
+            index = FileIndex.scan(root_dir)
+
+        if exclude_packages:
+            excluded = index.prune(exclude_packages)
+            excluded_modules = [i for i in excluded if i.endswith(".py")]
+            if excluded_modules:
+                logger.info("Excluded %d modules matching %s", len(excluded_modules), ", ".join(exclude_packages))
+
+            self.report.incr("exclude.modules", len(excluded_modules))
+            self.report.add_file_sizes("exclude.skipped", excluded)
+
         package_set = set()
         for package in packages:
             package_set.add(package)
             package_set.add(package.replace("-", "_"))
             package_set.add(package.replace("_", "-"))
 
-        with TemporaryDirectory() as td:
-            self.compiler.compile_packages(root_dir, td, package_set)
-            generator = PackageStubGenerator(output_dir=td)
-            generator.generate(source_dir=root_dir, packages=packages)
+        with staging_dir(output_dir) as td, stub_executor() as executor:
+            # stubs only need the sources, so they are generated while the compilers are busy
+            stubs = executor.submit(generate_stubs, root_dir, td, packages, index)
+
+            self._compile(root_dir, td, package_set, index)
+            if self.stripper:
+                self.stripper.strip_packages(td, package_set)
+
+            self.report.merge(stubs.result())
+            if not self.wheels:
+                self._publish(td, output_dir)
+                return
+
+            # packed straight from the staged tree, the loose files never reach output_dir
+            with staging_dir(output_dir) as wheel_dir:
+                self.wheels.write_tree(td, wheel_dir)
+                self._publish(wheel_dir, output_dir)
+
+    def _compile(self, root_dir: str, output_dir: str, packages: Set[str], index: FileIndex) -> None:
+        """Compile the packages, skipping modules the deduplicator reuses and cold ones the selector falls back for."""
+        hot_modules: Optional[Set[str]] = None
+        cold_modules: List[str] = []
+        if self.selector:
+            hot_modules, cold_modules = self.selector.select(root_dir, packages, index)
+
+        reusable: Dict[str, ModuleKey] = {}
+        if self.deduplicator:
+            reusable, modules = self.deduplicator.plan(
+                root_dir, packages, index, portable=self._portable(set(cold_modules))
+            )
+            hot_modules = modules if hot_modules is None else hot_modules & modules
+            cold_modules = [m for m in cold_modules if m in modules]
+
+        self.compiler.compile_packages(root_dir, output_dir, packages, modules=hot_modules, index=index)
+        if self.selector:
+            self.selector.emit_fallback(root_dir, output_dir, cold_modules)
+
+        if self.deduplicator:
+            self.deduplicator.apply(root_dir, output_dir, packages, reusable, index)
+
+    def _portable(self, cold_modules: Set[str]) -> Callable[[str], bool]:
+        """Whether a module is compiled to bytecode, which any module with the same source can reuse."""
+        if isinstance(self.compiler, Bytecode):
+            return lambda name: True
+
+        if self.selector and self.selector.fallback == "bytecode":
+            return lambda name: name in cold_modules
+
+        return lambda name: False
+
+    def _publish(self, source_dir: str, output_dir: str) -> None:
+        if self.sync:
+            sync_tree(source_dir, output_dir, self.report)
+        else:
+            merge_tree(source_dir, output_dir)
+
+
+_worker_deduplicator: Optional[ModuleDeduplicator] = None
+
+
+def init_project_worker(dedupe: bool, link_mode: str = "copy", store_dir: Optional[str] = None) -> None:
+    """Process pool initializer, each worker keeps its own dedupe store for the sub-dirs it handles.
+
+    Artifacts are only reused within a worker. Workers exit without running finalizers, so the store
+    is created under store_dir, which the caller removes.
+    """
+    global _worker_deduplicator
+    if not dedupe:
+        _worker_deduplicator = None
+        return
+
+    if store_dir is not None:
+        os.makedirs(store_dir, exist_ok=True)
+
+    store = TemporaryDirectory(prefix="dedupe-", dir=store_dir)
+    _worker_deduplicator = ModuleDeduplicator(store=store, link_mode=link_mode)
+
+
+def obfuscate_project_dir(
+    obfuscator: PackageObfuscator,
+    root_dir: str,
+    output_dir: str,
+    exclude_packages: Optional[List[str]] = None,
+) -> BuildReport:
+    """Obfuscate every package of a project dir, runs in a worker process and returns its report."""
+    if _worker_deduplicator:
+        _worker_deduplicator.report = obfuscator.report
+        obfuscator.deduplicator = _worker_deduplicator
+
+    index = FileIndex.scan(root_dir)
+    obfuscator.obfuscate_packages(
+        packages=index.packages(),
+        root_dir=root_dir,
+        output_dir=output_dir,
+        exclude_packages=exclude_packages,
+        index=index,
+    )
 
-            for output in os.listdir(td):
-                shutil.move(os.path.join(td, output), os.path.join(output_dir, output))
+    return obfuscator.report
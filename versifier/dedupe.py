@@ -0,0 +1,149 @@
+import hashlib
+import logging
+import os
+import shutil
+from dataclasses import dataclass, field
+from importlib.machinery import EXTENSION_SUFFIXES
+from tempfile import TemporaryDirectory
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from .compiler import find_modules, is_single_extension, module_name
+from .fileindex import FileIndex
+from .publish import link_file
+from .report import BuildReport
+
+logger = logging.getLogger(__name__)
+
+ModuleKey = Tuple[str, str]
+
+
+def file_digest(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def list_modules(source_dir: str, packages: Iterable[str], index: Optional[FileIndex] = None) -> Dict[str, str]:
+    isdir = index.isdir if index else os.path.isdir
+    isfile = index.isfile if index else os.path.isfile
+    modules = {}
+    for package in packages:
+        package_path = os.path.join(source_dir, package)
+        if isdir(package_path):
+            for path in find_modules(source_dir, package_path, index=index):
+                modules[module_name(source_dir, path)] = path
+        elif isfile(f"{package_path}.py"):
+            modules[package] = f"{package_path}.py"
+
+    return modules
+
+
+def find_artifacts(output_dir: str, name: str, is_package: bool) -> List[str]:
+    base = os.path.join(output_dir, *name.split("."))
+    if is_package:
+        base = os.path.join(base, "__init__")
+
+    candidates = [f"{base}{suffix}" for suffix in EXTENSION_SUFFIXES]
+    candidates.append(f"{base}.pyc")
+    return [i for i in candidates if os.path.isfile(i)]
+
+
+@dataclass
+class ModuleDeduplicator:
+    report: BuildReport = field(default_factory=BuildReport)
+    store: TemporaryDirectory = field(default_factory=TemporaryDirectory)
+    artifacts: Dict[ModuleKey, List[str]] = field(default_factory=dict)
+    names_by_digest: Dict[str, Set[str]] = field(default_factory=dict)
+    # bytecode does not embed the module name, so it is shared by every module with the same source
+    bytecode: Dict[str, str] = field(default_factory=dict)
+    link_mode: str = "copy"
+
+    def plan(
+        self,
+        source_dir: str,
+        packages: Iterable[str],
+        index: Optional[FileIndex] = None,
+        portable: Callable[[str], bool] = lambda name: False,
+    ) -> Tuple[Dict[str, ModuleKey], Set[str]]:
+        """Split modules into the ones with a compiled artifact to reuse and the ones to compile.
+
+        Modules for which portable holds are compiled to bytecode, only the first of those with the same source is.
+        """
+        reusable = {}
+        to_compile = set()
+        planned: Set[str] = set()
+        for name, path in sorted(list_modules(source_dir, packages, index).items()):
+            key = (name, file_digest(path))
+            if key in self.artifacts:
+                reusable[name] = key
+                continue
+
+            if portable(name):
+                if key[1] in self.bytecode or key[1] in planned:
+                    reusable[name] = key
+                    continue
+                planned.add(key[1])
+
+            to_compile.add(name)
+            other_names = self.names_by_digest.get(key[1], set()) - {name}
+            if other_names:
+                # extensions embed their qualified name, a renamed copy can not be reused
+                logger.info(
+                    "Module %s is identical to %s but needs its own build", name, ", ".join(sorted(other_names))
+                )
+                self.report.incr("dedupe.renamed_modules")
+
+        return reusable, to_compile
+
+    def apply(
+        self,
+        source_dir: str,
+        output_dir: str,
+        packages: Iterable[str],
+        reusable: Dict[str, ModuleKey],
+        index: Optional[FileIndex] = None,
+    ) -> None:
+        """Remember the newly compiled artifacts and place reused ones into output_dir."""
+        modules = list_modules(source_dir, packages, index)
+        for name, path in modules.items():
+            self._remember(output_dir, name, path)
+
+        for name, key in reusable.items():
+            if is_single_extension(output_dir, name.split(".", 1)[0]):
+                continue
+
+            for stored_path, target_path in self._reused_paths(output_dir, name, modules[name], key):
+                os.makedirs(os.path.dirname(target_path), exist_ok=True)
+                link_file(stored_path, target_path, self.link_mode)
+                self.report.add_size("dedupe.reused", os.path.getsize(stored_path))
+
+            self.report.incr("dedupe.reused_modules")
+
+    def _remember(self, output_dir: str, name: str, path: str) -> None:
+        key = (name, file_digest(path))
+        self.names_by_digest.setdefault(key[1], set()).add(name)
+        if key in self.artifacts:
+            return
+
+        store_dir = os.path.join(self.store.name, key[1])
+        stored = []
+        for artifact in find_artifacts(output_dir, name, os.path.basename(path) == "__init__.py"):
+            stored_path = os.path.join(store_dir, os.path.relpath(artifact, output_dir))
+            os.makedirs(os.path.dirname(stored_path), exist_ok=True)
+            shutil.copy2(artifact, stored_path)
+            stored.append(stored_path)
+
+        if stored:
+            self.artifacts[key] = stored
+            if len(stored) == 1 and stored[0].endswith(".pyc"):
+                self.bytecode.setdefault(key[1], stored[0])
+
+    def _reused_paths(self, output_dir: str, name: str, path: str, key: ModuleKey) -> List[Tuple[str, str]]:
+        """Stored artifacts of a reused module, each with the path it takes in output_dir."""
+        if key in self.artifacts:
+            store_dir = os.path.join(self.store.name, key[1])
+            return [(p, os.path.join(output_dir, os.path.relpath(p, store_dir))) for p in self.artifacts[key]]
+
+        target_path = os.path.join(output_dir, *name.split("."))
+        if os.path.basename(path) == "__init__.py":
+            target_path = os.path.join(target_path, "__init__")
+        return [(self.bytecode[key[1]], f"{target_path}.pyc")]
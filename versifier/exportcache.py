@@ -0,0 +1,92 @@
+import hashlib
+import json
+import logging
+import os
+import zlib
+from dataclasses import dataclass, field
+from functools import lru_cache
+from importlib.metadata import PackageNotFoundError, version
+from tempfile import mkstemp
+from typing import Any, Iterable, Optional
+
+from .report import BuildReport
+
+logger = logging.getLogger(__name__)
+
+# bumped whenever what is stored changes
+CACHE_VERSION = 2
+# the modules producing what is stored, stand in for the version of a source checkout
+READER_MODULES = ("lockfile.py", "poetrylock.py", "uvlock.py", "poetry.py", "uv.py")
+
+
+@lru_cache(maxsize=None)
+def versifier_version() -> str:
+    try:
+        return version("versifier")
+    except PackageNotFoundError:
+        sha256 = hashlib.sha256()
+        for name in READER_MODULES:
+            with open(os.path.join(os.path.dirname(__file__), name), "rb") as f:
+                sha256.update(f.read())
+        return sha256.hexdigest()
+
+
+@dataclass
+class ExportCache:
+    """Exported requirements stored by the hashes of the project files and the export flags."""
+
+    root: str
+    report: BuildReport = field(default_factory=BuildReport)
+
+    def key(self, manager: str, files: Iterable[str], **flags: Any) -> str:
+        sha256 = hashlib.sha256()
+        header = {
+            "version": CACHE_VERSION,
+            "versifier": versifier_version(),
+            "parser": version("pip-requirements-parser"),
+            "manager": manager,
+        }
+        sha256.update(json.dumps([header, flags], sort_keys=True).encode())
+        for path in files:
+            # path dependencies are exported as absolute file urls
+            sha256.update(os.path.abspath(path).encode() + b"\0")
+            try:
+                with open(path, "rb") as f:
+                    sha256.update(hashlib.sha256(f.read()).digest())
+            except FileNotFoundError:
+                sha256.update(b"missing")
+
+        return sha256.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.txt.z")
+
+    def load(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            # plain requirements text, a cache restored from elsewhere can not run code in the build
+            with open(path, "rb") as f:
+                value = zlib.decompress(f.read()).decode()
+        except FileNotFoundError:
+            self.report.incr("export.cache_misses")
+            return None
+        except (OSError, zlib.error, UnicodeDecodeError) as e:
+            logger.warning("Ignoring the unreadable export cache entry %s: %s", path, e)
+            self.report.incr("export.cache_misses")
+            return None
+
+        self.report.incr("export.cache_hits")
+        return value
+
+    def store(self, key: str, value: str) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # index urls of the project may embed credentials, mkstemp creates the entry readable by the owner only
+        fd, tmp_path = mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(zlib.compress(value.encode()))
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
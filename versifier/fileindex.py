@@ -0,0 +1,130 @@
+import fnmatch
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Generator, Iterable, List, Tuple
+
+DEFAULT_IGNORE_PATTERNS = (
+    "__pycache__",
+    ".git",
+    ".hg",
+    ".svn",
+    ".tox",
+    ".nox",
+    ".venv",
+    ".mypy_cache",
+    ".pytest_cache",
+    "node_modules",
+)
+
+WalkResult = Tuple[str, List[str], List[str]]
+
+
+def compile_patterns(patterns: Iterable[str]) -> Callable[[str], bool]:
+    """Combine fnmatch patterns into a single regex, matched once per name."""
+    pattern_list = [os.path.normcase(p) for p in patterns]
+    if not pattern_list:
+        return lambda name: False
+
+    regex = re.compile("|".join(fnmatch.translate(p) for p in pattern_list))
+    return lambda name: regex.match(os.path.normcase(name)) is not None
+
+
+@dataclass
+class FileIndex:
+    """Directory listing of a tree, scanned once and shared by every build stage."""
+
+    root: str
+    ignore_patterns: Iterable[str] = DEFAULT_IGNORE_PATTERNS
+    entries: Dict[str, Tuple[List[str], List[str]]] = field(default_factory=dict)
+
+    @classmethod
+    def scan(cls, root: str, ignore_patterns: Iterable[str] = DEFAULT_IGNORE_PATTERNS) -> "FileIndex":
+        index = cls(root=root, ignore_patterns=tuple(ignore_patterns))
+        index.refresh()
+        return index
+
+    def refresh(self) -> None:
+        is_ignored = compile_patterns(self.ignore_patterns)
+        self.entries = {}
+        pending = [os.path.abspath(self.root)]
+        while pending:
+            path = pending.pop()
+            dirs = []
+            files = []
+            try:
+                with os.scandir(path) as it:
+                    for entry in it:
+                        if is_ignored(entry.name):
+                            continue
+
+                        if entry.is_dir(follow_symlinks=False):
+                            dirs.append(entry.name)
+                            pending.append(entry.path)
+                        else:
+                            files.append(entry.name)
+            except OSError:
+                continue
+
+            self.entries[path] = (sorted(dirs), sorted(files))
+
+    def isdir(self, path: str) -> bool:
+        return os.path.abspath(path) in self.entries
+
+    def isfile(self, path: str) -> bool:
+        parent, name = os.path.split(os.path.abspath(path))
+        entry = self.entries.get(parent)
+        return entry is not None and name in entry[1]
+
+    def listdir(self, path: str) -> List[str]:
+        dirs, files = self.entries.get(os.path.abspath(path), ([], []))
+        return [*dirs, *files]
+
+    def walk(self, top: str) -> Generator[WalkResult, None, None]:
+        """Same as a top-down os.walk, the yielded dirs can be edited in place to prune."""
+        entry = self.entries.get(os.path.abspath(top))
+        if entry is None:
+            return
+
+        dirs, files = list(entry[0]), list(entry[1])
+        yield top, dirs, files
+        for name in dirs:
+            yield from self.walk(os.path.join(top, name))
+
+    def _drop(self, path: str) -> List[str]:
+        dropped: List[str] = []
+        for key in [k for k in self.entries if k == path or k.startswith(f"{path}{os.sep}")]:
+            dropped.extend(os.path.join(key, f) for f in self.entries.pop(key)[1])
+
+        return dropped
+
+    def prune(self, patterns: Iterable[str]) -> List[str]:
+        """Drop packages and modules whose dotted name matches a pattern, return the dropped files."""
+        pattern_list = list(patterns)
+        if not pattern_list:
+            return []
+
+        matches = compile_patterns(pattern_list)
+        root = os.path.abspath(self.root)
+        dropped = []
+        for path in sorted(self.entries):
+            if path not in self.entries:
+                continue
+
+            dirs, files = self.entries[path]
+            prefix = os.path.relpath(path, root).replace(os.sep, ".")
+            prefix = "" if prefix == "." else f"{prefix}."
+            for d in [d for d in dirs if matches(f"{prefix}{d}")]:
+                dirs.remove(d)
+                dropped.extend(self._drop(os.path.join(path, d)))
+
+            for f in [f for f in files if f.endswith(".py") and matches(f"{prefix}{f[:-3]}")]:
+                files.remove(f)
+                dropped.append(os.path.join(path, f))
+
+        return dropped
+
+    def packages(self) -> List[str]:
+        """Top level packages, directories with an __init__.py."""
+        dirs, _ = self.entries.get(os.path.abspath(self.root), ([], []))
+        return [d for d in dirs if self.isfile(os.path.join(self.root, d, "__init__.py"))]
@@ -0,0 +1,99 @@
+import logging
+import os
+import pstats
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .compiler import Bytecode, is_single_extension, module_name, module_path
+from .dedupe import list_modules
+from .fileindex import FileIndex
+from .publish import link_file
+from .report import BuildReport
+
+logger = logging.getLogger(__name__)
+
+
+def resolve_module(
+    source_dir: str, packages: Set[str], filename: str, index: Optional[FileIndex] = None
+) -> Optional[str]:
+    isfile = index.isfile if index else os.path.isfile
+    parts = os.path.normpath(filename).split(os.sep)
+    for start in range(len(parts) - 1, -1, -1):
+        if parts[start] not in packages and os.path.splitext(parts[start])[0] not in packages:
+            continue
+
+        path = os.path.join(source_dir, *parts[start:])
+        if isfile(path) and path.endswith(".py"):
+            return module_name(source_dir, path)
+
+    return None
+
+
+@dataclass
+class HotModuleSelector:
+    stats_path: str
+    threshold: float = 0.1
+    fallback: str = "bytecode"
+    link_mode: str = "copy"
+    report: BuildReport = field(default_factory=BuildReport)
+
+    def module_times(
+        self, source_dir: str, packages: Iterable[str], index: Optional[FileIndex] = None
+    ) -> Dict[str, float]:
+        package_set = set(packages)
+        stats = pstats.Stats(self.stats_path).stats  # type: ignore[attr-defined]
+
+        resolved: Dict[str, Optional[str]] = {}
+
+        def resolve(filename: str) -> Optional[str]:
+            if filename not in resolved:
+                resolved[filename] = resolve_module(source_dir, package_set, filename, index)
+            return resolved[filename]
+
+        times: Dict[str, float] = {}
+        for (filename, _, _), (_, _, _, cumulative, callers) in stats.items():
+            module = resolve(filename)
+            if module is None:
+                continue
+
+            # calls coming from the same module are already counted by their caller
+            for (caller_filename, _, _), caller_stats in callers.items():
+                if resolve(caller_filename) == module:
+                    cumulative -= caller_stats[3]
+
+            times[module] = times.get(module, 0.0) + max(cumulative, 0.0)
+
+        return times
+
+    def select(
+        self, source_dir: str, packages: Iterable[str], index: Optional[FileIndex] = None
+    ) -> Tuple[Set[str], List[str]]:
+        package_list = list(packages)
+        times = self.module_times(source_dir, package_list, index)
+
+        hot_modules = set()
+        cold_modules = []
+        # the walk of the compilers, every module they would build is either hot or cold
+        for module in sorted(list_modules(source_dir, package_list, index)):
+            if times.get(module, 0.0) >= self.threshold:
+                hot_modules.add(module)
+            else:
+                cold_modules.append(module)
+
+        self.report.incr("profile.hot_modules", len(hot_modules))
+        self.report.incr("profile.cold_modules", len(cold_modules))
+        return hot_modules, cold_modules
+
+    def emit_fallback(self, source_dir: str, output_dir: str, modules: Iterable[str]) -> None:
+        modules = [m for m in modules if not is_single_extension(output_dir, m.split(".", 1)[0])]
+
+        if self.fallback == "bytecode":
+            Bytecode(report=self.report).compile_modules(source_dir, output_dir, modules)
+            return
+
+        for name in modules:
+            source_path = module_path(source_dir, name)
+            target_path = os.path.join(output_dir, os.path.relpath(source_path, source_dir))
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            link_file(source_path, target_path, self.link_mode)
+            self.report.incr("source.modules")
@@ -0,0 +1,139 @@
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from packaging.utils import canonicalize_name
+
+logger = logging.getLogger(__name__)
+
+
+class UnsupportedLockError(Exception):
+    """The lock file needs the package manager's own export, which versifier falls back to."""
+
+    message = "Unsupported lock file"
+
+    def __init__(self, *args: object) -> None:
+        super().__init__(self.message.format(*args))
+
+
+class UnreadableLockError(UnsupportedLockError):
+    message = "Can not read the lock file: {!r}"
+
+
+class LockVersionError(UnsupportedLockError):
+    message = "Unsupported lock version {!r}"
+
+
+class DuplicatePackageError(UnsupportedLockError):
+    message = "{} is locked more than once"
+
+
+class MissingPackageError(UnsupportedLockError):
+    message = "{} is not in the lock file"
+
+
+class UndeclaredExtraError(UnsupportedLockError):
+    message = "Extra {} is not declared"
+
+
+class UnsupportedMarkerError(UnsupportedLockError):
+    message = "Unsupported marker of {}: {}"
+
+
+class UnsupportedSourceError(UnsupportedLockError):
+    message = "Unsupported source {1} of {0}"
+
+
+# the markers of every edge on one path from the project to a package, all of them have to hold
+Conjunction = FrozenSet[str]
+
+
+@dataclass
+class Edge:
+    """A dependency of the project or of a locked package."""
+
+    name: str
+    marker: Optional[str] = None
+    extras: FrozenSet[str] = frozenset()
+
+
+@dataclass
+class LockedPackage:
+    name: str
+    requirement: str
+    dependencies: List[Edge] = field(default_factory=list)
+    extras: Dict[str, List[Edge]] = field(default_factory=dict)
+    hashes: List[str] = field(default_factory=list)
+
+
+def resolve(
+    packages: Dict[str, LockedPackage], roots: Iterable[Edge], root_markers: Iterable[str] = ()
+) -> Dict[str, Set[Conjunction]]:
+    """Walk the lock from the project dependencies, return the marker paths reaching every package.
+
+    root_markers, such as the python constraint of the project, hold on every path.
+    """
+    markers: Dict[str, Set[Conjunction]] = {}
+    seen: Set[Tuple[str, Conjunction, FrozenSet[str]]] = set()
+    shared = frozenset(root_markers)
+    pending = [(edge, shared | {edge.marker} if edge.marker else shared) for edge in roots]
+    while pending:
+        edge, conjunction = pending.pop()
+        name = canonicalize_name(edge.name)
+        # a path through a cycle adds no new marker, so the walk ends
+        key = (name, conjunction, edge.extras)
+        if key in seen:
+            continue
+        seen.add(key)
+
+        package = packages.get(name)
+        if package is None:
+            raise MissingPackageError(edge.name)
+
+        markers.setdefault(name, set()).add(conjunction)
+        children = list(package.dependencies)
+        for extra in sorted(edge.extras):
+            children.extend(package.extras.get(canonicalize_name(extra), []))
+
+        for child in children:
+            pending.append((child, (conjunction | {child.marker}) if child.marker else conjunction))
+
+    return markers
+
+
+def format_marker(conjunctions: Set[Conjunction]) -> Optional[str]:
+    """The marker of a package reached through several paths, None when one of them is unconditional."""
+    # (a) or (a and b) is just (a)
+    kept = [c for c in conjunctions if not any(o < c for o in conjunctions)]
+    if not kept or frozenset() in kept:
+        return None
+
+    def atom(marker: str) -> str:
+        return f"({marker})" if " or " in marker else marker
+
+    clauses = sorted(" and ".join(atom(m) for m in sorted(c)) for c in kept)
+    if len(clauses) == 1:
+        return clauses[0]
+
+    return " or ".join(f"({c})" if " and " in c else c for c in clauses)
+
+
+def format_requirements(
+    packages: Dict[str, LockedPackage], markers: Dict[str, Set[Conjunction]], options: Iterable[str] = ()
+) -> str:
+    """Requirements text in the layout of poetry export, the option lines first, then one line per package."""
+    lines = list(options)
+    for name in sorted(markers):
+        package = packages[name]
+        line = package.requirement
+        marker = format_marker(markers[name])
+        if marker:
+            line = f"{line} ; {marker}"
+
+        if package.hashes:
+            hashes = [f"    --hash={h}" for h in package.hashes]
+            line = " \\\n".join([line, *hashes])
+
+        lines.append(line)
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,124 @@
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from importlib.metadata import distributions
+from typing import Any, Dict, Iterable, List, Optional
+
+from packaging.utils import canonicalize_name
+
+from .wheel import pinned_version
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = ".versifier-manifest.json"
+
+
+@dataclass
+class ManifestEntry:
+    version: str
+    hashes: List[str] = field(default_factory=list)
+    files: List[str] = field(default_factory=list)
+
+
+def requirement_key(requirement: Any) -> Optional[ManifestEntry]:
+    """What identifies the installed artifact of a requirement, None when it is not pinned."""
+    version = pinned_version(requirement)
+    if version is None:
+        return None
+
+    return ManifestEntry(version=version, hashes=sorted(requirement.hash_options or []))
+
+
+def installed_files(site_dir: str) -> Dict[str, List[str]]:
+    """Files of every distribution installed in site_dir according to its RECORD, relative to site_dir."""
+    files: Dict[str, List[str]] = {}
+    for dist in distributions(path=[site_dir]):
+        name = dist.metadata["Name"]
+        if not name:
+            continue
+
+        paths = files.setdefault(canonicalize_name(name), [])
+        for file in dist.files or []:
+            path = os.path.normpath(str(file))
+            if not (os.path.isabs(path) or path == ".." or path.startswith(f"..{os.sep}")):
+                paths.append(path)
+
+    return files
+
+
+@dataclass
+class ExtractManifest:
+    """Pinned version, hashes and files of every package extracted into an output dir."""
+
+    output_dir: str
+    packages: Dict[str, ManifestEntry] = field(default_factory=dict)
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.output_dir, MANIFEST_NAME)
+
+    @classmethod
+    def load(cls, output_dir: str) -> "ExtractManifest":
+        manifest = cls(output_dir=output_dir)
+        try:
+            with open(manifest.path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return manifest
+        except ValueError:
+            logger.warning("Ignoring the unreadable manifest %s", manifest.path)
+            return manifest
+
+        for name, entry in data.get("packages", {}).items():
+            manifest.packages[name] = ManifestEntry(**entry)
+
+        return manifest
+
+    def dump(self) -> None:
+        data = {"packages": {name: vars(entry) for name, entry in sorted(self.packages.items())}}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def is_current(self, requirement: Any) -> bool:
+        """Whether the extracted files of a requirement match its locked version and are all still there."""
+        key = requirement_key(requirement)
+        entry = self.packages.get(canonicalize_name(requirement.name))
+        if key is None or entry is None:
+            return False
+
+        if (entry.version, entry.hashes) != (key.version, key.hashes):
+            return False
+
+        return all(os.path.lexists(os.path.join(self.output_dir, f)) for f in entry.files)
+
+    def remove(self, name: str) -> None:
+        """Delete the extracted files of a package, and the directories left empty."""
+        entry = self.packages.pop(canonicalize_name(name), None)
+        if entry is None:
+            return
+
+        dirs = set()
+        for path in entry.files:
+            full_path = os.path.join(self.output_dir, path)
+            if os.path.lexists(full_path) and not os.path.isdir(full_path):
+                os.remove(full_path)
+
+            parent = os.path.dirname(path)
+            while parent:
+                dirs.add(parent)
+                parent = os.path.dirname(parent)
+
+        # deepest first, so a parent is tried once its children are gone
+        for path in sorted(dirs, key=lambda p: p.count(os.sep), reverse=True):
+            try:
+                os.rmdir(os.path.join(self.output_dir, path))
+            except OSError:
+                continue
+
+    def add(self, requirement: Any, files: Iterable[str]) -> None:
+        key = requirement_key(requirement) or ManifestEntry(version="")
+        key.files = sorted(files)
+        self.packages[canonicalize_name(requirement.name)] = key
@@ -1,16 +1,105 @@
+import json
 import logging
 import os
-import shutil
 from dataclasses import dataclass
-from subprocess import check_call
-from tempfile import TemporaryDirectory
-from typing import Iterable, List, Optional
+from subprocess import PIPE, CalledProcessError, Popen, check_call, check_output
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, cast
 
 import toml
+from pip_requirements_parser import (
+    CommentLine,
+    CommentRequirementLine,
+    InstallRequirement,
+    InvalidRequirementLine,
+    OptionLine,
+    ParsedLine,
+    ParsedRequirement,
+    RequirementLine,
+    build_req_from_parsedreq,
+    get_line_parser,
+    handle_line,
+    join_lines,
+    split_comments,
+)
 from pip_requirements_parser import RequirementsFile as BaseRequirementsFile
 
+from .exportcache import ExportCache
+from .lockfile import UnsupportedLockError
+from .poetrylock import add_credentials, export_poetry_lock
+
 logger = logging.getLogger(__name__)
 
+SITE_PACKAGES_SCRIPT = (
+    "import json, sysconfig; "
+    "print(json.dumps(list(dict.fromkeys(sysconfig.get_path(n) for n in ('purelib', 'platlib')))))"
+)
+
+INDEX_URL_OPTION = "--index-url "
+
+
+def demote_index_url(line: str) -> str:
+    """An --index-url line as an --extra-index-url one, so pip keeps PyPI."""
+    if not line.startswith(INDEX_URL_OPTION):
+        return line
+
+    return f"--extra-index-url {line[len(INDEX_URL_OPTION) :]}"
+
+
+def stream_output(commands: List[str]) -> Iterator[str]:
+    """The stdout lines of a command as they are written, CalledProcessError when it fails."""
+    process = Popen(commands, stdout=PIPE, text=True)
+    stdout = cast(IO[str], process.stdout)
+    try:
+        for line in stdout:
+            yield line.rstrip("\n")
+    except BaseException:
+        # the reader gave up, a command blocked on a full pipe would never exit
+        process.kill()
+        raise
+    finally:
+        stdout.close()
+        returncode = process.wait()
+
+    if returncode:
+        raise CalledProcessError(returncode, commands)
+
+
+def parse_lines(lines: Iterable[str], filename: str) -> Iterator[Any]:
+    """Parse requirements lines one at a time, yielding what RequirementsFile.parse yields for a file."""
+    line_parser = get_line_parser()
+    for numbered_line in split_comments(join_lines(enumerate(lines, start=1))):
+        line_number, line = numbered_line
+        if isinstance(numbered_line, CommentLine):
+            yield CommentRequirementLine(line=line, line_number=line_number, filename=filename)
+            continue
+
+        requirement_line = RequirementLine(line=line, line_number=line_number, filename=filename)
+        try:
+            requirement_string, options, arguments = line_parser(line)
+        except Exception as e:
+            yield InvalidRequirementLine(requirement_line=requirement_line, error_message=str(e))
+            continue
+
+        parsed_line = ParsedLine(
+            requirement_line, requirement_string, options, is_constraint=False, arguments=arguments
+        )
+        for parsed in handle_line(parsed_line):
+            if not isinstance(parsed, ParsedRequirement):
+                yield parsed
+                continue
+
+            try:
+                req = build_req_from_parsedreq(parsed)
+            except Exception as e:
+                yield InvalidRequirementLine(requirement_line=requirement_line, error_message=str(e).strip())
+                continue
+
+            if req.invalid_options:
+                message = f"Invalid global options, not supported with a requirement spec: {req.invalid_options}"
+                yield InvalidRequirementLine(requirement_line=requirement_line, error_message=message)
+            else:
+                yield req
+
 
 class RequirementsFile(BaseRequirementsFile):
     def filter(
@@ -19,10 +108,20 @@ class RequirementsFile(BaseRequirementsFile):
         exclude: Iterable[str] = (),
         markers: Iterable[str] = (),
     ) -> "RequirementsFile":
+        return self.filter_matrix([markers], include=include, exclude=exclude)[0]
+
+    def filter_matrix(
+        self,
+        environments: Iterable[Iterable[str]],
+        include: Iterable[str] = (),
+        exclude: Iterable[str] = (),
+    ) -> List["RequirementsFile"]:
+        """One filtered copy per marker environment, every distinct marker is evaluated once per environment."""
         includes = set(include)
         excludes = set(exclude)
-        marker_dict = dict(m.split("==", 1) for m in markers)
-        requirements = []
+        marker_dicts = [dict(m.split("==", 1) for m in markers) for markers in environments]
+        matches: Dict[str, List[bool]] = {}
+        requirements: List[List[Any]] = [[] for _ in marker_dicts]
         for r in self.requirements:
             if includes and r.name not in includes:
                 continue
@@ -30,18 +129,28 @@ class RequirementsFile(BaseRequirementsFile):
             if excludes and r.name in excludes:
                 continue
 
-            if marker_dict and not r.marker.evaluate(marker_dict):
-                continue
-
-            requirements.append(r)
-
-        return RequirementsFile(
-            filename=self.filename,
-            requirements=requirements,
-            options=self.options,
-            invalid_lines=self.invalid_lines,
-            comments=self.comments,
-        )
+            if r.marker is None:
+                matched = [True] * len(marker_dicts)
+            else:
+                key = str(r.marker)
+                if key not in matches:
+                    matches[key] = [not m or r.marker.evaluate(m) for m in marker_dicts]
+                matched = matches[key]
+
+            for selected, match in zip(requirements, matched, strict=True):
+                if match:
+                    selected.append(r)
+
+        return [
+            RequirementsFile(
+                filename=self.filename,
+                requirements=selected,
+                options=self.options,
+                invalid_lines=self.invalid_lines,
+                comments=self.comments,
+            )
+            for selected in requirements
+        ]
 
     def dump_to(self, filename: str) -> None:
         with open(filename, "w") as f:
@@ -58,10 +167,33 @@ class RequirementsFile(BaseRequirementsFile):
             comments=rf.comments,
         )
 
+    @classmethod
+    def from_lines(cls, lines: Iterable[str], filename: str = "-") -> "RequirementsFile":
+        """Parse requirements while lines are still being produced, such as the output of an export."""
+        rf = cls(filename=filename, requirements=[], options=[], invalid_lines=[], comments=[])
+        for parsed in parse_lines(lines, filename):
+            if isinstance(parsed, InvalidRequirementLine):
+                rf.invalid_lines.append(parsed)
+            elif isinstance(parsed, CommentRequirementLine):
+                rf.comments.append(parsed)
+            elif isinstance(parsed, OptionLine):
+                rf.options.append(parsed)
+            elif isinstance(parsed, InstallRequirement):
+                rf.requirements.append(parsed)
+
+        return rf
+
+    @classmethod
+    def from_string(cls, text: str) -> "RequirementsFile":
+        # the from_string of pip_requirements_parser is broken
+        return cls.from_lines(text.splitlines())
+
 
 @dataclass
 class Poetry:
     poetry_path: str = "poetry"
+    native_export: bool = True
+    cache: Optional[ExportCache] = None
 
     def add_packages(self, packages: Iterable[str], is_dev: bool = False, lock_only: bool = True) -> None:
         commands = [self.poetry_path, "add", "--no-interaction"]
@@ -75,20 +207,12 @@ class Poetry:
         commands.extend(packages)
         check_call(commands)
 
-    def _disable_default_source(self, path: str) -> None:
-        with open(path, "r") as f:
+    def _has_default_source(self, path: str) -> bool:
+        with open(path) as f:
             config = toml.load(f)
 
-        try:
-            sources = config["tool"]["poetry"]["source"]
-        except KeyError:
-            return
-
-        for source in sources:
-            source["default"] = False
-
-        with open(path, "w") as f:
-            toml.dump(config, f)
+        sources = config.get("tool", {}).get("poetry", {}).get("source", [])
+        return any(s.get("default") or s.get("priority") == "default" for s in sources)
 
     def export_requirements(
         self,
@@ -96,35 +220,65 @@ class Poetry:
         extra_requirements: Optional[Iterable[str]] = None,
         with_credentials: bool = False,
     ) -> RequirementsFile:
-        with TemporaryDirectory() as td:
-            requirement_path = os.path.join(td, "requirements.txt")
-            pyproject_path = os.path.join(td, "pyproject.toml")
-            lock_path = os.path.join(td, "poetry.lock")
-
-            shutil.copy("poetry.lock", lock_path)
-            shutil.copy("pyproject.toml", pyproject_path)
-            self._disable_default_source(pyproject_path)
-
-            commands = [
-                self.poetry_path,
-                "export",
-                "--no-interaction",
-                "--format=requirements.txt",
-                f"--output={requirement_path}",
-            ]
-            if include_dev_requirements:
-                commands.append("--dev")
-
-            if extra_requirements:
-                commands.extend(f"--extras={i}" for i in extra_requirements)
-
-            if with_credentials:
-                commands.append("--with-credentials")
-
-            check_call(commands, cwd=td)
-            rf = RequirementsFile.from_file(requirement_path)
+        if self.cache is None:
+            return self._export_requirements(include_dev_requirements, extra_requirements, with_credentials)
+
+        # credentials are never written to the cache, they are added to the cached export on load
+        key = self.cache.key(
+            "poetry",
+            ["poetry.lock", "pyproject.toml"],
+            include_dev_requirements=include_dev_requirements,
+            extra_requirements=sorted(extra_requirements or ()),
+            native_export=self.native_export,
+        )
+        text = self.cache.load(key)
+        if text is None:
+            text = self._export_requirements(include_dev_requirements, extra_requirements, False).dumps()
+            self.cache.store(key, text)
 
-        return rf
+        if with_credentials:
+            try:
+                text = add_credentials(text)
+            except UnsupportedLockError as e:
+                logger.info("Exporting without the cache: %s", e)
+                return self._export_requirements(include_dev_requirements, extra_requirements, with_credentials)
+
+        return RequirementsFile.from_string(text)
+
+    def _export_requirements(
+        self,
+        include_dev_requirements: bool,
+        extra_requirements: Optional[Iterable[str]],
+        with_credentials: bool,
+    ) -> RequirementsFile:
+        if self.native_export:
+            try:
+                return RequirementsFile.from_string(
+                    export_poetry_lock(
+                        include_dev_requirements=include_dev_requirements,
+                        extra_requirements=extra_requirements,
+                        with_credentials=with_credentials,
+                    )
+                )
+            except UnsupportedLockError as e:
+                logger.info("Falling back to poetry export: %s", e)
+
+        commands = [self.poetry_path, "export", "--no-interaction", "--format=requirements.txt"]
+        if include_dev_requirements:
+            commands.append("--dev")
+
+        if extra_requirements:
+            commands.extend(f"--extras={i}" for i in extra_requirements)
+
+        if with_credentials:
+            commands.append("--with-credentials")
+
+        lines = stream_output(commands)
+        if self._has_default_source("pyproject.toml"):
+            # poetry exports a default source as the index replacing PyPI, instead of rewriting pyproject.toml
+            lines = map(demote_index_url, lines)
+
+        return RequirementsFile.from_lines(lines)
 
     def install(
         self, include_dev_requirements: bool = False, extra_requirements: Optional[Iterable[str]] = None
@@ -144,6 +298,21 @@ class Poetry:
         commands.extend(args)
         check_call(commands)
 
+    def site_packages(self) -> List[str]:
+        output = check_output([self.poetry_path, "run", "python", "-c", SITE_PACKAGES_SCRIPT])
+        return list(json.loads(output))
+
+    def install_requirements(self, requirements_path: str, target_dir: str) -> None:
+        self.run_command([
+            "pip",
+            "install",
+            "--no-deps",
+            "--requirement",
+            requirements_path,
+            "--target",
+            target_dir,
+        ])
+
     def init_if_needed(self) -> None:
         if os.path.exists("poetry.lock"):
             return
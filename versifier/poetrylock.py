@@ -0,0 +1,310 @@
+import logging
+import os
+import re
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import quote, urlsplit, urlunsplit
+
+import toml
+from packaging.requirements import InvalidRequirement, Requirement
+from packaging.utils import canonicalize_name
+
+from .lockfile import (
+    DuplicatePackageError,
+    Edge,
+    LockedPackage,
+    LockVersionError,
+    UndeclaredExtraError,
+    UnreadableLockError,
+    UnsupportedLockError,
+    UnsupportedMarkerError,
+    UnsupportedSourceError,
+    format_requirements,
+    resolve,
+)
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_LOCK_VERSIONS = ("1.1", "2.0", "2.1")
+EXTRA_MARKER = re.compile(r'\s*extra\s*==\s*"[^"]*"(\s+or\s+extra\s*==\s*"[^"]*")*\s*')
+CONSTRAINT = re.compile(r"(\^|~=|~|==|!=|>=|<=|>|<)?\s*([0-9][0-9.]*(?:\.\*)?)$")
+
+
+class MissingCredentialsError(UnsupportedLockError):
+    # poetry may still find them in its auth config or the keyring
+    message = "Credentials of source {} are not in the environment"
+
+
+class ProjectDependenciesError(UnsupportedLockError):
+    message = "PEP 621 dependencies are not supported"
+
+
+def bump(parts: List[int], index: int) -> str:
+    return ".".join(str(p) for p in [*parts[:index], parts[index] + 1])
+
+
+def python_marker(constraint: str) -> Optional[str]:
+    """A poetry python constraint such as ^3.8 or >=3.7,<3.11 || >=3.12 as an environment marker."""
+    alternatives = []
+    for alternative in constraint.split("||"):
+        atoms: List[str] = []
+        for part in re.split(r"[,\s]+(?=[^,\s])", alternative.strip()):
+            part = part.strip().rstrip(",")
+            if part in ("", "*"):
+                continue
+
+            match = CONSTRAINT.match(part)
+            if not match:
+                raise UnsupportedMarkerError("python", constraint)
+
+            op, version = match.group(1) or "==", match.group(2)
+            parts = [int(p) for p in version.rstrip(".*").split(".")]
+            if op == "^":
+                first = next((i for i, p in enumerate(parts) if p), len(parts) - 1)
+                bounds = [(">=", version), ("<", bump(parts, first))]
+            elif op == "~" or (op == "==" and (version.endswith(".*") or len(parts) < 3)):
+                upper = bump(parts, min(len(parts) - 1, 1) if op == "~" else len(parts) - 1)
+                bounds = [(">=", version.rstrip(".*")), ("<", upper)]
+            elif op == "~=":
+                bounds = [(">=", version), ("<", bump(parts, max(len(parts) - 2, 0)))]
+            else:
+                bounds = [(op, version)]
+
+            atoms.extend(f'python_full_version {o} "{v}"' for o, v in bounds)
+
+        if not atoms:
+            return None
+
+        alternatives.append(" and ".join(atoms))
+
+    if len(alternatives) == 1:
+        return alternatives[0]
+
+    return " or ".join(f"({a})" for a in alternatives)
+
+
+def dependency_edges(name: str, spec: Any) -> List[Tuple[Edge, bool]]:
+    """The edges of a pyproject or lock dependency, each with whether it is optional."""
+    specs = spec if isinstance(spec, list) else [spec]
+    edges = []
+    for item in specs:
+        if not isinstance(item, dict):
+            edges.append((Edge(name=name), False))
+            continue
+
+        atoms = []
+        markers = item.get("markers")
+        if markers and EXTRA_MARKER.fullmatch(markers) is None:
+            if "extra" in markers:
+                raise UnsupportedMarkerError(name, markers)
+            atoms.append(markers)
+
+        if item.get("python"):
+            marker = python_marker(item["python"])
+            if marker:
+                atoms.append(marker)
+
+        if item.get("platform"):
+            atoms.append(f'sys_platform == "{item["platform"]}"')
+
+        marker = " and ".join(f"({a})" if " or " in a else a for a in atoms) if atoms else None
+        edge = Edge(name=name, marker=marker, extras=frozenset(item.get("extras", [])))
+        edges.append((edge, bool(item.get("optional"))))
+
+    return edges
+
+
+def extra_names(entries: Iterable[str]) -> List[str]:
+    names: List[str] = []
+    for entry in entries:
+        try:
+            names.append(canonicalize_name(Requirement(entry).name))
+        except InvalidRequirement:
+            names.append(canonicalize_name(re.split(r"[\s(\[;<>=!~]", entry.strip(), maxsplit=1)[0]))
+
+    return names
+
+
+def package_requirement(package: Dict[str, Any], root_dir: str) -> str:
+    name = package["name"]
+    source = package.get("source") or {}
+    source_type = source.get("type")
+    if source_type == "git":
+        reference = source.get("resolved_reference") or source.get("reference")
+        requirement = f"{name} @ git+{source['url']}@{reference}"
+        if source.get("subdirectory"):
+            requirement += f"#subdirectory={source['subdirectory']}"
+        return requirement
+
+    if source_type in ("directory", "file"):
+        return f"{name} @ {Path(root_dir, source['url']).resolve().as_uri()}"
+
+    if source_type == "url":
+        return f"{name} @ {source['url']}"
+
+    if source_type not in (None, "legacy"):
+        raise UnsupportedSourceError(name, source_type)
+
+    return f"{name}=={package['version']}"
+
+
+def source_credentials(source_name: str) -> Optional[Tuple[str, str]]:
+    key = re.sub(r"[^A-Z0-9]", "_", source_name.upper())
+    username = os.environ.get(f"POETRY_HTTP_BASIC_{key}_USERNAME")
+    if username is None:
+        return None
+
+    return username, os.environ.get(f"POETRY_HTTP_BASIC_{key}_PASSWORD", "")
+
+
+def credential_url(source_name: str, url: str) -> str:
+    credentials = source_credentials(source_name)
+    if credentials is None:
+        raise MissingCredentialsError(source_name)
+
+    parts = urlsplit(url)
+    netloc = f"{quote(credentials[0], safe='')}:{quote(credentials[1], safe='')}@{parts.netloc}"
+    return urlunsplit(parts._replace(netloc=netloc))
+
+
+def add_credentials(text: str, root_dir: str = ".") -> str:
+    """Embed the credentials of the poetry sources into the index urls of an export made without them.
+
+    Raises MissingCredentialsError when they are not in the environment, poetry export has to find them.
+    """
+    with open(os.path.join(root_dir, "pyproject.toml")) as f:
+        pyproject = toml.load(f)
+
+    sources = pyproject.get("tool", {}).get("poetry", {}).get("source", [])
+    names = {s["url"].rstrip("/"): s["name"] for s in sources if s.get("url") and s.get("name")}
+    lines = []
+    for line in text.splitlines():
+        option, _, url = line.partition(" ")
+        if option in ("--index-url", "--extra-index-url") and url.rstrip("/") in names:
+            line = f"{option} {credential_url(names[url.rstrip('/')], url)}"
+        lines.append(line)
+
+    return "".join(f"{line}\n" for line in lines)
+
+
+def index_options(sources: Dict[str, str], with_credentials: bool) -> List[str]:
+    options = []
+    for source_name, url in sources.items():
+        if with_credentials:
+            url = credential_url(source_name, url)
+
+        options.append(f"--extra-index-url {url}")
+        if urlsplit(url).scheme == "http":
+            options.append(f"--trusted-host {urlsplit(url).hostname}")
+
+    return options
+
+
+def root_edges(pyproject: Dict[str, Any], include_dev_requirements: bool, extras: Iterable[str]) -> List[Edge]:
+    if pyproject.get("project", {}).get("dependencies") is not None:
+        raise ProjectDependenciesError()
+
+    poetry = pyproject.get("tool", {}).get("poetry", {})
+    tables = [poetry.get("dependencies", {})]
+    if include_dev_requirements:
+        tables.append(poetry.get("dev-dependencies", {}))
+        tables.append(poetry.get("group", {}).get("dev", {}).get("dependencies", {}))
+
+    declared = {canonicalize_name(k): v for k, v in poetry.get("extras", {}).items()}
+    requested = set()
+    for extra in extras:
+        if canonicalize_name(extra) not in declared:
+            raise UndeclaredExtraError(extra)
+        requested.update(extra_names(declared[canonicalize_name(extra)]))
+
+    roots = []
+    for table in tables:
+        for name, spec in table.items():
+            if name == "python":
+                continue
+
+            for edge, optional in dependency_edges(name, spec):
+                if not optional or canonicalize_name(name) in requested:
+                    roots.append(edge)
+
+    return roots
+
+
+def locked_packages(lock: Dict[str, Any], root_dir: str) -> Tuple[Dict[str, LockedPackage], Dict[str, Tuple[str, str]]]:
+    """The locked packages by name, and the name and url of the source of those from a package source."""
+    metadata_files = lock.get("metadata", {}).get("files", {})
+    packages: Dict[str, LockedPackage] = {}
+    sources: Dict[str, Tuple[str, str]] = {}
+    for item in lock.get("package", []):
+        name = canonicalize_name(item["name"])
+        if name in packages:
+            raise DuplicatePackageError(item["name"])
+
+        required: List[Edge] = []
+        optional: Dict[str, List[Edge]] = {}
+        for dep_name, spec in item.get("dependencies", {}).items():
+            for edge, is_optional in dependency_edges(dep_name, spec):
+                if is_optional:
+                    optional.setdefault(canonicalize_name(dep_name), []).append(edge)
+                else:
+                    required.append(edge)
+
+        package_extras: Dict[str, List[Edge]] = {}
+        for extra, entries in item.get("extras", {}).items():
+            package_extras[canonicalize_name(extra)] = [e for n in extra_names(entries) for e in optional.get(n, [])]
+
+        source = item.get("source") or {}
+        hashes: List[str] = []
+        if source.get("type") in (None, "legacy"):
+            files = item.get("files", metadata_files.get(item["name"], []))
+            hashes = sorted({f["hash"] for f in files if f.get("hash")})
+        if source.get("type") == "legacy":
+            sources[name] = (source.get("reference", ""), source["url"])
+
+        packages[name] = LockedPackage(
+            name=item["name"],
+            requirement=package_requirement(item, root_dir),
+            dependencies=required,
+            extras=package_extras,
+            hashes=hashes,
+        )
+
+    return packages, sources
+
+
+def export_poetry_lock(
+    root_dir: str = ".",
+    include_dev_requirements: bool = False,
+    extra_requirements: Optional[Iterable[str]] = None,
+    with_credentials: bool = False,
+) -> str:
+    """Requirements of a poetry project read from its lock file, like poetry export.
+
+    Raises UnsupportedLockError for anything poetry export has to handle itself, a missing or malformed lock included.
+    """
+    try:
+        with open(os.path.join(root_dir, "poetry.lock")) as f:
+            lock = toml.load(f)
+        with open(os.path.join(root_dir, "pyproject.toml")) as f:
+            pyproject = toml.load(f)
+
+        lock_version = str(lock.get("metadata", {}).get("lock-version", ""))
+        if lock_version not in SUPPORTED_LOCK_VERSIONS:
+            raise LockVersionError(lock_version)
+
+        packages, sources = locked_packages(lock, root_dir)
+        python = pyproject.get("tool", {}).get("poetry", {}).get("dependencies", {}).get("python")
+        root_marker = python_marker(python) if isinstance(python, str) else None
+        markers = resolve(
+            packages,
+            root_edges(pyproject, include_dev_requirements, extra_requirements or ()),
+            [root_marker] if root_marker else [],
+        )
+
+        # only the sources of exported packages are listed, in the order of pyproject.toml
+        used = dict(sorted(sources[name] for name in markers if name in sources))
+        order = [s.get("name") for s in pyproject.get("tool", {}).get("poetry", {}).get("source", [])]
+        ordered = dict(sorted(used.items(), key=lambda s: order.index(s[0]) if s[0] in order else len(order)))
+        return format_requirements(packages, markers, index_options(ordered, with_credentials))
+    except (OSError, KeyError, TypeError, ValueError) as e:
+        raise UnreadableLockError(e) from e
@@ -0,0 +1,62 @@
+import errno
+import os
+import shutil
+import sys
+from tempfile import TemporaryDirectory
+
+LINK_MODES = ("copy", "hardlink", "reflink")
+
+# linux/fs.h, clone the extents of one file into another on btrfs, xfs and similar
+FICLONE = 0x40049409
+
+
+def staging_dir(output_dir: str) -> TemporaryDirectory:
+    """A temporary dir next to output_dir, on the same filesystem so publishing is a rename."""
+    parent = os.path.dirname(os.path.abspath(output_dir))
+    os.makedirs(parent, exist_ok=True)
+    return TemporaryDirectory(prefix=".versifier-", dir=parent)
+
+
+def move(source_path: str, target_path: str) -> None:
+    """Rename source_path to target_path, atomically replacing a target file, copying across filesystems."""
+    try:
+        os.replace(source_path, target_path)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+
+        shutil.move(source_path, target_path)
+
+
+def reflink(source_path: str, target_path: str) -> None:
+    if sys.platform != "linux":
+        raise OSError(errno.EOPNOTSUPP, "reflink is not supported on this platform")
+
+    import fcntl
+
+    with open(source_path, "rb") as source, open(target_path, "wb") as target:
+        fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+
+    shutil.copystat(source_path, target_path)
+
+
+def link_file(source_path: str, target_path: str, mode: str = "copy") -> None:
+    """Place a file that is not modified afterwards, sharing its data with the source when mode allows."""
+    # never write through a link left by an earlier run
+    if os.path.lexists(target_path):
+        os.remove(target_path)
+
+    if mode != "copy":
+        try:
+            if mode == "hardlink":
+                os.link(source_path, target_path)
+            else:
+                reflink(source_path, target_path)
+        except OSError:
+            # another filesystem or no support from it, a plain copy still works
+            if os.path.lexists(target_path):
+                os.remove(target_path)
+        else:
+            return
+
+    shutil.copy2(source_path, target_path)
@@ -0,0 +1,101 @@
+import logging
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Any, Dict, Generator, Iterable
+
+logger = logging.getLogger(__name__)
+
+
+def format_size(size: float) -> str:
+    unit = "B"
+    for next_unit in ("KiB", "MiB", "GiB"):
+        if abs(size) < 1024:
+            break
+
+        size /= 1024
+        unit = next_unit
+
+    if unit == "B":
+        return f"{int(size)}B"
+
+    return f"{size:.1f}{unit}"
+
+
+@dataclass
+class BuildReport:
+    timings: Dict[str, float] = field(default_factory=dict)
+    sizes: Dict[str, int] = field(default_factory=dict)
+    counters: Dict[str, int] = field(default_factory=Counter)
+    notes: Dict[str, str] = field(default_factory=dict)
+    lock: Lock = field(default_factory=Lock, repr=False, compare=False)
+
+    @contextmanager
+    def timer(self, key: str) -> Generator:
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.timings[key] = self.timings.get(key, 0.0) + time.perf_counter() - started_at
+
+    def add_size(self, key: str, size: int) -> None:
+        with self.lock:
+            self.sizes[key] = self.sizes.get(key, 0) + size
+
+    def add_file_sizes(self, key: str, paths: Iterable[str]) -> int:
+        total = 0
+        for path in paths:
+            try:
+                total += os.path.getsize(path)
+            except OSError:
+                continue
+
+        self.add_size(key, total)
+        return total
+
+    def incr(self, key: str, value: int = 1) -> None:
+        with self.lock:
+            self.counters[key] += value
+
+    def note(self, key: str, value: str) -> None:
+        with self.lock:
+            self.notes[key] = value
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        state.pop("lock")
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self.lock = Lock()
+
+    def merge(self, other: "BuildReport") -> None:
+        with self.lock:
+            for key, seconds in other.timings.items():
+                self.timings[key] = self.timings.get(key, 0.0) + seconds
+
+            for key, size in other.sizes.items():
+                self.sizes[key] = self.sizes.get(key, 0) + size
+
+            for key, count in other.counters.items():
+                self.counters[key] += count
+
+            self.notes.update(other.notes)
+
+    def log(self) -> None:
+        for key, value in sorted(self.notes.items()):
+            logger.info("%s: %s", key, value)
+
+        for key, count in sorted(self.counters.items()):
+            logger.info("%s: %d", key, count)
+
+        for key, seconds in sorted(self.timings.items()):
+            logger.info("%s: %.2fs", key, seconds)
+
+        for key, size in sorted(self.sizes.items()):
+            logger.info("%s: %s", key, format_size(size))
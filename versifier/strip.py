@@ -0,0 +1,93 @@
+import logging
+import os
+import shutil
+import sys
+from dataclasses import dataclass, field
+from importlib.machinery import EXTENSION_SUFFIXES
+from subprocess import check_call
+from typing import Iterable, List, Optional
+
+from .report import BuildReport
+
+logger = logging.getLogger(__name__)
+
+
+def find_extensions(output_dir: str, package: str) -> List[str]:
+    results: List[str] = []
+    package_dir = os.path.join(output_dir, package)
+    for root, _, files in os.walk(package_dir):
+        results.extend(os.path.join(root, f) for f in files if f.endswith(tuple(EXTENSION_SUFFIXES)))
+
+    if os.path.isdir(output_dir):
+        results.extend(
+            os.path.join(output_dir, f)
+            for f in os.listdir(output_dir)
+            if f.startswith(f"{package}.") and f.endswith(tuple(EXTENSION_SUFFIXES))
+        )
+
+    return results
+
+
+@dataclass
+class ExtensionStripper:
+    strip_path: str = "strip"
+    objcopy_path: str = "objcopy"
+    debug_dir: Optional[str] = None
+    report: BuildReport = field(default_factory=BuildReport)
+
+    def _strip_args(self) -> List[str]:
+        if sys.platform == "darwin":
+            return [self.strip_path, "-x"]
+
+        return [self.strip_path, "--strip-unneeded"]
+
+    def _keep_debug_info(self, output_dir: str, path: str) -> None:
+        if not self.debug_dir:
+            return
+
+        debug_path = os.path.join(self.debug_dir, f"{os.path.relpath(path, output_dir)}.debug")
+        os.makedirs(os.path.dirname(debug_path), exist_ok=True)
+        check_call([self.objcopy_path, "--only-keep-debug", path, debug_path])
+        self.report.incr("strip.debug_files")
+
+    def _link_debug_info(self, output_dir: str, path: str, stripped_path: str) -> None:
+        if not self.debug_dir:
+            return
+
+        debug_path = os.path.join(self.debug_dir, f"{os.path.relpath(path, output_dir)}.debug")
+        check_call([self.objcopy_path, f"--add-gnu-debuglink={debug_path}", stripped_path])
+
+    def _strip(self, output_dir: str, path: str) -> None:
+        # write a new file and replace path, which may be a hardlink shared with a dedupe store or another output
+        stripped_path = f"{path}.strip"
+        try:
+            check_call([*self._strip_args(), "-o", stripped_path, path])
+            self._link_debug_info(output_dir, path, stripped_path)
+            shutil.copymode(path, stripped_path)
+            os.replace(stripped_path, path)
+        finally:
+            if os.path.lexists(stripped_path):
+                os.remove(stripped_path)
+
+    def strip_packages(self, output_dir: str, packages: Iterable[str]) -> None:
+        if sys.platform == "win32" or not shutil.which(self.strip_path):
+            logger.warning("%s is not available, skip stripping extensions", self.strip_path)
+            return
+
+        if self.debug_dir and (sys.platform == "darwin" or not shutil.which(self.objcopy_path)):
+            logger.warning("%s is not available, debug info will not be kept", self.objcopy_path)
+            self.debug_dir = None
+
+        for package in packages:
+            extensions = find_extensions(output_dir, package)
+            if not extensions:
+                continue
+
+            self.report.add_file_sizes(f"strip.{package}.before", extensions)
+            with self.report.timer("strip"):
+                for path in extensions:
+                    self._keep_debug_info(output_dir, path)
+                    self._strip(output_dir, path)
+
+            self.report.add_file_sizes(f"strip.{package}.after", extensions)
+            self.report.incr("strip.extensions", len(extensions))
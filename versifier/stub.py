@@ -4,10 +4,12 @@ import os
 from contextlib import contextmanager
 from dataclasses import dataclass, field
 from textwrap import dedent, indent
-from typing import Any, Generator, Iterable, List, Tuple, Union
+from typing import Any, Generator, Iterable, List, Optional, Tuple, Union
 
 import astunparse
 
+from .fileindex import FileIndex
+
 
 @dataclass
 class ModuleStubGenerator(ast.NodeVisitor):
@@ -205,12 +207,13 @@ class ModuleStubGenerator(ast.NodeVisitor):
 class PackageStubGenerator:
     output_dir: str
 
-    def generate(self, source_dir: str, packages: Iterable[str]) -> None:
+    def generate(self, source_dir: str, packages: Iterable[str], index: Optional[FileIndex] = None) -> None:
+        walk = index.walk if index else os.walk
         for package in packages:
             package_dir = os.path.join(source_dir, package)
             output_dir = os.path.join(self.output_dir, f"{package}-stubs")
 
-            for root, _, files in os.walk(package_dir):
+            for root, _, files in walk(package_dir):
                 for file in files:
                     if not file.endswith(".py"):
                         continue
@@ -1,18 +1,37 @@
+import json
 import logging
 import os
 from dataclasses import dataclass
-from subprocess import check_call
-from tempfile import TemporaryDirectory
+from subprocess import check_call, check_output
 from typing import Iterable, List, Optional
 
-from .poetry import RequirementsFile
+from .exportcache import ExportCache
+from .lockfile import UnsupportedLockError
+from .poetry import SITE_PACKAGES_SCRIPT, RequirementsFile, stream_output
+from .uvlock import export_uv_lock
 
 logger = logging.getLogger(__name__)
 
 
+def pip_index_options() -> List[str]:
+    """Forward pip's index environment to uv, which only reads its own UV_* variables and never pip.conf."""
+    options = []
+
+    if os.environ.get("PIP_INDEX_URL") and not os.environ.get("UV_INDEX_URL"):
+        options.extend(["--index-url", os.environ["PIP_INDEX_URL"]])
+
+    if not os.environ.get("UV_EXTRA_INDEX_URL"):
+        for url in os.environ.get("PIP_EXTRA_INDEX_URL", "").split():
+            options.extend(["--extra-index-url", url])
+
+    return options
+
+
 @dataclass
 class Uv:
     uv_path: str = "uv"
+    native_export: bool = True
+    cache: Optional[ExportCache] = None
 
     def add_packages(self, packages: Iterable[str], is_dev: bool = False, lock_only: bool = True) -> None:
         commands = [self.uv_path, "add"]
@@ -35,29 +54,52 @@ class Uv:
         if with_credentials:
             logger.warning("uv export does not support embedding credentials; with_credentials will be ignored")
 
-        with TemporaryDirectory() as td:
-            requirement_path = os.path.join(td, "requirements.txt")
-
-            commands = [
-                self.uv_path,
-                "export",
-                "--no-hashes",
-                f"--output-file={requirement_path}",
-            ]
-
-            if not include_dev_requirements:
-                commands.append("--no-dev")
-
-            if extra_requirements:
-                commands.extend(f"--extra={i}" for i in extra_requirements)
+        if self.cache is None:
+            return self._export_requirements(include_dev_requirements, extra_requirements, with_credentials)
+
+        # credentials are ignored, so the export is cached the same way with and without them
+        key = self.cache.key(
+            "uv",
+            ["uv.lock", "pyproject.toml"],
+            include_dev_requirements=include_dev_requirements,
+            extra_requirements=sorted(extra_requirements or ()),
+            native_export=self.native_export,
+        )
+        text = self.cache.load(key)
+        if text is None:
+            text = self._export_requirements(include_dev_requirements, extra_requirements, False).dumps()
+            self.cache.store(key, text)
+
+        return RequirementsFile.from_string(text)
+
+    def _export_requirements(
+        self,
+        include_dev_requirements: bool,
+        extra_requirements: Optional[Iterable[str]],
+        with_credentials: bool,
+    ) -> RequirementsFile:
+        if self.native_export:
+            try:
+                return RequirementsFile.from_string(
+                    export_uv_lock(
+                        include_dev_requirements=include_dev_requirements,
+                        extra_requirements=extra_requirements,
+                    )
+                )
+            except UnsupportedLockError as e:
+                logger.info("Falling back to uv export: %s", e)
+
+        commands = [self.uv_path, "export", "--no-hashes"]
+        if not include_dev_requirements:
+            commands.append("--no-dev")
 
-            if with_credentials:
-                commands.append("--with-credentials")
+        if extra_requirements:
+            commands.extend(f"--extra={i}" for i in extra_requirements)
 
-            check_call(commands)
-            rf = RequirementsFile.from_file(requirement_path)
+        if with_credentials:
+            commands.append("--with-credentials")
 
-        return rf
+        return RequirementsFile.from_lines(stream_output(commands))
 
     def install(
         self, include_dev_requirements: bool = False, extra_requirements: Optional[Iterable[str]] = None
@@ -77,6 +119,25 @@ class Uv:
         commands.extend(args)
         check_call(commands)
 
+    def site_packages(self) -> List[str]:
+        # --no-sync, the environment is inspected as it is and never modified
+        output = check_output([self.uv_path, "run", "--no-sync", "python", "-c", SITE_PACKAGES_SCRIPT])
+        return list(json.loads(output))
+
+    def install_requirements(self, requirements_path: str, target_dir: str) -> None:
+        # uv's own installer downloads in parallel and shares uv's cache, unlike pip inside the venv
+        check_call([
+            self.uv_path,
+            "pip",
+            "install",
+            "--no-deps",
+            "--requirement",
+            requirements_path,
+            "--target",
+            target_dir,
+            *pip_index_options(),
+        ])
+
     def init_if_needed(self) -> None:
         if os.path.exists("uv.lock"):
             return
@@ -0,0 +1,163 @@
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit, urlunsplit
+
+import toml
+from packaging.utils import canonicalize_name
+
+from .lockfile import (
+    DuplicatePackageError,
+    Edge,
+    LockedPackage,
+    LockVersionError,
+    UndeclaredExtraError,
+    UnreadableLockError,
+    UnsupportedLockError,
+    UnsupportedMarkerError,
+    UnsupportedSourceError,
+    format_requirements,
+    resolve,
+)
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_LOCK_VERSIONS = (1,)
+
+
+class WorkspaceError(UnsupportedLockError):
+    message = "Workspaces are not supported"
+
+
+class MissingProjectError(UnsupportedLockError):
+    message = "The project is not in the lock file"
+
+
+def dependency_edges(entries: Iterable[Dict[str, Any]]) -> List[Edge]:
+    edges = []
+    for entry in entries:
+        if "version" in entry or "source" in entry:
+            # only written when the lock holds several versions of the package
+            raise DuplicatePackageError(entry["name"])
+
+        marker = entry.get("marker")
+        if marker and "extra" in marker:
+            raise UnsupportedMarkerError(entry["name"], marker)
+
+        edges.append(Edge(name=entry["name"], marker=marker, extras=frozenset(entry.get("extra", []))))
+
+    return edges
+
+
+def git_requirement(name: str, url: str) -> str:
+    parts = urlsplit(url)
+    query = parse_qs(parts.query)
+    # the fragment holds the commit the reference was resolved to
+    requirement = f"{name} @ git+{urlunsplit(parts._replace(query='', fragment=''))}@{parts.fragment}"
+    if query.get("subdirectory"):
+        requirement += f"#subdirectory={query['subdirectory'][0]}"
+
+    return requirement
+
+
+def package_requirement(package: Dict[str, Any], root_dir: str) -> str:
+    name = package["name"]
+    source = package.get("source", {})
+    if "registry" in source:
+        return f"{name}=={package['version']}"
+
+    if "git" in source:
+        return git_requirement(name, source["git"])
+
+    if "url" in source:
+        return f"{name} @ {source['url']}"
+
+    if "path" in source or "directory" in source:
+        path = source.get("path") or source["directory"]
+        return f"{name} @ {Path(root_dir, path).resolve().as_uri()}"
+
+    raise UnsupportedSourceError(name, source)
+
+
+def default_groups(pyproject: Dict[str, Any], dev_groups: Iterable[str]) -> List[str]:
+    groups = pyproject.get("tool", {}).get("uv", {}).get("default-groups", ["dev"])
+    if groups == "all":
+        return list(dev_groups)
+
+    return [canonicalize_name(g) for g in groups]
+
+
+def split_lock(lock: Dict[str, Any], root_dir: str) -> Tuple[Dict[str, Any], Dict[str, LockedPackage]]:
+    """The project package and the other locked packages by name."""
+    if lock.get("manifest", {}).get("members"):
+        raise WorkspaceError()
+
+    root: Optional[Dict[str, Any]] = None
+    packages: Dict[str, LockedPackage] = {}
+    for item in lock.get("package", []):
+        source = item.get("source", {})
+        if source.get("editable") == "." or source.get("virtual") == ".":
+            root = item
+            continue
+
+        if "editable" in source or "virtual" in source:
+            raise UnsupportedSourceError(item["name"], source)
+
+        name = canonicalize_name(item["name"])
+        if name in packages:
+            raise DuplicatePackageError(item["name"])
+
+        packages[name] = LockedPackage(
+            name=item["name"],
+            requirement=package_requirement(item, root_dir),
+            dependencies=dependency_edges(item.get("dependencies", [])),
+            extras={
+                canonicalize_name(extra): dependency_edges(entries)
+                for extra, entries in item.get("optional-dependencies", {}).items()
+            },
+        )
+
+    if root is None:
+        raise MissingProjectError()
+
+    return root, packages
+
+
+def export_uv_lock(
+    root_dir: str = ".",
+    include_dev_requirements: bool = False,
+    extra_requirements: Optional[Iterable[str]] = None,
+) -> str:
+    """Requirements of a uv project read from its lock file, like uv export --no-hashes.
+
+    Raises UnsupportedLockError for anything uv export has to handle itself, a missing or malformed lock included.
+    """
+    try:
+        # without a uv.lock, uv export has to create it
+        with open(os.path.join(root_dir, "uv.lock")) as f:
+            lock = toml.load(f)
+        with open(os.path.join(root_dir, "pyproject.toml")) as f:
+            pyproject = toml.load(f)
+
+        if lock.get("version") not in SUPPORTED_LOCK_VERSIONS:
+            raise LockVersionError(lock.get("version"))
+
+        root, packages = split_lock(lock, root_dir)
+        roots = dependency_edges(root.get("dependencies", []))
+        optional = {canonicalize_name(k): v for k, v in root.get("optional-dependencies", {}).items()}
+        for extra in extra_requirements or ():
+            if canonicalize_name(extra) not in optional:
+                raise UndeclaredExtraError(extra)
+            roots.extend(dependency_edges(optional[canonicalize_name(extra)]))
+
+        if include_dev_requirements:
+            dev: Dict[str, Any] = {canonicalize_name(k): v for k, v in root.get("dev-dependencies", {}).items()}
+            for group in default_groups(pyproject, dev):
+                roots.extend(dependency_edges(dev.get(group, [])))
+
+        # the project itself is installed too, unless it is a virtual one
+        options = ["-e ."] if "editable" in root.get("source", {}) else []
+        return format_requirements(packages, resolve(packages, roots), options)
+    except (OSError, KeyError, TypeError, ValueError) as e:
+        raise UnreadableLockError(e) from e
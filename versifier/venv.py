@@ -0,0 +1,114 @@
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from importlib.metadata import Distribution, distributions
+from typing import Any, Dict, Iterable, List, Optional
+
+from packaging.utils import canonicalize_name
+from packaging.version import InvalidVersion, Version
+
+from .fileindex import compile_patterns
+from .poetry import RequirementsFile
+from .publish import link_file
+from .report import BuildReport
+from .wheel import is_excluded, pinned_version
+
+logger = logging.getLogger(__name__)
+
+
+def is_editable(dist: Distribution) -> bool:
+    direct_url = dist.read_text("direct_url.json")
+    if not direct_url:
+        return False
+
+    try:
+        return bool(json.loads(direct_url).get("dir_info", {}).get("editable"))
+    except ValueError:
+        return False
+
+
+@dataclass
+class InstalledPackageCopier:
+    """Copies requirements already installed in the project environment, using their RECORD."""
+
+    site_dirs: List[str]
+    hardlink: bool = False
+    report: BuildReport = field(default_factory=BuildReport)
+
+    def find_distributions(self) -> Dict[str, Distribution]:
+        dists: Dict[str, Distribution] = {}
+        for dist in distributions(path=self.site_dirs):
+            name = dist.metadata["Name"]
+            if name:
+                # the first one on the path is the one that gets imported
+                dists.setdefault(canonicalize_name(name), dist)
+
+        return dists
+
+    def find_installed(self, requirement: Any, dists: Dict[str, Distribution]) -> Optional[Distribution]:
+        """The installed distribution of a requirement, None when it is missing or not the locked version."""
+        version = pinned_version(requirement)
+        dist = dists.get(canonicalize_name(requirement.name))
+        if dist is None or version is None:
+            return None
+
+        try:
+            installed = Version(dist.version)
+        except InvalidVersion:
+            return None
+
+        if installed != Version(version):
+            logger.info("Installed %s %s does not match the locked %s", requirement.name, installed, version)
+            self.report.incr("venv.mismatched")
+            return None
+
+        if dist.files is None or is_editable(dist):
+            # no RECORD to copy from, or the files live in the project instead of site-packages
+            return None
+
+        return dist
+
+    def copy(self, dist: Distribution, output_dir: str, exclude_file_patterns: Iterable[str] = ()) -> None:
+        matches = compile_patterns(exclude_file_patterns)
+        for file in dist.files or []:
+            path = os.path.normpath(str(file))
+            # entry point scripts and data files are installed outside of site-packages
+            if os.path.isabs(path) or path == ".." or path.startswith(f"..{os.sep}"):
+                continue
+
+            if is_excluded(output_dir, path, matches):
+                self.report.incr("venv.skipped_files")
+                continue
+
+            target_path = os.path.join(output_dir, path)
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            link_file(str(dist.locate_file(file)), target_path, "hardlink" if self.hardlink else "copy")
+            self.report.incr("venv.files")
+
+    def copy_requirements(
+        self, rf: RequirementsFile, output_dir: str, exclude_file_patterns: Iterable[str] = ()
+    ) -> List[str]:
+        """Copy every requirement installed with its locked version, return the names left to install."""
+        remaining = []
+        with self.report.timer("venv"):
+            dists = self.find_distributions()
+            for requirement in rf.requirements:
+                if requirement.marker and not requirement.marker.evaluate():
+                    continue
+
+                dist = self.find_installed(requirement, dists)
+                if dist is None:
+                    remaining.append(requirement.name)
+                    continue
+
+                try:
+                    self.copy(dist, output_dir, exclude_file_patterns)
+                except OSError as e:
+                    logger.warning("Failed to copy the installed %s, installing it again: %s", requirement.req, e)
+                    remaining.append(requirement.name)
+                    continue
+
+                self.report.incr("venv.reused")
+
+        return remaining
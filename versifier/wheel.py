@@ -0,0 +1,344 @@
+import base64
+import hashlib
+import json
+import logging
+import os
+import shutil
+import zipfile
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from tempfile import TemporaryDirectory
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.error import HTTPError, URLError
+from urllib.parse import unquote, urljoin, urlsplit, urlunsplit
+from urllib.request import Request, urlopen
+
+from packaging.tags import sys_tags
+from packaging.utils import InvalidWheelFilename, canonicalize_name, parse_wheel_filename
+from packaging.version import InvalidVersion, Version
+
+from .fileindex import compile_patterns
+from .poetry import RequirementsFile
+from .report import BuildReport
+from .wheelcache import WheelCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_URL = "https://pypi.org/simple"
+SIMPLE_JSON_TYPE = "application/vnd.pypi.simple.v1+json"
+
+
+class UnsafeWheelPathError(ValueError):
+    """A wheel member that would be written outside the target dir."""
+
+    def __init__(self, member: str) -> None:
+        super().__init__(f"Unsafe path in wheel: {member}")
+
+
+class WheelHashError(ValueError):
+    """A downloaded wheel whose content does not match the index or the lock."""
+
+    def __init__(self, filename: str, reason: str) -> None:
+        super().__init__(f"Hash of {filename} {reason}")
+
+
+class MissingWheelError(LookupError):
+    """Offline extraction needs wheels that are not in the cache."""
+
+    def __init__(self, requirements: Iterable[str]) -> None:
+        super().__init__(f"No compatible wheel in the cache for: {', '.join(requirements)}")
+
+
+@dataclass
+class WheelLink:
+    url: str
+    filename: str
+    hashes: Dict[str, str] = field(default_factory=dict)
+
+
+class AnchorParser(HTMLParser):
+    """Collects the file links of a PEP 503 simple page."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.hrefs: List[str] = []
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        href = dict(attrs).get("href")
+        if tag == "a" and href:
+            self.hrefs.append(href)
+
+
+def split_credentials(url: str) -> Tuple[str, Optional[str]]:
+    """Remove user info from url and return it as a basic Authorization header."""
+    parts = urlsplit(url)
+    if not parts.username:
+        return url, None
+
+    netloc = parts.hostname or ""
+    if parts.port:
+        netloc = f"{netloc}:{parts.port}"
+
+    credentials = f"{unquote(parts.username)}:{unquote(parts.password or '')}"
+    token = base64.b64encode(credentials.encode()).decode()
+    return urlunsplit(parts._replace(netloc=netloc)), f"Basic {token}"
+
+
+def index_urls_from(rf: RequirementsFile) -> List[str]:
+    index_url = os.environ.get("PIP_INDEX_URL")
+    extra_index_urls = os.environ.get("PIP_EXTRA_INDEX_URL", "").split()
+    for option in rf.options:
+        index_url = option.options.get("index_url", index_url)
+        extra_index_urls.extend(option.options.get("extra_index_urls", []))
+
+    return [index_url or DEFAULT_INDEX_URL, *extra_index_urls]
+
+
+def pinned_version(requirement: Any) -> Optional[str]:
+    """The single version a requirement can resolve to, None when it is not pinned."""
+    try:
+        if requirement.link:
+            filename = unquote(urlsplit(requirement.link.url).path.rsplit("/", 1)[-1])
+            return str(parse_wheel_filename(filename)[1])
+
+        if requirement.is_pinned:
+            return str(Version(next(iter(requirement.specifier)).version))
+    except (InvalidWheelFilename, InvalidVersion):
+        pass
+
+    return None
+
+
+def wheel_member_path(member: str) -> Optional[str]:
+    """Where a wheel member goes in a pip --target tree, None when it is not installed there."""
+    parts = member.split("/")
+    if parts[0].endswith(".data"):
+        # scripts, headers and data files are not importable, only the library dirs are kept
+        if len(parts) < 3 or parts[1] not in ("purelib", "platlib"):
+            return None
+        parts = parts[2:]
+
+    path = os.path.normpath(os.path.join(*parts))
+    if os.path.isabs(path) or path == ".." or path.startswith(f"..{os.sep}"):
+        raise UnsafeWheelPathError(member)
+
+    return path
+
+
+def is_excluded(output_dir: str, path: str, matches: Callable[[str], bool]) -> bool:
+    """Whether path, relative to output_dir, or one of its parent dirs matches, see compile_patterns."""
+    parts = path.split(os.sep)
+    return any(matches(os.path.join(output_dir, *parts[:i])) for i in range(1, len(parts) + 1))
+
+
+@dataclass
+class WheelUnpacker:
+    """Installs pinned requirements by unpacking compatible wheels, without running pip."""
+
+    timeout: float = 30.0
+    report: BuildReport = field(default_factory=BuildReport)
+    tag_priorities: Dict[str, int] = field(default_factory=lambda: {str(t): i for i, t in enumerate(sys_tags())})
+    cache: Optional[WheelCache] = None
+    offline: bool = False
+
+    def _open(self, url: str, accept: Optional[str] = None, authorization: Optional[str] = None) -> Any:
+        headers = {}
+        if accept:
+            headers["Accept"] = accept
+        if authorization:
+            headers["Authorization"] = authorization
+
+        return urlopen(Request(url, headers=headers), timeout=self.timeout)  # noqa: S310
+
+    def find_links(self, index_url: str, name: str) -> List[WheelLink]:
+        base_url, authorization = split_credentials(index_url)
+        page_url = f"{base_url.rstrip('/')}/{canonicalize_name(name)}/"
+        accept = f"{SIMPLE_JSON_TYPE}, text/html;q=0.1"
+        try:
+            with self._open(page_url, accept=accept, authorization=authorization) as response:
+                content_type = response.headers.get("Content-Type", "")
+                body = response.read()
+                page_url = response.geturl()
+        except HTTPError as e:
+            # an index only hosting some of the packages, the next one may have it
+            if e.code == 404:
+                return []
+            raise
+        except URLError as e:
+            # the same for a file:// index
+            if isinstance(e.reason, FileNotFoundError):
+                return []
+            raise
+
+        links = []
+        if content_type.startswith(SIMPLE_JSON_TYPE):
+            for file in json.loads(body)["files"]:
+                links.append(WheelLink(urljoin(page_url, file["url"]), file["filename"], file.get("hashes", {})))
+        else:
+            parser = AnchorParser()
+            parser.feed(body.decode())
+            for href in parser.hrefs:
+                url, _, fragment = urljoin(page_url, href).partition("#")
+                hash_name, _, hash_value = fragment.partition("=")
+                filename = unquote(urlsplit(url).path.rsplit("/", 1)[-1])
+                links.append(WheelLink(url, filename, {hash_name: hash_value} if hash_value else {}))
+
+        return [i for i in links if i.filename.endswith(".whl")]
+
+    def _priority(self, filename: str, requirement: Any) -> Optional[int]:
+        try:
+            name, version, _, tags = parse_wheel_filename(filename)
+        except InvalidWheelFilename:
+            return None
+
+        if name != canonicalize_name(requirement.name) or not requirement.specifier.contains(version, prereleases=True):
+            return None
+
+        priorities = [self.tag_priorities[str(t)] for t in tags if str(t) in self.tag_priorities]
+        return min(priorities) if priorities else None
+
+    def find_wheel(self, requirement: Any, index_urls: Iterable[str]) -> Optional[WheelLink]:
+        if requirement.link:
+            filename = unquote(urlsplit(requirement.link.url).path.rsplit("/", 1)[-1])
+            if filename.endswith(".whl") and self._priority(filename, requirement) is not None:
+                return WheelLink(requirement.link.url, filename)
+            return None
+
+        if not requirement.is_pinned:
+            return None
+
+        best: Optional[Tuple[int, WheelLink]] = None
+        for index_url in index_urls:
+            for link in self.find_links(index_url, requirement.name):
+                priority = self._priority(link.filename, requirement)
+                if priority is not None and (best is None or priority < best[0]):
+                    best = (priority, link)
+
+            if best:
+                break
+
+        return best[1] if best else None
+
+    def download(self, link: WheelLink, index_urls: Iterable[str], dest_dir: str) -> str:
+        authorization = None
+        for index_url in index_urls:
+            base_url, index_authorization = split_credentials(index_url)
+            if urlsplit(base_url).netloc == urlsplit(link.url).netloc:
+                authorization = index_authorization
+                break
+
+        path = os.path.join(dest_dir, link.filename)
+        with self._open(link.url, authorization=authorization) as response, open(path, "wb") as f:
+            shutil.copyfileobj(response, f)
+
+        self.report.add_file_sizes("wheel.downloaded", [path])
+        return path
+
+    def verify(self, path: str, link: WheelLink, requirement: Any) -> None:
+        with open(path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+
+        expected = link.hashes.get("sha256")
+        if expected and expected != digest:
+            raise WheelHashError(link.filename, f"is {digest}, the index expects {expected}")
+
+        if requirement.hash_options and f"sha256:{digest}" not in requirement.hash_options:
+            raise WheelHashError(link.filename, "does not match the locked hashes")
+
+    def find_cached(self, requirement: Any) -> Optional[str]:
+        version = pinned_version(requirement)
+        if self.cache is None or version is None:
+            return None
+
+        digests = None
+        if requirement.hash_options:
+            digests = [h.split(":", 1)[1] for h in requirement.hash_options if h.startswith("sha256:")]
+
+        best: Optional[Tuple[int, str]] = None
+        for path in self.cache.find(requirement.name, version, digests):
+            priority = self._priority(os.path.basename(path), requirement)
+            if priority is not None and (best is None or priority < best[0]):
+                best = (priority, path)
+
+        return best[1] if best else None
+
+    def fetch(self, requirement: Any, index_urls: List[str], dest_dir: str) -> Optional[str]:
+        """Download and verify the best wheel of a requirement, None when the index has none."""
+        link = self.find_wheel(requirement, index_urls)
+        if link is None:
+            return None
+
+        path = self.download(link, index_urls, dest_dir)
+        self.verify(path, link, requirement)
+        if self.cache is not None:
+            path = self.cache.add(path, requirement.name, str(parse_wheel_filename(link.filename)[1]))
+
+        return path
+
+    def unpack(self, wheel_path: str, output_dir: str, exclude_file_patterns: Iterable[str] = ()) -> None:
+        matches = compile_patterns(exclude_file_patterns)
+        with zipfile.ZipFile(wheel_path) as zf:
+            for member in zf.infolist():
+                path = wheel_member_path(member.filename)
+                if path is None or is_excluded(output_dir, path, matches):
+                    self.report.incr("wheel.skipped_files")
+                    continue
+
+                target_path = os.path.join(output_dir, path)
+                if member.is_dir():
+                    os.makedirs(target_path, exist_ok=True)
+                    continue
+
+                os.makedirs(os.path.dirname(target_path), exist_ok=True)
+                with zf.open(member) as source, open(target_path, "wb") as target:
+                    shutil.copyfileobj(source, target)
+                self.report.incr("wheel.files")
+
+    def unpack_requirements(
+        self, rf: RequirementsFile, output_dir: str, exclude_file_patterns: Iterable[str] = ()
+    ) -> List[str]:
+        """Unpack every requirement that has a compatible wheel, return the names left for pip.
+
+        Offline, wheels only come from the cache and a requirement missing there raises LookupError.
+        """
+        index_urls = index_urls_from(rf)
+        remaining = []
+        missing = []
+        with TemporaryDirectory() as td, self.report.timer("wheel"):
+            for requirement in rf.requirements:
+                if requirement.marker and not requirement.marker.evaluate():
+                    continue
+
+                path = self.find_cached(requirement)
+                if path is not None and self.cache is not None:
+                    self.cache.touch(path)
+                    self.report.incr("wheel.cache_hits")
+                elif self.offline:
+                    missing.append(str(requirement.req))
+                    continue
+                else:
+                    try:
+                        path = self.fetch(requirement, index_urls, td)
+                    except (OSError, ValueError) as e:
+                        logger.warning("Failed to fetch a wheel for %s, installing it with pip: %s", requirement.req, e)
+                        remaining.append(requirement.name)
+                        continue
+
+                    if path is None:
+                        logger.info("No compatible wheel for %s, installing it with pip", requirement.req)
+                        remaining.append(requirement.name)
+                        continue
+
+                    if self.cache is not None:
+                        self.report.incr("wheel.cache_misses")
+
+                self.unpack(path, output_dir, exclude_file_patterns)
+                self.report.incr("wheel.unpacked")
+
+            if self.cache is not None:
+                self.cache.evict()
+
+        if missing:
+            raise MissingWheelError(missing)
+
+        return remaining
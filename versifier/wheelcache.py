@@ -0,0 +1,112 @@
+import logging
+import os
+import shutil
+from dataclasses import dataclass, field
+from tempfile import mkstemp
+from typing import Iterable, List, Optional, Tuple
+
+from packaging.utils import canonicalize_name
+
+from .dedupe import file_digest
+from .report import BuildReport
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class WheelCache:
+    """Content addressed wheel store, laid out as <name>/<version>/<sha256>/<filename>."""
+
+    root: str
+    max_size: int = 0
+    report: BuildReport = field(default_factory=BuildReport)
+
+    def _version_dir(self, name: str, version: str) -> str:
+        return os.path.join(self.root, canonicalize_name(name), version)
+
+    def find(self, name: str, version: str, digests: Optional[Iterable[str]] = None) -> List[str]:
+        """Cached wheels of name==version, only the ones with one of digests when given."""
+        version_dir = self._version_dir(name, version)
+        if not os.path.isdir(version_dir):
+            return []
+
+        allowed = set(digests) if digests is not None else None
+        paths: List[str] = []
+        for digest in sorted(os.listdir(version_dir)):
+            if allowed is not None and digest not in allowed:
+                continue
+
+            digest_dir = os.path.join(version_dir, digest)
+            paths.extend(os.path.join(digest_dir, f) for f in sorted(os.listdir(digest_dir)) if f.endswith(".whl"))
+
+        return paths
+
+    def touch(self, path: str) -> None:
+        """Mark a wheel as recently used, eviction drops the least recently used ones first."""
+        os.utime(path)
+
+    def add(self, path: str, name: str, version: str) -> str:
+        digest = file_digest(path)
+        digest_dir = os.path.join(self._version_dir(name, version), digest)
+        cached_path = os.path.join(digest_dir, os.path.basename(path))
+        if os.path.isfile(cached_path):
+            self.touch(cached_path)
+            return cached_path
+
+        os.makedirs(digest_dir, exist_ok=True)
+        # concurrent builds may share the cache, readers must never see a partial wheel
+        fd, tmp_path = mkstemp(dir=digest_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as target, open(path, "rb") as source:
+                shutil.copyfileobj(source, target)
+            os.replace(tmp_path, cached_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+        self.report.add_size("wheel.cache_added", os.path.getsize(cached_path))
+        return cached_path
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        entries = []
+        for root, _, files in os.walk(self.root):
+            for f in files:
+                if not f.endswith(".whl"):
+                    continue
+
+                path = os.path.join(root, f)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        return entries
+
+    def evict(self) -> None:
+        """Remove the least recently used wheels until the cache fits in max_size bytes."""
+        if self.max_size <= 0:
+            return
+
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_size:
+                break
+
+            logger.debug("Evicting %s from the wheel cache", path)
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+
+            total -= size
+            self.report.add_size("wheel.cache_evicted", size)
+            # drop the emptied <sha256>, <version> and <name> dirs
+            parent = os.path.dirname(path)
+            for _ in range(3):
+                try:
+                    os.rmdir(parent)
+                except OSError:
+                    break
+                parent = os.path.dirname(parent)
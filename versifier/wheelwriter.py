@@ -0,0 +1,129 @@
+import base64
+import hashlib
+import logging
+import os
+import re
+import stat
+import zipfile
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+from packaging.tags import sys_tags
+from packaging.utils import canonicalize_name
+
+from .report import BuildReport
+
+logger = logging.getLogger(__name__)
+
+# the earliest date a zip entry can hold, fixed so the same files always give the same wheel
+ZIP_DATE = (1980, 1, 1, 0, 0, 0)
+CHUNK_SIZE = 1024 * 1024
+
+
+def platform_tag() -> str:
+    """The tag of wheels holding extensions built by the running interpreter."""
+    # the most specific tag, which carries the abi flags of free-threaded or debug builds
+    return str(next(sys_tags()))
+
+
+def escape_name(name: str) -> str:
+    return re.sub(r"[-_.]+", "_", name)
+
+
+def distribution_name(entry: str) -> str:
+    """The distribution a top-level entry of an output dir belongs to, stubs go with their package."""
+    if entry.endswith("-stubs"):
+        entry = entry[: -len("-stubs")]
+
+    return canonicalize_name(entry.split(".", 1)[0])
+
+
+def record_hash(digest: bytes) -> str:
+    return "sha256=" + base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+
+@dataclass
+class WheelWriter:
+    """Packs an output dir into one wheel per top-level package, hashing the files while they are streamed."""
+
+    version: str = "0.0.0"
+    versions: Dict[str, str] = field(default_factory=dict)
+    tag: str = field(default_factory=platform_tag)
+    report: BuildReport = field(default_factory=BuildReport)
+
+    def _add_bytes(self, zf: zipfile.ZipFile, arcname: str, data: bytes, records: List[str]) -> None:
+        zf.writestr(zipfile.ZipInfo(arcname, ZIP_DATE), data)
+        records.append(f"{arcname},{record_hash(hashlib.sha256(data).digest())},{len(data)}")
+
+    def _add_file(self, zf: zipfile.ZipFile, path: str, arcname: str, records: List[str]) -> None:
+        info = zipfile.ZipInfo(arcname, ZIP_DATE)
+        info.compress_type = zipfile.ZIP_DEFLATED
+        info.external_attr = (stat.S_IMODE(os.stat(path).st_mode) | stat.S_IFREG) << 16
+
+        sha256 = hashlib.sha256()
+        size = 0
+        with open(path, "rb") as source, zf.open(info, "w") as target:
+            while chunk := source.read(CHUNK_SIZE):
+                sha256.update(chunk)
+                target.write(chunk)
+                size += len(chunk)
+
+        records.append(f"{arcname},{record_hash(sha256.digest())},{size}")
+
+    def _list_files(self, source_dir: str, entries: List[str]) -> List[Tuple[str, str]]:
+        files = []
+        for entry in entries:
+            path = os.path.join(source_dir, entry)
+            if not os.path.isdir(path):
+                files.append((path, entry))
+                continue
+
+            for root, _, names in os.walk(path):
+                for name in names:
+                    file_path = os.path.join(root, name)
+                    files.append((file_path, os.path.relpath(file_path, source_dir).replace(os.sep, "/")))
+
+        return sorted(files, key=lambda f: f[1])
+
+    def write(self, name: str, source_dir: str, entries: List[str], wheel_dir: str) -> str:
+        """Write the top-level entries of source_dir into a wheel of distribution name, return its path."""
+        version = self.versions.get(canonicalize_name(name), self.version)
+        dist_info = f"{escape_name(name)}-{version}.dist-info"
+        wheel_path = os.path.join(wheel_dir, f"{escape_name(name)}-{version}-{self.tag}.whl")
+
+        records: List[str] = []
+        with zipfile.ZipFile(wheel_path, "w", zipfile.ZIP_DEFLATED) as zf:
+            for path, arcname in self._list_files(source_dir, entries):
+                self._add_file(zf, path, arcname, records)
+
+            metadata = f"Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n"
+            self._add_bytes(zf, f"{dist_info}/METADATA", metadata.encode(), records)
+            wheel = f"Wheel-Version: 1.0\nGenerator: versifier\nRoot-Is-Purelib: false\nTag: {self.tag}\n"
+            self._add_bytes(zf, f"{dist_info}/WHEEL", wheel.encode(), records)
+
+            records.append(f"{dist_info}/RECORD,,")
+            zf.writestr(zipfile.ZipInfo(f"{dist_info}/RECORD", ZIP_DATE), "\n".join(records) + "\n")
+
+        self.report.incr("wheels.files", len(records) - 3)
+        return wheel_path
+
+    def write_tree(self, source_dir: str, wheel_dir: str) -> List[str]:
+        """Write every package of source_dir into wheel_dir, return the wheel paths."""
+        groups: Dict[str, List[str]] = {}
+        for entry in sorted(os.listdir(source_dir)):
+            if entry.startswith("."):
+                continue
+
+            groups.setdefault(distribution_name(entry), []).append(entry)
+
+        os.makedirs(wheel_dir, exist_ok=True)
+        paths = []
+        with self.report.timer("wheels"):
+            for name, entries in sorted(groups.items()):
+                path = self.write(name, source_dir, entries, wheel_dir)
+                logger.debug("Wrote %s", path)
+                paths.append(path)
+
+        self.report.incr("wheels.built", len(paths))
+        self.report.add_file_sizes("wheels.written", paths)
+        return paths